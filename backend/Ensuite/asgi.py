@@ -1,18 +1,29 @@
 import os
 
-import campuscart.routing
-from channels.auth import AuthMiddlewareStack
-from channels.routing import ProtocolTypeRouter, URLRouter
-from django.core.asgi import get_asgi_application
+from .handlers import get_asgi_application
 
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Ensuite.settings')
 
+# Initialize Django before importing anything that touches models or settings.
+django_asgi_app = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+
+from study_buddy_api.ollama_client import start_warm_up  # noqa: E402
+
+from . import routing  # noqa: E402
+
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter(
-            campuscart.routing.websocket_urlpatterns
+            routing.websocket_urlpatterns
         )
     ),
 })
+
+# Preload the models in the background so the first requests don't pay for it.
+start_warm_up()
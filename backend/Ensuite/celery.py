@@ -3,6 +3,7 @@ from __future__ import absolute_import, unicode_literals
 import os
 
 from celery import Celery
+from celery.signals import worker_ready
 
 
 # set the default Django settings module for the 'celery' program.
@@ -19,6 +20,12 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
 
+@worker_ready.connect
+def warm_up_models(**kwargs):
+    from study_buddy_api.ollama_client import start_warm_up
+
+    start_warm_up()
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
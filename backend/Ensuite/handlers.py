@@ -0,0 +1,75 @@
+import asyncio
+from contextvars import ContextVar
+
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+
+
+_receive = ContextVar("asgi_receive", default=None)
+
+# Not sent to the client, which is gone, but logged by the server.
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def run_until_disconnect(coroutine) -> asyncio.Future:
+    """
+    Run `coroutine` as a task until it finishes or the client of the current
+    request disconnects, cancelling it in the latter case, and return the task.
+    """
+    task = asyncio.ensure_future(coroutine)
+    disconnect_task = asyncio.ensure_future(wait_for_disconnect(_receive.get()))
+
+    try:
+        await asyncio.wait([task, disconnect_task], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        disconnect_task.cancel()
+        if not task.done():
+            task.cancel()
+            # Let the view or stream clean up, e.g. close its Ollama stream.
+            await asyncio.wait([task])
+    return task
+
+
+class DisconnectAwareASGIHandler(ASGIHandler):
+    """
+    Cancel the view, or the streaming of its response, when the client
+    disconnects, so that LLM generations stop with it. Django does so itself
+    from 5.0.
+    """
+
+    async def handle(self, scope, receive, send):
+        # Every request is handled in its own task, hence its own context.
+        _receive.set(receive)
+        await super().handle(scope, receive, send)
+
+    async def get_response_async(self, request):
+        response_task = await run_until_disconnect(super().get_response_async(request))
+        if response_task.cancelled():
+            return HttpResponse(status=CLIENT_CLOSED_REQUEST)
+        return response_task.result()
+
+    async def send_response(self, response, send):
+        send_task = await run_until_disconnect(super().send_response(response, send))
+        if send_task.cancelled():
+            # Django only closes the response, firing request_finished, once sent.
+            await sync_to_async(response.close, thread_sensitive=True)()
+        else:
+            send_task.result()
+
+
+def get_asgi_application():
+    """
+    The public interface to Django's ASGI support, cancelling views on client
+    disconnects on Django versions that don't.
+    """
+    django.setup(set_prefix=False)
+    if hasattr(ASGIHandler, "listen_for_disconnect"):
+        return ASGIHandler()
+    return DisconnectAwareASGIHandler()
@@ -1,7 +1,59 @@
-class RedirectOnConditionMiddleware:
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+from django_user_agents.utils import get_user_agent
+
+from study_buddy_api.timing import (
+    finish_request_timing,
+    get_request_timing_setting,
+    start_request_timing,
+)
+
+
+class RedirectOnConditionMiddleware(MiddlewareMixin):
+    # MiddlewareMixin makes this middleware both sync and async capable, so
+    # async views under ASGI are not forced through a thread for it.
+    pass
+
+
+class UserAgentMiddleware(MiddlewareMixin):
+    """
+    Async capable `django_user_agents.middleware.UserAgentMiddleware`. The
+    original is sync only, which runs every async view through a single thread
+    and keeps it from being cancelled when the client disconnects.
+    """
+
+    def process_request(self, request):
+        request.user_agent = SimpleLazyObject(lambda: get_user_agent(request))
+
+
+class RequestTimingMiddleware:
+    """
+    Time every request by stage, see `study_buddy_api.timing`. Not loaded unless
+    `STUDY_BUDDY_REQUEST_TIMING["ENABLED"]` is set.
+    """
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
+        if not get_request_timing_setting("ENABLED"):
+            raise MiddlewareNotUsed
+
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings = start_request_timing()
         response = self.get_response(request)
-        return response
+        return finish_request_timing(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = start_request_timing()
+        response = await self.get_response(request)
+        return finish_request_timing(request, response, timings)
@@ -0,0 +1,2 @@
+# WebSocket routes served by the ASGI application (see Ensuite/asgi.py).
+websocket_urlpatterns = []
@@ -69,6 +69,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "Ensuite.middleware.RequestTimingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -76,7 +77,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "Ensuite.middleware.RedirectOnConditionMiddleware",
-    "django_user_agents.middleware.UserAgentMiddleware",
+    "Ensuite.middleware.UserAgentMiddleware",
     "django.middleware.common.CommonMiddleware",
     "corsheaders.middleware.CorsMiddleware",
 ]
@@ -225,3 +226,202 @@ CHANNEL_LAYERS = {
         },
     },
 }
+
+# Study Buddy LLM response cache, keyed by a hash of the model, messages and
+# generation options. BACKEND is "local" (in-process LRU bounded by MAX_BYTES),
+# "redis" (shared between workers, at LOCATION) or empty to disable caching.
+STUDY_BUDDY_LLM_CACHE = {
+    "BACKEND": os.getenv("LLM_CACHE_BACKEND", "local"),
+    "LOCATION": os.getenv("LLM_CACHE_LOCATION", "redis://127.0.0.1:6379/1"),
+    "TIMEOUT": int(os.getenv("LLM_CACHE_TIMEOUT", 60 * 60 * 24)),
+    "MAX_BYTES": int(os.getenv("LLM_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+}
+
+# Chunked map-reduce processing of documents larger than the model context
+# (summaries and study notes). Chunks are condensed with up to CONCURRENCY
+# parallel LLM calls, which requires OLLAMA_NUM_PARALLEL > 1 on the Ollama side.
+STUDY_BUDDY_CHUNKING = {
+    "MAX_CHUNK_TOKENS": int(os.getenv("LLM_MAX_CHUNK_TOKENS", 1500)),
+    "CONCURRENCY": int(os.getenv("LLM_CHUNK_CONCURRENCY", 4)),
+}
+
+# Page-parallel PDF text extraction. Documents with at least
+# 2 * MIN_PAGES_PER_WORKER pages are split across up to MAX_WORKERS processes.
+STUDY_BUDDY_PDF_EXTRACTION = {
+    "MAX_WORKERS": int(os.getenv("PDF_MAX_WORKERS", os.cpu_count() or 1)),
+    "MIN_PAGES_PER_WORKER": int(os.getenv("PDF_MIN_PAGES_PER_WORKER", 32)),
+}
+
+# Uploads larger than FILE_UPLOAD_MAX_MEMORY_SIZE are streamed to a temporary file
+# by Django and extracted from disk, so peak memory per request stays bounded.
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv("FILE_UPLOAD_MAX_MEMORY_SIZE", 2621440))
+STUDY_BUDDY_MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 100 * 1024 * 1024))
+
+# YouTube transcript cache keyed by video id. Successful fetches are kept for
+# TIMEOUT seconds, videos without a retrievable transcript for NEGATIVE_TIMEOUT.
+# Use the "redis" BACKEND to share transcripts between all workers.
+STUDY_BUDDY_TRANSCRIPT_CACHE = {
+    "BACKEND": os.getenv("TRANSCRIPT_CACHE_BACKEND", "local"),
+    "LOCATION": os.getenv("TRANSCRIPT_CACHE_LOCATION", "redis://127.0.0.1:6379/1"),
+    "TIMEOUT": int(os.getenv("TRANSCRIPT_CACHE_TIMEOUT", 60 * 60 * 24 * 7)),
+    "NEGATIVE_TIMEOUT": int(os.getenv("TRANSCRIPT_CACHE_NEGATIVE_TIMEOUT", 60 * 60)),
+    "MAX_BYTES": int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", 32 * 1024 * 1024)),
+}
+
+# Celery, used for the asynchronous job mode of the API (`?async=1`). Uploaded
+# files are handed to workers through the default storage (MEDIA_ROOT), which
+# must be shared between web and worker hosts. For tests, set the broker to
+# "memory://", the result backend to "cache+memory://" and
+# CELERY_TASK_ALWAYS_EAGER=1 to run jobs in-process.
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://127.0.0.1:6379/0")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://127.0.0.1:6379/0")
+CELERY_RESULT_EXPIRES = int(os.getenv("CELERY_RESULT_EXPIRES", 60 * 60 * 24))
+CELERY_TASK_TRACK_STARTED = True
+CELERY_TASK_ALWAYS_EAGER = os.getenv("CELERY_TASK_ALWAYS_EAGER") == "1"
+CELERY_TASK_STORE_EAGER_RESULT = True
+# Jobs are retried while the LLM is busy, then fail with a 503 error.
+STUDY_BUDDY_JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", 20))
+
+# Maximum number of concurrent extractions / LLM calls of a batch request.
+STUDY_BUDDY_BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+
+# Admission control for LLM calls. Limits apply per process: size them so that
+# MAX_CONCURRENCY times the number of workers matches OLLAMA_NUM_PARALLEL.
+# INTERACTIVE_RESERVED slots are kept free for chat requests, and requests are
+# rejected with a 503 and Retry-After once MAX_QUEUE_DEPTH requests are waiting.
+# MODEL_CONCURRENCY optionally caps individual models, e.g. {"llama3.1": 2}.
+STUDY_BUDDY_LLM_SCHEDULER = {
+    "MAX_CONCURRENCY": int(os.getenv("LLM_MAX_CONCURRENCY", 4)),
+    "MODEL_CONCURRENCY": {},
+    "INTERACTIVE_RESERVED": int(os.getenv("LLM_INTERACTIVE_RESERVED", 1)),
+    "MAX_QUEUE_DEPTH": int(os.getenv("LLM_MAX_QUEUE_DEPTH", 64)),
+    "RETRY_AFTER": int(os.getenv("LLM_RETRY_AFTER", 5)),
+}
+
+# Shared Ollama client. Models listed in WARM_UP_MODELS are loaded when the
+# server or a Celery worker starts, and KEEP_ALIVE is sent with every request so
+# they stay resident (use "-1m" to never unload them). GET /study_buddy_api/models/
+# lists the models currently loaded.
+STUDY_BUDDY_OLLAMA_CLIENT = {
+    "HOST": os.getenv("OLLAMA_HOST"),
+    "TIMEOUT": float(os.getenv("OLLAMA_TIMEOUT", 300)),
+    "CONNECT_TIMEOUT": float(os.getenv("OLLAMA_CONNECT_TIMEOUT", 5)),
+    "MAX_CONNECTIONS": int(os.getenv("OLLAMA_MAX_CONNECTIONS", 32)),
+    "KEEP_ALIVE": os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+    "WARM_UP_MODELS": os.getenv("OLLAMA_WARM_UP_MODELS", "llama3.1").split(","),
+    "WARM_UP_ON_STARTUP": os.getenv("OLLAMA_WARM_UP_ON_STARTUP", "1") == "1",
+}
+
+# Quiz generation. When the model returns fewer valid questions than requested,
+# up to MAX_TOP_UPS follow-up generations ask for the missing ones only.
+STUDY_BUDDY_QUIZ_GENERATION = {
+    "MAX_TOP_UPS": int(os.getenv("QUIZ_MAX_TOP_UPS", 2)),
+}
+
+# Chat history sent to the model: the system prompt, a rolling summary of older
+# messages and the most recent messages, within MAX_TOKENS (estimated). Summaries
+# are generated in the background and cached by the messages they cover; use the
+# "redis" BACKEND to share them between workers.
+STUDY_BUDDY_CHAT_HISTORY = {
+    "MAX_TOKENS": int(os.getenv("CHAT_HISTORY_MAX_TOKENS", 1536)),
+    "SUMMARY_TOKENS": int(os.getenv("CHAT_HISTORY_SUMMARY_TOKENS", 256)),
+    "FOLD_STEP": int(os.getenv("CHAT_HISTORY_FOLD_STEP", 4)),
+    "BACKEND": os.getenv("CHAT_HISTORY_BACKEND", "local"),
+    "LOCATION": os.getenv("CHAT_HISTORY_LOCATION", "redis://127.0.0.1:6379/1"),
+    "TIMEOUT": int(os.getenv("CHAT_HISTORY_TIMEOUT", 60 * 60 * 24)),
+}
+
+# Number of stored messages loaded for every turn of a server-side chat session,
+# before the STUDY_BUDDY_CHAT_HISTORY budget is applied.
+STUDY_BUDDY_CHAT_SESSION_MESSAGES = int(os.getenv("CHAT_SESSION_MESSAGES", 100))
+
+# Semantic cache for single-turn chat questions and quizzes on short topics:
+# requests are embedded with MODEL (pull it with `ollama pull`) and served a
+# cached answer when a previous request of the same context reaches THRESHOLD
+# cosine similarity. The index is kept in memory, per process.
+STUDY_BUDDY_SEMANTIC_CACHE = {
+    "ENABLED": os.getenv("SEMANTIC_CACHE_ENABLED") == "1",
+    "MODEL": os.getenv("SEMANTIC_CACHE_MODEL", "nomic-embed-text"),
+    "THRESHOLD": float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92)),
+    "MAX_ENTRIES": int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 1024)),
+    "TIMEOUT": int(os.getenv("SEMANTIC_CACHE_TIMEOUT", 60 * 60 * 24)),
+}
+
+# On-disk vector index of the documents uploaded for chat. Share DIRECTORY
+# between all web and worker hosts, like MEDIA_ROOT. Documents are split into
+# CHUNK_TOKENS chunks embedded with MODEL, and the TOP_K chunks most relevant to
+# a chat message are added to the prompt.
+STUDY_BUDDY_DOCUMENT_INDEX = {
+    "DIRECTORY": os.getenv(
+        "DOCUMENT_INDEX_DIRECTORY", os.path.join(MEDIA_ROOT, "document_index")
+    ),
+    "MODEL": os.getenv("DOCUMENT_INDEX_MODEL", "nomic-embed-text"),
+    "CHUNK_TOKENS": int(os.getenv("DOCUMENT_INDEX_CHUNK_TOKENS", 200)),
+    "BATCH_SIZE": int(os.getenv("DOCUMENT_INDEX_BATCH_SIZE", 32)),
+    "TOP_K": int(os.getenv("DOCUMENT_INDEX_TOP_K", 4)),
+}
+
+# Per-stage request timing (upload parsing, text extraction, LLM queueing and
+# generation, quiz parsing). When enabled, responses carry a Server-Timing header
+# and latency histograms are exported in the Prometheus format at /metrics. Set
+# SERVER_TIMING_HEADER to False to keep the timings out of public responses.
+STUDY_BUDDY_REQUEST_TIMING = {
+    "ENABLED": os.getenv("REQUEST_TIMING_ENABLED") == "1",
+    "SERVER_TIMING_HEADER": os.getenv("SERVER_TIMING_HEADER", "1") == "1",
+}
+
+# Model routing: every task (endpoint, or `endpoint:variant` for a summary type,
+# note level or quiz mode) is served by a model tier, see
+# study_buddy_api.routing.DEFAULT_MODEL_ROUTING for the default routes. Set
+# LLM_SMALL_MODEL to a fast model (e.g. llama3.2:3b) for brief, paraphrase and
+# flashcard work, and add it to OLLAMA_WARM_UP_MODELS. Once FALLBACK_QUEUE_DEPTH
+# generations are queued, every task falls back to FALLBACK_TIER.
+STUDY_BUDDY_MODEL_ROUTING = {
+    "TIERS": {
+        "small": os.getenv("LLM_SMALL_MODEL", "llama3.1"),
+        "large": os.getenv("LLM_LARGE_MODEL", "llama3.1"),
+    },
+    "FALLBACK_TIER": "small",
+    "FALLBACK_QUEUE_DEPTH": int(os.getenv("LLM_FALLBACK_QUEUE_DEPTH", 16)),
+}
+
+# Ollama host pool. Set OLLAMA_HOSTS to a comma-separated list of Ollama servers
+# to spread generations over them (OLLAMA_HOST is used when it is empty). Each
+# request goes to the host with the fewest requests in progress, preferring hosts
+# that already have its model loaded; the turns of a chat session stick to one
+# host so that Ollama reuses its prompt cache. Failing hosts are ejected for
+# EJECT_DURATION seconds and their requests retried on another host. Raise
+# LLM_MAX_CONCURRENCY along with the number of hosts.
+STUDY_BUDDY_OLLAMA_POOL = {
+    "HOSTS": [host for host in os.getenv("OLLAMA_HOSTS", "").split(",") if host],
+    "MAX_ATTEMPTS": int(os.getenv("OLLAMA_MAX_ATTEMPTS", 2)),
+    "AFFINITY_MAX_EXTRA_LOAD": int(os.getenv("OLLAMA_AFFINITY_MAX_EXTRA_LOAD", 2)),
+    "EJECT_DURATION": float(os.getenv("OLLAMA_EJECT_DURATION", 30)),
+    "HEALTH_CHECK_INTERVAL": float(os.getenv("OLLAMA_HEALTH_CHECK_INTERVAL", 10)),
+}
+
+# Single-flight: concurrent requests for the same generation (same model, prompt
+# and extracted text, or same quiz) wait for the first one and share its result
+# instead of queueing identical generations. The "local" backend coalesces
+# requests within a process; "redis" also coalesces them across workers through
+# a lock and a short-lived result in Redis.
+STUDY_BUDDY_SINGLE_FLIGHT = {
+    "ENABLED": os.getenv("SINGLE_FLIGHT_ENABLED", "1") == "1",
+    "BACKEND": os.getenv("SINGLE_FLIGHT_BACKEND", "local"),
+    "LOCATION": os.getenv("SINGLE_FLIGHT_LOCATION", "redis://127.0.0.1:6379/1"),
+}
+
+# Request deadlines: clients may send an X-Request-Timeout header (seconds, capped
+# at MAX_TIMEOUT), otherwise the endpoint's timeout applies. Requests still queued
+# for the model at their deadline are dropped, and generations running past it
+# are stopped; both return a 504. Async views are also cancelled when the client
+# disconnects.
+STUDY_BUDDY_REQUEST_DEADLINES = {
+    "ENABLED": os.getenv("REQUEST_DEADLINES_ENABLED", "1") == "1",
+    "DEFAULT_TIMEOUT": float(os.getenv("REQUEST_DEFAULT_TIMEOUT", 300)),
+    "TIMEOUTS": {
+        "chat": float(os.getenv("CHAT_REQUEST_TIMEOUT", 120)),
+        "paraphrase": float(os.getenv("PARAPHRASE_REQUEST_TIMEOUT", 120)),
+    },
+    "MAX_TIMEOUT": float(os.getenv("REQUEST_MAX_TIMEOUT", 900)),
+}
@@ -0,0 +1,79 @@
+"""
+Settings of the test suite:
+
+    python manage.py test --settings=Ensuite.test_settings
+
+Tests run against an in-memory database, in-process caches, eager Celery tasks
+and the fake Ollama servers of `benchmarks.fake_ollama`, so they need neither
+the configured database nor Redis nor Ollama.
+"""
+
+import os
+import tempfile
+
+from .settings import *  # noqa: F401, F403
+from .settings import (
+    STUDY_BUDDY_CHAT_HISTORY,
+    STUDY_BUDDY_DOCUMENT_INDEX,
+    STUDY_BUDDY_LLM_CACHE,
+    STUDY_BUDDY_OLLAMA_CLIENT,
+    STUDY_BUDDY_OLLAMA_POOL,
+    STUDY_BUDDY_REQUEST_TIMING,
+    STUDY_BUDDY_SEMANTIC_CACHE,
+    STUDY_BUDDY_SINGLE_FLIGHT,
+    STUDY_BUDDY_TRANSCRIPT_CACHE,
+)
+
+
+TEST_DIR = os.path.join(tempfile.gettempdir(), "study_buddy_tests")
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+    }
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+}
+
+MEDIA_ROOT = os.path.join(TEST_DIR, "media")
+
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+    },
+}
+
+CELERY_BROKER_URL = "memory://"
+CELERY_RESULT_BACKEND = "cache+memory://"
+CELERY_TASK_ALWAYS_EAGER = True
+
+STUDY_BUDDY_LLM_CACHE = {**STUDY_BUDDY_LLM_CACHE, "BACKEND": "local"}
+STUDY_BUDDY_TRANSCRIPT_CACHE = {**STUDY_BUDDY_TRANSCRIPT_CACHE, "BACKEND": "local"}
+STUDY_BUDDY_CHAT_HISTORY = {**STUDY_BUDDY_CHAT_HISTORY, "BACKEND": "local"}
+STUDY_BUDDY_SEMANTIC_CACHE = {**STUDY_BUDDY_SEMANTIC_CACHE, "ENABLED": False}
+STUDY_BUDDY_SINGLE_FLIGHT = {
+    **STUDY_BUDDY_SINGLE_FLIGHT,
+    "ENABLED": True,
+    "BACKEND": "local",
+}
+STUDY_BUDDY_REQUEST_TIMING = {**STUDY_BUDDY_REQUEST_TIMING, "ENABLED": False}
+STUDY_BUDDY_DOCUMENT_INDEX = {
+    **STUDY_BUDDY_DOCUMENT_INDEX,
+    "DIRECTORY": os.path.join(TEST_DIR, "document_index"),
+}
+
+# Tests point the pool at their own fake Ollama servers.
+STUDY_BUDDY_OLLAMA_CLIENT = {
+    **STUDY_BUDDY_OLLAMA_CLIENT,
+    "HOST": None,
+    "WARM_UP_ON_STARTUP": False,
+}
+STUDY_BUDDY_OLLAMA_POOL = {
+    **STUDY_BUDDY_OLLAMA_POOL,
+    "HOSTS": [],
+    "HEALTH_CHECK_INTERVAL": 0,
+}
@@ -1,7 +1,17 @@
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
+
+from study_buddy_api.metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+from study_buddy_api.timing import get_request_timing_setting
 
 
 def home(request):
     return HttpResponse(
         "<h1>Welcome to Ensuite Study Buddy!</h1><p>This is the homepage.</p>"
     )
+
+
+def metrics(request):
+    if not get_request_timing_setting("ENABLED"):
+        raise Http404
+
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
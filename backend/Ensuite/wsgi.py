@@ -15,3 +15,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Ensuite.settings')
 
 application = get_wsgi_application()
+
+from study_buddy_api.ollama_client import start_warm_up  # noqa: E402
+
+# Preload the models in the background so the first requests don't pay for it.
+start_warm_up()
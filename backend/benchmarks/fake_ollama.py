@@ -0,0 +1,255 @@
+"""
+Stub Ollama HTTP server for benchmarks and load tests.
+
+Implements the endpoints used by the API (`/api/chat`, `/api/embed`,
+`/api/generate`, `/api/ps`) with a configurable token rate, first-token delay
+and failure rate, so that the API can be measured without a live model. JSON
+mode quiz requests get valid questions, in the number asked for by the prompt.
+Every server tracks the models it was asked for as loaded, so that several of
+them can stand in for a pool of Ollama hosts.
+
+Usage:
+    python benchmarks/fake_ollama.py --port 11500 --tokens-per-second 50
+    OLLAMA_HOST=http://127.0.0.1:11500 python manage.py runserver
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+WORDS = (
+    "photosynthesis converts light energy into chemical energy stored in glucose "
+    "and takes place in the chloroplasts of plant cells releasing oxygen"
+).split()
+
+QUESTION_COUNT_PATTERN = re.compile(r"(?:Create|Generate) (\d+)")
+
+EMBEDDING_DIMENSIONS = 768
+
+
+class FakeOllamaConfig:
+    def __init__(
+        self,
+        tokens_per_second: float = 50.0,
+        first_token_delay: float = 0.2,
+        response_tokens: int = 120,
+        failure_rate: float = 0.0,
+        embed_delay: float = 0.01,
+        loaded_models: tuple = ("llama3.1",),
+    ):
+        self.tokens_per_second = tokens_per_second
+        self.first_token_delay = first_token_delay
+        self.response_tokens = response_tokens
+        self.failure_rate = failure_rate
+        self.embed_delay = embed_delay
+        self.loaded_models = loaded_models
+
+
+def normalize_model_name(model: str) -> str:
+    return model if ":" in model else f"{model}:latest"
+
+
+def build_quiz_json(question_count: int, multiple_choice: bool) -> str:
+    questions = []
+    for number in range(1, question_count + 1):
+        question = {"question": f"Question {number} about photosynthesis?"}
+        if multiple_choice:
+            question["options"] = ["Light", "Water", "Oxygen", "Glucose"]
+            question["answer"] = 1 + number % 4
+        else:
+            question["answer"] = "Light energy is converted into chemical energy."
+        questions.append(question)
+    return json.dumps({"questions": questions})
+
+
+def build_response_tokens(body: dict, response_tokens: int) -> list:
+    """
+    Split the response to a chat request into tokens.
+    """
+    if body.get("format") == "json":
+        prompt = body["messages"][-1]["content"]
+        match = QUESTION_COUNT_PATTERN.search(prompt)
+        multiple_choice = any(
+            '"options"' in message["content"] for message in body["messages"]
+        )
+        text = build_quiz_json(int(match[1]) if match else 5, multiple_choice)
+        return [text[i : i + 4] for i in range(0, len(text), 4)]
+
+    return [
+        f"{WORDS[i % len(WORDS)]} " if i < response_tokens - 1 else "end."
+        for i in range(response_tokens)
+    ]
+
+
+def fake_embedding(text: str) -> list:
+    # Deterministic so that identical texts get identical vectors.
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "big")
+    generator = random.Random(seed)
+    return [generator.uniform(-1, 1) for _ in range(EMBEDDING_DIMENSIONS)]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    config = FakeOllamaConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, data: dict, status: int = 200):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _should_fail(self) -> bool:
+        return random.random() < self.config.failure_rate
+
+    def do_GET(self):
+        if self.path == "/api/ps":
+            expires_at = datetime.now(timezone.utc) + timedelta(minutes=30)
+            self._send_json(
+                {
+                    "models": [
+                        {
+                            "name": model,
+                            "model": model,
+                            "size": 6_000_000_000,
+                            "size_vram": 6_000_000_000,
+                            "expires_at": expires_at.isoformat(),
+                        }
+                        for model in sorted(self.server.loaded_models)
+                    ]
+                }
+            )
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        body = self._read_body()
+
+        if self._should_fail():
+            self._send_json({"error": "injected failure"}, 500)
+            return
+
+        if model := body.get("model"):
+            self.server.loaded_models.add(normalize_model_name(model))
+
+        if self.path == "/api/chat":
+            self._chat(body)
+        elif self.path == "/api/embed":
+            time.sleep(self.config.embed_delay)
+            inputs = body.get("input", "")
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._send_json(
+                {
+                    "model": body.get("model"),
+                    "embeddings": [fake_embedding(text) for text in inputs],
+                }
+            )
+        elif self.path == "/api/generate":
+            self._send_json({"model": body.get("model"), "response": "", "done": True})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _chat(self, body: dict):
+        tokens = build_response_tokens(body, self.config.response_tokens)
+        token_delay = 1 / self.config.tokens_per_second
+        time.sleep(self.config.first_token_delay)
+
+        def chunk(content: str, done: bool) -> dict:
+            return {
+                "model": body.get("model"),
+                "message": {"role": "assistant", "content": content},
+                "done": done,
+            }
+
+        if not body.get("stream", True):
+            time.sleep(token_delay * len(tokens))
+            try:
+                self._send_json(chunk("".join(tokens), True))
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped waiting for the response.
+                self.close_connection = True
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            for token in tokens:
+                self._write_chunk(json.dumps(chunk(token, False)) + "\n")
+                time.sleep(token_delay)
+            self._write_chunk(json.dumps(chunk("", True)) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped the generation.
+            self.close_connection = True
+
+    def _write_chunk(self, data: str):
+        payload = data.encode("utf-8")
+        self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+        self.wfile.flush()
+
+
+def start_server(host: str, port: int, config: FakeOllamaConfig) -> ThreadingHTTPServer:
+    """
+    Start the stub server in a background thread.
+    """
+    handler = type("ConfiguredHandler", (FakeOllamaHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.loaded_models = {
+        normalize_model_name(model) for model in config.loaded_models
+    }
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+
+
+def config_from_arguments(args) -> FakeOllamaConfig:
+    return FakeOllamaConfig(
+        tokens_per_second=args.tokens_per_second,
+        first_token_delay=args.first_token_delay,
+        response_tokens=args.response_tokens,
+        failure_rate=args.failure_rate,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_server(args.host, args.port, config_from_arguments(args))
+    print(f"Fake Ollama listening on http://{args.host}:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+"""
+Load test the API endpoints against a local fake Ollama server.
+
+Starts `benchmarks/fake_ollama.py` in-process and the Django app in a
+subprocess, then drives each endpoint with realistic payloads (long chat
+histories, large texts and PDFs) at the given concurrency. Reports p50/p95/p99
+latency, requests per second, errors and the peak RSS of the app per endpoint,
+and saves the results as JSON so that runs can be compared.
+
+The LLM response cache is disabled in the app so every request reaches the fake
+model. The endpoints exercised don't use the database, but point `--settings`
+at a local database anyway rather than a shared one.
+
+Usage:
+    python benchmarks/load_test.py --concurrency 8 --requests 50 --output run.json
+    python benchmarks/load_test.py --endpoints chat quiz --compare run.json
+    python benchmarks/load_test.py --app-url http://127.0.0.1:8000 --app-pid 1234
+    python benchmarks/load_test.py --ollama-hosts 3 --endpoints summarize
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_ollama import (  # noqa: E402
+    add_config_arguments,
+    config_from_arguments,
+    start_server,
+)
+from benchmarks.pdf_extraction import PARAGRAPH, build_pdf  # noqa: E402
+
+
+API_PREFIX = "/study_buddy_api"
+
+
+def build_text(word_count: int) -> str:
+    words = PARAGRAPH.split()
+    return " ".join(words[i % len(words)] for i in range(word_count))
+
+
+def build_history(message_count: int, words_per_message: int) -> list:
+    return [
+        {
+            "role": "user" if index % 2 == 0 else "assistant",
+            "content": f"{index}: " + build_text(words_per_message),
+        }
+        for index in range(message_count)
+    ] + [{"role": "user", "content": "Can you sum up what we discussed?"}]
+
+
+def build_scenarios(args) -> dict:
+    """
+    Build the request of every scenario, as `(path, httpx request kwargs)`.
+    """
+    text = build_text(args.text_words)
+    with tempfile.TemporaryDirectory() as directory:
+        with open(build_pdf(directory, args.pdf_pages), "rb") as pdf_file:
+            pdf = pdf_file.read()
+
+    def pdf_upload():
+        return {"file": ("document.pdf", pdf, "application/pdf")}
+
+    return {
+        "chat": (
+            "/chat/",
+            lambda: {
+                "json": {
+                    "history": build_history(args.history_messages, 60),
+                    "context": "study_buddy",
+                }
+            },
+        ),
+        "summarize": (
+            "/summarize/",
+            lambda: {"data": {"text": text, "summary_type": "brief"}},
+        ),
+        "summarize_pdf": (
+            "/summarize/",
+            lambda: {"data": {"summary_type": "detailed"}, "files": pdf_upload()},
+        ),
+        "note": ("/note/", lambda: {"data": {"text": text, "level": "2"}}),
+        "note_pdf": ("/note/", lambda: {"data": {"level": "3"}, "files": pdf_upload()}),
+        "paraphrase": (
+            "/paraphrase/",
+            lambda: {"data": {"text": text, "tone": "formal"}},
+        ),
+        "quiz": (
+            "/quiz/",
+            lambda: {
+                "data": {
+                    "text": "Photosynthesis",
+                    "mode": "multiple_choice",
+                    "question_count": args.question_count,
+                }
+            },
+        ),
+    }
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Nearest-rank percentile of a non-empty list.
+    """
+    ordered = sorted(values)
+    rank = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def read_rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class RSSSampler:
+    """
+    Sample the resident set size of a process in the background, keeping the
+    peak.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, read_rss_bytes(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self.pid:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def send_request(client: httpx.Client, path: str, kwargs: dict, stream: bool):
+    """
+    Send one request, returning `(latency, time to first byte, error)`.
+    """
+    headers = {"Accept": "text/event-stream"} if stream else {}
+    started_at = time.perf_counter()
+    first_byte_at = None
+    chunks = []
+
+    try:
+        with client.stream(
+            "POST", API_PREFIX + path, headers=headers, **kwargs
+        ) as response:
+            for chunk in response.iter_bytes():
+                if first_byte_at is None and chunk:
+                    first_byte_at = time.perf_counter()
+                chunks.append(chunk)
+        finished_at = time.perf_counter()
+
+        if response.status_code >= 400:
+            return finished_at - started_at, None, f"HTTP {response.status_code}"
+        if stream and b"event: error" in b"".join(chunks):
+            return finished_at - started_at, None, "error event"
+    except httpx.HTTPError as e:
+        return time.perf_counter() - started_at, None, type(e).__name__
+
+    return (
+        finished_at - started_at,
+        (first_byte_at or finished_at) - started_at,
+        None,
+    )
+
+
+def run_scenario(base_url: str, path: str, build_kwargs, args, pid: int) -> dict:
+    latencies, first_bytes, errors = [], [], {}
+    lock = threading.Lock()
+    local = threading.local()
+    timeout = httpx.Timeout(args.timeout, connect=5)
+
+    def worker(_):
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(base_url=base_url, timeout=timeout)
+        latency, first_byte, error = send_request(
+            local.client, path, build_kwargs(), args.stream
+        )
+        with lock:
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+            else:
+                latencies.append(latency)
+                first_bytes.append(first_byte)
+
+    with RSSSampler(pid) as sampler, ThreadPoolExecutor(args.concurrency) as pool:
+        started_at = time.perf_counter()
+        list(pool.map(worker, range(args.requests)))
+        duration = time.perf_counter() - started_at
+
+    result = {
+        "requests": args.requests,
+        "errors": sum(errors.values()),
+        "error_types": errors,
+        "duration": duration,
+        "rps": len(latencies) / duration,
+        "peak_rss_bytes": sampler.peak or None,
+    }
+    if latencies:
+        result.update(
+            {
+                "p50": percentile(latencies, 0.50),
+                "p95": percentile(latencies, 0.95),
+                "p99": percentile(latencies, 0.99),
+                "mean": statistics.fmean(latencies),
+            }
+        )
+        if args.stream:
+            result["ttfb_p50"] = percentile(first_bytes, 0.50)
+            result["ttfb_p95"] = percentile(first_bytes, 0.95)
+    return result
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_app(port: int, ollama_urls: list, args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": args.settings,
+        "OLLAMA_HOST": ollama_urls[0],
+        "OLLAMA_HOSTS": ",".join(ollama_urls),
+        "OLLAMA_WARM_UP_ON_STARTUP": "0",
+        "PYTHONPATH": os.pathsep.join(
+            filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")])
+        ),
+    }
+    if not args.llm_cache:
+        env["LLM_CACHE_BACKEND"] = ""
+
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", str(port)],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+def serve(port: int):
+    """
+    Serve the app with Django's threaded development server, without the
+    autoreloader and system checks of `runserver`.
+    """
+    import logging
+
+    from django.core.servers.basehttp import run
+
+    from Ensuite.wsgi import application
+
+    # Don't log every request.
+    logging.getLogger("django.server").setLevel(logging.WARNING)
+    run("127.0.0.1", port, application, threading=True)
+
+
+def wait_until_ready(base_url: str, app: subprocess.Popen, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if app is not None and app.poll() is not None:
+            raise RuntimeError("The app exited during start-up.")
+        try:
+            httpx.get(base_url + API_PREFIX + "/models/", timeout=2)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"The app did not start within {timeout} seconds.")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Print the change of every metric against a previous run, returning the
+    regressions beyond `tolerance`.
+    """
+    regressions = []
+    print(f"\n{'endpoint':<14} {'p95 before':>11} {'p95 after':>10} {'change':>8}")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if not before or "p95" not in before or "p95" not in result:
+            continue
+
+        change = result["p95"] / before["p95"] - 1
+        print(
+            f"{name:<14} {before['p95'] * 1000:>9.0f}ms "
+            f"{result['p95'] * 1000:>8.0f}ms {change:>+7.1%}"
+        )
+        if change > tolerance:
+            regressions.append(f"{name}: p95 {change:+.1%}")
+        if result["errors"] > before["errors"]:
+            regressions.append(
+                f"{name}: {result['errors']} errors, {before['errors']} before"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--endpoints", nargs="+")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--history-messages", type=int, default=60)
+    parser.add_argument("--text-words", type=int, default=3000)
+    parser.add_argument("--pdf-pages", type=int, default=100)
+    parser.add_argument("--question-count", type=int, default=10)
+    parser.add_argument("--settings", default="Ensuite.settings")
+    parser.add_argument("--llm-cache", action="store_true")
+    parser.add_argument("--app-url", help="Benchmark an already running app.")
+    parser.add_argument("--app-pid", type=int, help="Process to sample RSS from.")
+    parser.add_argument("--ollama-port", type=int, default=0)
+    parser.add_argument(
+        "--ollama-hosts", type=int, default=1, help="Fake Ollama servers to pool."
+    )
+    parser.add_argument("--output")
+    parser.add_argument("--compare", help="Results of a previous run.")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    scenarios = build_scenarios(args)
+    for name in args.endpoints or []:
+        if name not in scenarios:
+            parser.error(f"Unknown endpoint {name}, choose from {', '.join(scenarios)}")
+
+    # Only the first server listens on --ollama-port, the others on free ports.
+    fake_ollamas = [
+        start_server(
+            "127.0.0.1", args.ollama_port if i == 0 else 0, config_from_arguments(args)
+        )
+        for i in range(args.ollama_hosts)
+    ]
+    ollama_urls = [
+        "http://127.0.0.1:%d" % server.server_address[1] for server in fake_ollamas
+    ]
+
+    app = None
+    if args.app_url:
+        base_url, pid = args.app_url.rstrip("/"), args.app_pid
+    else:
+        port = get_free_port()
+        app = start_app(port, ollama_urls, args)
+        base_url, pid = f"http://127.0.0.1:{port}", app.pid
+
+    results = {}
+    try:
+        wait_until_ready(base_url, app)
+
+        print(
+            f"{'endpoint':<14} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>7} "
+            f"{'errors':>7} {'peak RSS':>9}"
+        )
+        for name in args.endpoints or scenarios:
+            path, build_kwargs = scenarios[name]
+            result = results[name] = run_scenario(
+                base_url, path, build_kwargs, args, pid
+            )
+            latencies = " ".join(
+                f"{result[key] * 1000:>6.0f}ms" if key in result else f"{'-':>8}"
+                for key in ("p50", "p95", "p99")
+            )
+            rss = (
+                f"{result['peak_rss_bytes'] / 2**20:>7.0f}MB"
+                if result["peak_rss_bytes"]
+                else f"{'-':>9}"
+            )
+            print(
+                f"{name:<14} {latencies} {result['rps']:>7.1f} "
+                f"{result['errors']:>7} {rss}"
+            )
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait()
+        for server in fake_ollamas:
+            server.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(
+                {
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "config": {
+                        key: value
+                        for key, value in vars(args).items()
+                        if key not in ("serve", "output", "compare")
+                    },
+                    "results": results,
+                },
+                output_file,
+                indent=2,
+            )
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
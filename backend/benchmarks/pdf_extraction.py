@@ -0,0 +1,94 @@
+"""
+Benchmark PDF text extraction throughput (pages per second) against page count.
+
+Compares the previous serial implementation (string concatenation) with the
+page-parallel engine in `study_buddy_api.pdf_extraction`.
+
+Usage:
+    python benchmarks/pdf_extraction.py --pages 10 100 500 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from study_buddy_api.pdf_extraction import extract_pdf_text  # noqa: E402
+
+
+PARAGRAPH = (
+    "Photosynthesis converts light energy into chemical energy stored in glucose. "
+    "It takes place in the chloroplasts of plant cells and releases oxygen. "
+)
+
+
+def build_pdf(directory: str, page_count: int) -> str:
+    """
+    Write a PDF of `page_count` pages of text in `directory`, returning its path.
+    """
+    document = fitz.open()
+    for page_num in range(page_count):
+        page = document.new_page()
+        page.insert_textbox(
+            fitz.Rect(50, 50, 550, 800), f"Page {page_num}\n" + PARAGRAPH * 20
+        )
+    path = os.path.join(directory, f"{page_count}.pdf")
+    document.save(path)
+    return path
+
+
+def extract_naive(path: str) -> str:
+    pdf_document = fitz.open(path)
+    all_text = ""
+    for page_num in range(pdf_document.page_count):
+        page = pdf_document.load_page(page_num)
+        if page.get_images(full=True):
+            raise ValueError("PDF contains images")
+        all_text += page.get_text("text")
+    return all_text
+
+
+def measure(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started_at)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200, 500])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--min-pages-per-worker", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Warm up the worker pool so process start-up is not counted.
+        warm_up_path = build_pdf(directory, args.min_pages_per_worker * 2)
+        extract_pdf_text(warm_up_path, args.workers, 1)
+
+        print(f"{'pages':>6} {'naive p/s':>12} {'engine p/s':>12} {'speed-up':>9}")
+        for page_count in args.pages:
+            path = build_pdf(directory, page_count)
+            naive = measure(lambda: extract_naive(path), args.repeat)
+            engine = measure(
+                lambda: extract_pdf_text(path, args.workers, args.min_pages_per_worker),
+                args.repeat,
+            )
+            print(
+                f"{page_count:>6} {page_count / naive:>12.0f} "
+                f"{page_count / engine:>12.0f} {naive / engine:>8.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
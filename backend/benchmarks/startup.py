@@ -0,0 +1,310 @@
+"""
+Benchmark the import time and cold start of the app.
+
+Import time: runs fresh interpreters that set up Django, load the URLconf (and
+with it every view) and import the Celery tasks, timing each stage, and checks
+that heavy dependencies (PyMuPDF, Ollama, NumPy...) are not loaded at startup
+but on first use. `--top` lists the slowest top-level imports, from
+`python -X importtime`.
+
+Cold start: starts the app under each server (Django's WSGI server, uvicorn and
+daphne, when installed) against a local fake Ollama server, and measures the
+time from spawning the process until it accepts connections and until it has
+served its first API response.
+
+Usage:
+    python benchmarks/startup.py --runs 5 --top 15
+    python benchmarks/startup.py --servers uvicorn daphne --output startup.json
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+API_PREFIX = "/study_buddy_api"
+
+# Dependencies that are only imported by the code paths that need them.
+LAZY_MODULES = (
+    "fitz",
+    "pymupdf",
+    "ollama",
+    "httpx",
+    "youtube_transcript_api",
+    "numpy",
+    "celery.result",
+)
+
+# Prints the duration of every stage, and the lazy modules it loaded, as JSON.
+IMPORT_SCRIPT = """
+import json, sys, time
+
+stages = {}
+started_at = time.perf_counter()
+
+import django
+django.setup()
+stages["django_setup"] = time.perf_counter() - started_at
+
+from django.urls import get_resolver
+get_resolver().url_patterns
+stages["urlconf"] = time.perf_counter() - started_at
+
+import study_buddy_api.tasks
+stages["celery_tasks"] = time.perf_counter() - started_at
+
+print(json.dumps({
+    "stages": stages,
+    "loaded": [name for name in sys.argv[1:] if name in sys.modules],
+}))
+"""
+
+SERVERS = {
+    "wsgi": lambda port: [
+        sys.executable,
+        "-c",
+        "import sys\n"
+        "from django.core.servers.basehttp import run\n"
+        "from Ensuite.wsgi import application\n"
+        "run('127.0.0.1', int(sys.argv[1]), application, threading=True)",
+        str(port),
+    ],
+    "uvicorn": lambda port: [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "Ensuite.asgi:application",
+        "--port",
+        str(port),
+        "--log-level",
+        "warning",
+    ],
+    "daphne": lambda port: [
+        sys.executable,
+        "-m",
+        "daphne",
+        "-p",
+        str(port),
+        "Ensuite.asgi:application",
+    ],
+}
+
+
+def get_env(args, ollama_url: str = None) -> dict:
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": args.settings,
+        "OLLAMA_WARM_UP_ON_STARTUP": "0",
+        "PYTHONPATH": os.pathsep.join(
+            filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")])
+        ),
+    }
+    if ollama_url:
+        env["OLLAMA_HOST"] = env["OLLAMA_HOSTS"] = ollama_url
+    return env
+
+
+def summarize(values: list) -> dict:
+    return {"median": statistics.median(values), "min": min(values)}
+
+
+def measure_imports(args) -> dict:
+    """
+    Time the import stages in `args.runs` fresh interpreters.
+    """
+    runs = []
+    for _ in range(args.runs):
+        started_at = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT, *LAZY_MODULES],
+            cwd=BACKEND_DIR,
+            env=get_env(args),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        # Dependencies may print warnings, the JSON is on the last line.
+        run = json.loads(output.splitlines()[-1])
+        run["stages"]["process"] = time.perf_counter() - started_at
+        runs.append(run)
+
+    return {
+        "stages": {
+            name: summarize([run["stages"][name] for run in runs])
+            for name in runs[0]["stages"]
+        },
+        "loaded": sorted({name for run in runs for name in run["loaded"]}),
+    }
+
+
+def slowest_imports(args) -> list:
+    """
+    Get the top-level imports of the import stages, as `(module, seconds)`,
+    slowest first.
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SCRIPT],
+        cwd=BACKEND_DIR,
+        env=get_env(args),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    imports = []
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        # Nested imports are indented.
+        if fields[2].startswith("  "):
+            continue
+        imports.append((fields[2].strip(), int(fields[1]) / 1e6))
+
+    return sorted(imports, key=lambda item: item[1], reverse=True)[: args.top]
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def is_listening(port: int) -> bool:
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+            return True
+    except OSError:
+        return False
+
+
+def get_response(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def measure_cold_start(server: str, ollama_url: str, args) -> dict:
+    """
+    Start the app under `server`, and time how long until it listens and until
+    it serves its first response.
+    """
+    port = get_free_port()
+    started_at = time.perf_counter()
+    app = subprocess.Popen(
+        SERVERS[server](port),
+        cwd=BACKEND_DIR,
+        env=get_env(args, ollama_url),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started_at + args.timeout
+        while not is_listening(port):
+            if app.poll() is not None:
+                raise RuntimeError(f"The app exited during start-up under {server}.")
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"The app did not start under {server}.")
+            time.sleep(0.01)
+        listening = time.perf_counter() - started_at
+
+        status = get_response(f"http://127.0.0.1:{port}{API_PREFIX}{args.path}")
+        first_response = time.perf_counter() - started_at
+    finally:
+        app.terminate()
+        app.wait()
+
+    if status >= 500:
+        raise RuntimeError(f"The first response under {server} was a {status}.")
+    return {"listening": listening, "first_response": first_response}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0)
+    parser.add_argument(
+        "--servers", nargs="+", choices=list(SERVERS), default=list(SERVERS)
+    )
+    parser.add_argument("--path", default="/models/")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--settings", default="Ensuite.settings")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    imports = measure_imports(args)
+    print(f"{'import stage':<16} {'median':>8} {'min':>8}")
+    for name, timing in imports["stages"].items():
+        print(
+            f"{name:<16} {timing['median'] * 1000:>6.0f}ms {timing['min'] * 1000:>6.0f}ms"
+        )
+    print(f"Lazy modules loaded at startup: {', '.join(imports['loaded']) or 'none'}")
+
+    if args.top:
+        print(f"\n{'top-level import':<40} {'cumulative':>10}")
+        for module, seconds in slowest_imports(args):
+            print(f"{module:<40} {seconds * 1000:>8.0f}ms")
+
+    from benchmarks.fake_ollama import FakeOllamaConfig, start_server
+
+    fake_ollama = start_server("127.0.0.1", 0, FakeOllamaConfig())
+    ollama_url = "http://127.0.0.1:%d" % fake_ollama.server_address[1]
+
+    cold_starts = {}
+    try:
+        print(f"\n{'server':<10} {'listening':>10} {'first response':>15}")
+        for server in args.servers:
+            # Django's server is run with the interpreter, the others are optional.
+            if server != "wsgi" and importlib.util.find_spec(server) is None:
+                print(f"{server:<10} {'not installed':>10}")
+                continue
+
+            runs = [
+                measure_cold_start(server, ollama_url, args) for _ in range(args.runs)
+            ]
+            result = cold_starts[server] = {
+                name: summarize([run[name] for run in runs])
+                for name in ("listening", "first_response")
+            }
+            print(
+                f"{server:<10} {result['listening']['median'] * 1000:>8.0f}ms "
+                f"{result['first_response']['median'] * 1000:>13.0f}ms"
+            )
+    finally:
+        fake_ollama.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(
+                {
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "config": {
+                        key: value
+                        for key, value in vars(args).items()
+                        if key != "output"
+                    },
+                    "imports": imports,
+                    "cold_starts": cold_starts,
+                },
+                output_file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
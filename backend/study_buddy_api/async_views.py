@@ -0,0 +1,276 @@
+"""
+Async variants of the study buddy API views.
+
+These are plain Django async views (DRF's `GenericAPIView` is sync-only) meant to
+run under `ASGI_APPLICATION`, where an in-flight LLM call only holds an event loop
+task instead of a whole worker thread. Request validation reuses the DRF
+serializers so both request paths accept exactly the same payloads.
+
+Like the sync views, they stream the response as Server-Sent Events when asked
+to (see `study_buddy_api.streaming`), from async token iterators.
+
+Requests, streamed or not, are cancelled when their deadline passes or when the
+client disconnects (see `Ensuite.handlers`), which closes the Ollama stream and
+frees the scheduler slot of their generation.
+"""
+
+import asyncio
+import json
+
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, ParseError
+
+from .deadlines import (
+    DeadlineExceeded,
+    get_deadline,
+    get_remaining_time,
+    get_request_timeout,
+    start_deadline,
+    stream_with_deadline,
+)
+from .history import get_history_manager
+from .scheduler import Priority
+from .serializers import (
+    ChatSerializer,
+    NoteSerializer,
+    ParaphraseSerializer,
+    QuizSerializer,
+    SummarizeSerializer,
+)
+from .routing import route_model
+from .services import (
+    chat_semantic_lookup,
+    chat_system_message,
+    content_source_fields,
+    note_prompt_args,
+    paraphrase_prompt_args,
+    route_request_model,
+    summarize_prompt_args,
+)
+from .streaming import event_stream_response, wants_event_stream
+from .timing import stage
+from .utils import (
+    acreate_prompt_and_get_response,
+    acreate_prompt_and_stream_response,
+    agenerate_llm_response,
+    agenerate_quiz_questions,
+    aget_extracted_text_from_sources,
+    astream_llm_response,
+    astream_quiz_questions,
+)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """
+    Base class for the async API views.
+
+    Subclasses set `serializer_class` and `deadline_endpoint`, and implement
+    `handle`, which receives the validated data and returns the JSON response
+    body, and `stream`, which returns an async iterator of the `stream_event`
+    items of the response and the metadata of its final event.
+    """
+
+    http_method_names = ["post"]
+    serializer_class = None
+    deadline_endpoint = None
+    stream_event = "token"
+
+    @staticmethod
+    def get_request_data(request):
+        if request.content_type == "application/json":
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError as e:
+                raise ParseError(f"JSON parse error - {e}") from e
+
+        data = request.POST.copy()
+        data.update(request.FILES)
+        return data
+
+    async def post(self, request):
+        try:
+            start_deadline(get_request_timeout(request, self.deadline_endpoint))
+            # Multipart parsing may spool uploads to disk, keep it off the loop.
+            with stage("parse"):
+                data = await asyncio.to_thread(self.get_request_data, request)
+            serializer = self.serializer_class(data=data)
+            serializer.is_valid(raise_exception=True)
+            try:
+                if wants_event_stream(request):
+                    return await asyncio.wait_for(
+                        self.stream_response(serializer.validated_data),
+                        get_remaining_time(),
+                    )
+                return JsonResponse(
+                    await asyncio.wait_for(
+                        self.handle(serializer.validated_data), get_remaining_time()
+                    )
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded()
+        except APIException as e:
+            data = e.detail
+            if not isinstance(data, (list, dict)):
+                data = {"detail": data}
+            response = JsonResponse(data, status=e.status_code, safe=False)
+            if wait := getattr(e, "wait", None):
+                response["Retry-After"] = str(int(wait))
+            return response
+
+    async def stream_response(self, body: dict):
+        items, metadata = await self.stream(body)
+        response = event_stream_response(items, metadata, self.stream_event)
+        # The stream is consumed once the view has returned.
+        stream_with_deadline(response, get_deadline())
+        return response
+
+    async def handle(self, body: dict) -> dict:
+        raise NotImplementedError
+
+    async def stream(self, body: dict) -> tuple:
+        raise NotImplementedError
+
+
+class AsyncChatAPI(AsyncAPIView):
+
+    serializer_class = ChatSerializer
+    deadline_endpoint = "chat"
+
+    async def handle(self, body):
+        model = route_model("chat")
+        cached_response, store = await asyncio.to_thread(
+            chat_semantic_lookup, body, model
+        )
+        if cached_response is not None:
+            return {"data": cached_response, "model": model}
+
+        # Document retrieval and summary lookups block on I/O.
+        system_message = await asyncio.to_thread(chat_system_message, body)
+        prompts = await asyncio.to_thread(
+            get_history_manager().build_messages,
+            system_message,
+            body.get("history", []),
+        )
+
+        llm_response = await agenerate_llm_response(
+            prompts, model, use_cache=False, priority=Priority.INTERACTIVE
+        )
+        store(llm_response)
+
+        return {"data": llm_response, "model": model}
+
+    async def stream(self, body):
+        model = route_model("chat")
+        cached_response, store = await asyncio.to_thread(
+            chat_semantic_lookup, body, model
+        )
+
+        async def tokens():
+            if cached_response is not None:
+                yield cached_response
+                return
+
+            system_message = await asyncio.to_thread(chat_system_message, body)
+            prompts = await asyncio.to_thread(
+                get_history_manager().build_messages,
+                system_message,
+                body.get("history", []),
+            )
+            response = []
+            async for token in astream_llm_response(
+                prompts, model, use_cache=False, priority=Priority.INTERACTIVE
+            ):
+                response.append(token)
+                yield token
+            await asyncio.to_thread(store, "".join(response).strip())
+
+        return tokens(), {"model": model}
+
+
+class AsyncContentAPI(AsyncAPIView):
+    """
+    Generate from the extracted sources of the request, with the prompts of the
+    matching sync service (`prompt_args`).
+    """
+
+    prompt_args = None
+
+    async def handle(self, body):
+        model = route_request_model(self.deadline_endpoint, body)
+        llm_response, extracted_text = await acreate_prompt_and_get_response(
+            *self.prompt_args(body), model=model
+        )
+
+        source_fields = await asyncio.to_thread(
+            content_source_fields, body, extracted_text
+        )
+        return {"data": llm_response, "model": model, **source_fields}
+
+    async def stream(self, body):
+        model = route_request_model(self.deadline_endpoint, body)
+        tokens, extracted_text = await acreate_prompt_and_stream_response(
+            *self.prompt_args(body), model=model
+        )
+
+        source_fields = await asyncio.to_thread(
+            content_source_fields, body, extracted_text
+        )
+        return tokens, {"model": model, **source_fields}
+
+
+class AsyncParaphraseAPI(AsyncContentAPI):
+
+    serializer_class = ParaphraseSerializer
+    deadline_endpoint = "paraphrase"
+    prompt_args = staticmethod(paraphrase_prompt_args)
+
+
+class AsyncSummarizeAPI(AsyncContentAPI):
+
+    serializer_class = SummarizeSerializer
+    deadline_endpoint = "summarize"
+    prompt_args = staticmethod(summarize_prompt_args)
+
+
+class AsyncNoteAPI(AsyncContentAPI):
+
+    serializer_class = NoteSerializer
+    deadline_endpoint = "note"
+    prompt_args = staticmethod(note_prompt_args)
+
+
+class AsyncQuizAPI(AsyncAPIView):
+
+    serializer_class = QuizSerializer
+    deadline_endpoint = "quiz"
+    stream_event = "question"
+
+    async def handle(self, body):
+        topic = await aget_extracted_text_from_sources(body)
+        model = route_request_model("quiz", body)
+        llm_response = await agenerate_quiz_questions(
+            topic,
+            body["question_count"],
+            body["mode"],
+            body["generation_format"],
+            model,
+        )
+
+        return {"data": llm_response, "model": model}
+
+    async def stream(self, body):
+        topic = await aget_extracted_text_from_sources(body)
+        model = route_request_model("quiz", body)
+        questions = astream_quiz_questions(
+            topic,
+            body["question_count"],
+            body["mode"],
+            body["generation_format"],
+            model,
+        )
+
+        return questions, {"model": model}
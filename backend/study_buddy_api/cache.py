@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from .conf import get_settings, lazy_singleton
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LLM_CACHE = {
+    "BACKEND": "local",
+    "LOCATION": "redis://127.0.0.1:6379/1",
+    "TIMEOUT": 60 * 60 * 24,
+    "MAX_BYTES": 64 * 1024 * 1024,
+    "KEY_PREFIX": "study_buddy:llm:",
+}
+
+
+class LocalLRUCache:
+    """
+    In-process LRU cache bounded by the total size of the stored values.
+    """
+
+    def __init__(self, max_bytes: int, default_timeout: int = None):
+        self.max_bytes = max_bytes
+        self.default_timeout = default_timeout
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._pop(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, timeout: int = None):
+        timeout = self.default_timeout if timeout is None else timeout
+        expires_at = time.monotonic() + timeout if timeout else None
+        size = len(key) + len(value.encode("utf-8"))
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+
+            self._entries[key] = (value, size, expires_at)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+
+    def _pop(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+
+class RedisCache:
+    """
+    Cache shared by all workers, stored in Redis with per-key expiry.
+    """
+
+    def __init__(
+        self, location: str, default_timeout: int = None, key_prefix: str = ""
+    ):
+        import redis
+
+        self.client = redis.Redis.from_url(location)
+        self.default_timeout = default_timeout
+        self.key_prefix = key_prefix
+
+    def get(self, key: str):
+        value = self.client.get(self.key_prefix + key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str, timeout: int = None):
+        timeout = self.default_timeout if timeout is None else timeout
+        self.client.set(self.key_prefix + key, value, ex=timeout or None)
+
+    def delete(self, key: str):
+        self.client.delete(self.key_prefix + key)
+
+
+CACHE_BACKENDS = {
+    "local": lambda config: LocalLRUCache(config["MAX_BYTES"], config["TIMEOUT"]),
+    "redis": lambda config: RedisCache(
+        config["LOCATION"], config["TIMEOUT"], config["KEY_PREFIX"]
+    ),
+}
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache for LLM responses with hit/miss counters.
+
+    Backend errors are logged and treated as misses so that an unavailable
+    cache never fails a request.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+
+        try:
+            value = self.backend.get(key)
+        except Exception:
+            logger.warning("LLM cache lookup failed", exc_info=True)
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str, timeout: int = None):
+        if not self.enabled:
+            return
+
+        try:
+            self.backend.set(key, value, timeout)
+        except Exception:
+            logger.warning("LLM cache store failed", exc_info=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+def make_cache_key(
+    model: str, messages: list, options: dict = None, format: str = ""
+) -> str:
+    """
+    Hash everything that determines a generation: the model, the messages
+    (system context, template and extracted text), the generation options and
+    the output format.
+    """
+    request = {"model": model, "messages": messages, "options": options or {}}
+    if format:
+        request["format"] = format
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def build_cache_backend(config: dict):
+    """
+    Build a cache backend from a settings dict, or None when caching is disabled.
+    """
+    backend = config.get("BACKEND")
+    if not backend:
+        return None
+
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown cache backend: {backend}")
+
+    return CACHE_BACKENDS[backend](config)
+
+
+@lazy_singleton
+def get_llm_cache() -> LLMResponseCache:
+    """
+    Get the process-wide LLM response cache configured by `STUDY_BUDDY_LLM_CACHE`.
+    """
+    return LLMResponseCache(
+        build_cache_backend(get_settings("LLM_CACHE", DEFAULT_LLM_CACHE))
+    )
@@ -0,0 +1,73 @@
+import re
+
+from .conf import get_setting
+
+
+# Rough average for English text with llama-style tokenizers.
+CHARS_PER_TOKEN = 4
+
+DEFAULT_CHUNKING = {
+    # Ollama's default context window is 2048 tokens, leave room for the prompt
+    # template and the generated output.
+    "MAX_CHUNK_TOKENS": 1500,
+    # Only helps if Ollama serves parallel requests (OLLAMA_NUM_PARALLEL > 1).
+    "CONCURRENCY": 4,
+}
+
+# Separators tried in order, from the coarsest (pages) to the finest (words),
+# with the string used to join pieces back together within a chunk.
+SEPARATORS = [
+    (re.compile(r"\f"), "\f"),
+    (re.compile(r"\n\s*\n"), "\n\n"),
+    (re.compile(r"\n"), "\n"),
+    (re.compile(r"(?<=[.!?])\s+"), " "),
+    (re.compile(r" "), " "),
+]
+
+
+def get_chunking_setting(name: str) -> int:
+    return get_setting("CHUNKING", name, DEFAULT_CHUNKING)
+
+
+def estimate_token_count(text: str) -> int:
+    """
+    Estimate the number of tokens in the text without running a tokenizer.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_text_into_chunks(text: str, max_tokens: int) -> list:
+    """
+    Split the text into chunks that fit in `max_tokens`, breaking on page
+    boundaries first, then paragraphs, lines, sentences and finally words.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    return [chunk for chunk in _split(text, max_chars, 0) if chunk.strip()]
+
+
+def _split(text: str, max_chars: int, depth: int) -> list:
+    if len(text) <= max_chars:
+        return [text]
+
+    if depth == len(SEPARATORS):
+        return [text[i : i + max_chars] for i in range(0, len(text), max_chars)]
+
+    pattern, joiner = SEPARATORS[depth]
+    chunks = []
+    current = ""
+    for piece in pattern.split(text):
+        if len(piece) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.extend(_split(piece, max_chars, depth + 1))
+        elif current and len(current) + len(joiner) + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}{joiner}{piece}" if current else piece
+
+    if current:
+        chunks.append(current)
+
+    return chunks
@@ -0,0 +1,57 @@
+"""
+Settings and process-wide instances of the API.
+
+Every component is configured by a `STUDY_BUDDY_<GROUP>` settings dict whose
+missing keys fall back to the component's defaults, and is built once per
+process, on first use, from those settings.
+"""
+
+import functools
+import threading
+from typing import Callable
+
+from django.conf import settings
+
+
+def get_settings(group: str, defaults: dict) -> dict:
+    """
+    Get the `STUDY_BUDDY_<group>` settings, completed with `defaults`.
+    """
+    return {**defaults, **getattr(settings, f"STUDY_BUDDY_{group}", {})}
+
+
+def get_setting(group: str, name: str, defaults: dict):
+    """
+    Get the `name` setting of `STUDY_BUDDY_<group>`, or its default.
+    """
+    return getattr(settings, f"STUDY_BUDDY_{group}", {}).get(name, defaults[name])
+
+
+def lazy_singleton(factory: Callable) -> Callable:
+    """
+    Turn `factory` into a getter of the single instance it builds, built on the
+    first call. `reset()` on the getter drops the instance, so that the next
+    call builds it again from the current settings.
+    """
+    instance = None
+    lock = threading.Lock()
+
+    @functools.wraps(factory)
+    def get_instance():
+        nonlocal instance
+
+        if instance is None:
+            with lock:
+                if instance is None:
+                    instance = factory()
+
+        return instance
+
+    def reset():
+        nonlocal instance
+
+        with lock:
+            instance = None
+
+    get_instance.reset = reset
+    return get_instance
@@ -0,0 +1,170 @@
+"""
+Per-request deadlines.
+
+Every API request gets a deadline: the timeout sent by the client in the
+`X-Request-Timeout` header (in seconds, capped at MAX_TIMEOUT), or the default
+timeout of its endpoint. The deadline is kept in a context variable so that the
+code running the request can enforce it: the LLM scheduler drops requests still
+queued when their deadline passes, and generations are stopped (by closing the
+Ollama stream) once it is exceeded. Such requests fail with a 504.
+"""
+
+import time
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator
+
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .conf import get_setting
+
+
+DEFAULT_REQUEST_DEADLINES = {
+    "ENABLED": True,
+    "HEADER": "X-Request-Timeout",
+    "DEFAULT_TIMEOUT": 300,
+    # Default timeout of each endpoint, in seconds.
+    "TIMEOUTS": {},
+    "MAX_TIMEOUT": 900,
+}
+
+_deadline = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(APIException):
+    status_code = status.HTTP_504_GATEWAY_TIMEOUT
+    default_detail = "The request did not complete within its deadline."
+    default_code = "deadline_exceeded"
+
+
+def get_deadline_setting(name: str):
+    return get_setting("REQUEST_DEADLINES", name, DEFAULT_REQUEST_DEADLINES)
+
+
+def get_request_timeout(request, endpoint: str) -> float:
+    """
+    Get the timeout of a request to `endpoint`, or None if deadlines are
+    disabled.
+
+    Raises:
+        ValidationError: If the timeout sent by the client is not a positive
+            number.
+    """
+    if not get_deadline_setting("ENABLED"):
+        return None
+
+    header = get_deadline_setting("HEADER")
+    if (value := request.headers.get(header)) is None:
+        return get_deadline_setting("TIMEOUTS").get(
+            endpoint, get_deadline_setting("DEFAULT_TIMEOUT")
+        )
+
+    try:
+        timeout = float(value)
+    except ValueError:
+        timeout = 0
+    if not timeout > 0:
+        raise ValidationError({header: ["A positive number of seconds is required."]})
+
+    return min(timeout, get_deadline_setting("MAX_TIMEOUT"))
+
+
+def get_deadline() -> float:
+    """
+    Get the deadline of the current request, in `time.monotonic()` time, or None.
+    """
+    return _deadline.get()
+
+
+def set_deadline(deadline: float):
+    _deadline.set(deadline)
+
+
+def start_deadline(timeout: float) -> float:
+    """
+    Set the deadline of the current request `timeout` seconds from now.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    _deadline.set(deadline)
+    return deadline
+
+
+def get_remaining_time(deadline: float = None) -> float:
+    """
+    Get the seconds left until `deadline` (the current request's by default), or
+    None if there is no deadline.
+    """
+    if deadline is None and (deadline := _deadline.get()) is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def is_expired(deadline: float) -> bool:
+    return deadline is not None and deadline <= time.monotonic()
+
+
+def check_deadline():
+    """
+    Raises:
+        DeadlineExceeded: If the deadline of the current request has passed.
+    """
+    if is_expired(_deadline.get()):
+        raise DeadlineExceeded()
+
+
+def with_deadline(items: Iterator, deadline: float) -> Iterator:
+    """
+    Iterate over `items` under `deadline`, e.g. a streamed response consumed
+    after the view has returned.
+    """
+    _deadline.set(deadline)
+    try:
+        yield from items
+    finally:
+        _deadline.set(None)
+
+
+async def awith_deadline(items: AsyncIterator, deadline: float) -> AsyncIterator:
+    """
+    Async variant of `with_deadline`.
+    """
+    _deadline.set(deadline)
+    try:
+        async for item in items:
+            yield item
+    finally:
+        _deadline.set(None)
+
+
+def stream_with_deadline(response: StreamingHttpResponse, deadline: float):
+    """
+    Keep `deadline` while the content of a streamed response is consumed.
+    """
+    if response.is_async:
+        response.streaming_content = awith_deadline(
+            response.streaming_content, deadline
+        )
+    else:
+        response.streaming_content = with_deadline(response.streaming_content, deadline)
+
+
+class DeadlineMixin:
+    """
+    Start the deadline of every request to the view, and keep it while a
+    streamed response is consumed. Set `deadline_endpoint` to the key of the
+    endpoint in TIMEOUTS.
+    """
+
+    deadline_endpoint = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        start_deadline(get_request_timeout(request, self.deadline_endpoint))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(response, StreamingHttpResponse):
+            stream_with_deadline(response, get_deadline())
+        set_deadline(None)
+        return response
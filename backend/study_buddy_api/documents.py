@@ -0,0 +1,302 @@
+"""
+Stored documents, and retrieval for chat over them.
+
+Documents are identified by the SHA-256 of their extracted text, which is stored
+in the database so that the content endpoints can reference a document by id
+instead of uploading it again. For chat, documents are split into small chunks
+and embedded in batches with a local Ollama embedding model, the first time a
+chat is about them. Vectors are kept in an append-only on-disk index:
+
+    vectors.f32   normalized float32 vectors, one row per chunk
+    chunks.jsonl  `{"document_id", "text"}` of every row, in the same order
+    meta.json     embedding model and dimensions
+
+The vectors file is memory-mapped, so only the rows of the queried document are
+read, and adding a document only appends to both files. Other processes pick up
+new rows by reading the tail of `chunks.jsonl`.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from rest_framework.exceptions import NotFound
+
+from .chunking import split_text_into_chunks
+from .conf import get_setting, lazy_singleton
+from .models import Document, DocumentSource
+from .ollama_client import get_keep_alive, get_pool
+
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DOCUMENT_INDEX = {
+    "DIRECTORY": "document_index",
+    "MODEL": "nomic-embed-text",
+    "CHUNK_TOKENS": 200,
+    "BATCH_SIZE": 32,
+    "TOP_K": 4,
+}
+
+
+def get_document_index_setting(name: str):
+    return get_setting("DOCUMENT_INDEX", name, DEFAULT_DOCUMENT_INDEX)
+
+
+def get_document_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embed_texts(texts: list, model: str, batch_size: int) -> "np.ndarray":
+    """
+    Embed texts in batches, returning one normalized row per text.
+    """
+    import numpy as np
+
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start : start + batch_size]
+        response = get_pool().call(
+            model,
+            lambda client: client.embed(
+                model=model, input=batch, keep_alive=get_keep_alive()
+            ),
+        )
+        vectors.extend(response["embeddings"])
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class DocumentIndex:
+    def __init__(self, directory: str, model: str):
+        self.directory = directory
+        self.model = model
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.chunks_path = os.path.join(directory, "chunks.jsonl")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.lock_path = os.path.join(directory, ".lock")
+
+        self.dimensions = None
+        self._texts = []
+        self._documents = {}
+        self._chunks_offset = 0
+        self._vectors = None
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _file_lock(self):
+        # Serializes writers across processes sharing the directory.
+        with open(self.lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """
+        Load the rows appended since the last refresh, by this or another process.
+        """
+        import numpy as np
+
+        if self.dimensions is None and os.path.exists(self.meta_path):
+            with open(self.meta_path) as meta_file:
+                meta = json.load(meta_file)
+            if meta["model"] != self.model:
+                raise ValueError(
+                    f"Document index was built with {meta['model']}, not {self.model}."
+                )
+            self.dimensions = meta["dimensions"]
+
+        if not os.path.exists(self.chunks_path):
+            return
+        if os.path.getsize(self.chunks_path) == self._chunks_offset:
+            return
+
+        with open(self.chunks_path, "rb") as chunks_file:
+            chunks_file.seek(self._chunks_offset)
+            for line in chunks_file:
+                # Skip a line still being written by another process.
+                if not line.endswith(b"\n"):
+                    break
+                chunk = json.loads(line)
+                row = len(self._texts)
+                start, _ = self._documents.get(chunk["document_id"], (row, row))
+                self._documents[chunk["document_id"]] = (start, row + 1)
+                self._texts.append(chunk["text"])
+                self._chunks_offset += len(line)
+
+        if self._texts:
+            self._vectors = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self._texts), self.dimensions),
+            )
+
+    def __contains__(self, document_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return document_id in self._documents
+
+    def chunk_count(self, document_id: str) -> int:
+        with self._lock:
+            self._refresh()
+            start, stop = self._documents.get(document_id, (0, 0))
+            return stop - start
+
+    def add(self, document_id: str, texts: list, vectors: "np.ndarray"):
+        """
+        Append the chunks of a document to the index, unless it is already there.
+        """
+        import numpy as np
+
+        with self._lock, self._file_lock():
+            self._refresh()
+            if document_id in self._documents or not texts:
+                return
+
+            if self.dimensions is None:
+                self.dimensions = vectors.shape[1]
+                with open(self.meta_path, "w") as meta_file:
+                    json.dump(
+                        {"model": self.model, "dimensions": self.dimensions},
+                        meta_file,
+                    )
+
+            # Vectors first: rows without a chunk line are ignored when loading,
+            # and dropped here before appending.
+            with open(self.vectors_path, "ab") as vectors_file:
+                vectors_file.truncate(len(self._texts) * self.dimensions * 4)
+                vectors_file.write(np.ascontiguousarray(vectors, np.float32).tobytes())
+            with open(self.chunks_path, "a", encoding="utf-8") as chunks_file:
+                for text in texts:
+                    chunks_file.write(
+                        json.dumps({"document_id": document_id, "text": text}) + "\n"
+                    )
+
+            self._refresh()
+
+    def search(self, document_id: str, vector: "np.ndarray", top_k: int) -> list:
+        """
+        Get the `top_k` chunks of a document most similar to `vector`, in
+        document order.
+        """
+        import numpy as np
+
+        with self._lock:
+            self._refresh()
+            if document_id not in self._documents:
+                raise NotFound("Document not found.")
+
+            start, stop = self._documents[document_id]
+            similarities = self._vectors[start:stop] @ vector
+            rows = np.argsort(-similarities)[:top_k]
+            return [self._texts[start + row] for row in sorted(rows)]
+
+
+@lazy_singleton
+def get_document_index() -> DocumentIndex:
+    """
+    Get the process-wide document index configured by
+    `STUDY_BUDDY_DOCUMENT_INDEX`.
+    """
+    return DocumentIndex(
+        get_document_index_setting("DIRECTORY"),
+        get_document_index_setting("MODEL"),
+    )
+
+
+def store_document(text: str, source_hash: str = None) -> Document:
+    """
+    Store the text of a document, unless it is already stored, and record the
+    hash of the sources it was extracted from.
+
+    Note:
+        The returned document is loaded without its text.
+    """
+    document_id = get_document_id(text)
+    document = Document.objects.only("id", "char_count").filter(pk=document_id).first()
+    if document is None:
+        document, _ = Document.objects.get_or_create(
+            id=document_id, defaults={"text": text, "char_count": len(text)}
+        )
+
+    if source_hash:
+        DocumentSource.objects.get_or_create(
+            id=source_hash, defaults={"document": document}
+        )
+
+    return document
+
+
+def find_document(source_hash: str) -> Document:
+    """
+    Get the document extracted from the sources with the given hash, without its
+    text, or None.
+    """
+    return (
+        Document.objects.only("id", "char_count")
+        .filter(sources__id=source_hash)
+        .first()
+    )
+
+
+def get_document_text(document_id: str) -> str:
+    """
+    Raises:
+        NotFound: If there is no such document.
+    """
+    try:
+        return Document.objects.values_list("text", flat=True).get(pk=document_id)
+    except Document.DoesNotExist:
+        raise NotFound("Document not found.")
+
+
+def ingest_document(text: str) -> dict:
+    """
+    Chunk, embed and index a document for chat, returning its id. Documents
+    already in the index are not embedded again.
+    """
+    index = get_document_index()
+    document_id = get_document_id(text)
+
+    if document_id not in index:
+        chunks = split_text_into_chunks(
+            text, get_document_index_setting("CHUNK_TOKENS")
+        )
+        vectors = embed_texts(
+            chunks, index.model, get_document_index_setting("BATCH_SIZE")
+        )
+        index.add(document_id, chunks, vectors)
+
+    return {"document_id": document_id, "chunk_count": index.chunk_count(document_id)}
+
+
+def retrieve_chunks(document_id: str, query: str) -> list:
+    """
+    Get the chunks of a document most relevant to the query, indexing the
+    document first if needed.
+
+    Raises:
+        NotFound: If there is no such document.
+    """
+    index = get_document_index()
+    if document_id not in index:
+        ingest_document(get_document_text(document_id))
+
+    vector = embed_texts([query], index.model, 1)[0]
+    return index.search(document_id, vector, get_document_index_setting("TOP_K"))
@@ -0,0 +1,244 @@
+"""
+Token-budgeted chat history.
+
+Clients send the whole conversation with every chat request. To keep prompt
+evaluation time flat over long sessions, only the most recent messages that fit
+in the token budget are forwarded, and older messages are folded into a rolling
+summary.
+
+Summaries are generated in the background and cached by the hash of the messages
+they cover, so a conversation finds its summary again on the next request
+without any server-side session. Until a summary is ready, requests fall back to
+the latest cached summary (or none) and never wait for it.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import build_cache_backend
+from .chunking import CHARS_PER_TOKEN, estimate_token_count
+from .conf import get_settings, lazy_singleton
+from .prompts import CHAT_SUMMARY_CONTEXT, CHAT_SUMMARY_MESSAGE, CHAT_SUMMARY_PROMPT
+from .routing import route_model
+from .utils import generate_llm_response
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHAT_HISTORY = {
+    # Budget of the system prompt, the summary and the recent messages. Ollama's
+    # default context window is 2048 tokens, leave room for the answer.
+    "MAX_TOKENS": 1536,
+    # Part of the budget kept for the summary of older messages.
+    "SUMMARY_TOKENS": 256,
+    # Messages are folded into the summary this many at a time.
+    "FOLD_STEP": 4,
+    "BACKEND": "local",
+    "LOCATION": "redis://127.0.0.1:6379/1",
+    "TIMEOUT": 60 * 60 * 24,
+    "MAX_BYTES": 16 * 1024 * 1024,
+    "KEY_PREFIX": "study_buddy:chat_summary:",
+}
+
+# Role markers and separators added by the chat template to every message.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_message_tokens(message: dict) -> int:
+    return estimate_token_count(str(message.get("content", ""))) + (
+        MESSAGE_OVERHEAD_TOKENS
+    )
+
+
+def format_conversation(messages: list) -> str:
+    return "\n".join(
+        f"{message.get('role', 'user')}: {message.get('content', '')}"
+        for message in messages
+    )
+
+
+class ChatHistoryManager:
+    def __init__(
+        self,
+        backend=None,
+        timeout: int = None,
+        max_tokens: int = 1536,
+        summary_tokens: int = 256,
+        fold_step: int = 4,
+    ):
+        self.backend = backend
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.fold_step = max(fold_step, 1)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="chat-summary"
+        )
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def _summary_keys(
+        self, history: list, stop: int, conversation_id: str, offset: int
+    ) -> dict:
+        """
+        Get the cache keys of the summaries of `history` up to every fold boundary
+        until `stop`, keyed by position in `history`.
+
+        Note:
+            Summaries of stored conversations are keyed by conversation id and
+            position, others by the hash of the messages they cover.
+        """
+        keys = {}
+        digest = hashlib.sha256()
+        for index, message in enumerate(history[:stop], start=1):
+            if conversation_id is None:
+                digest.update(json.dumps(message, sort_keys=True).encode("utf-8"))
+            if (offset + index) % self.fold_step == 0:
+                keys[index] = (
+                    f"{conversation_id}:{offset + index}"
+                    if conversation_id is not None
+                    else digest.copy().hexdigest()
+                )
+        return keys
+
+    def _get_summary(self, key: str) -> str:
+        if self.backend is None:
+            return None
+
+        try:
+            return self.backend.get(key)
+        except Exception:
+            logger.warning("Chat summary lookup failed", exc_info=True)
+            return None
+
+    def _set_summary(self, key: str, summary: str):
+        if self.backend is None:
+            return
+
+        try:
+            self.backend.set(key, summary, self.timeout)
+        except Exception:
+            logger.warning("Chat summary store failed", exc_info=True)
+
+    def _fold_boundary(self, history: list, budget: int, offset: int) -> int:
+        """
+        Find the first fold boundary after which the messages fit in `budget`.
+        The last message is always kept.
+        """
+        tokens = 0
+        start = len(history)
+        while start > 0:
+            message_tokens = count_message_tokens(history[start - 1])
+            if tokens + message_tokens > budget and start < len(history):
+                break
+            tokens += message_tokens
+            start -= 1
+
+        # Round up so that summaries are only ever built on fold boundaries, but
+        # never past the last message.
+        step = self.fold_step
+        boundary = -(-(offset + start) // step) * step
+        last_boundary = (offset + len(history) - 1) // step * step
+        return min(boundary, last_boundary) - offset
+
+    def build_messages(
+        self,
+        system_message: dict,
+        history: list,
+        conversation_id: str = None,
+        offset: int = 0,
+    ) -> list:
+        """
+        Build the messages of a chat request from the system message and the
+        conversation history, within the token budget.
+
+        Note:
+            For conversations stored server-side, `history` may be only the latest
+            messages, `offset` being the position of the first of them.
+        """
+        budget = self.max_tokens - count_message_tokens(system_message)
+        if sum(count_message_tokens(message) for message in history) <= budget:
+            return [system_message] + history
+
+        boundary = self._fold_boundary(history, budget - self.summary_tokens, offset)
+        if boundary <= 0:
+            return [system_message] + history
+
+        keys = self._summary_keys(history, boundary, conversation_id, offset)
+
+        summary, summarized = None, 0
+        for candidate in sorted(keys, reverse=True):
+            if (summary := self._get_summary(keys[candidate])) is not None:
+                summarized = candidate
+                break
+
+        if summarized < boundary:
+            # Messages between the latest summary and the boundary are left out
+            # until their summary is ready.
+            self._schedule_summary(
+                history[summarized:boundary], summary, keys[boundary]
+            )
+
+        messages = [system_message]
+        if summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": CHAT_SUMMARY_MESSAGE.format(summary=summary),
+                }
+            )
+        return messages + history[boundary:]
+
+    def _schedule_summary(self, messages: list, summary: str, key: str):
+        with self._pending_lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+
+        self._executor.submit(self._summarize, messages, summary, key)
+
+    def _summarize(self, messages: list, summary: str, key: str):
+        try:
+            conversation = format_conversation(messages)
+            # Keep the end of very long backlogs, e.g. a first request that
+            # already carries a long conversation.
+            conversation = conversation[-self.max_tokens * CHARS_PER_TOKEN :]
+
+            prompts = [
+                {"role": "system", "content": CHAT_SUMMARY_CONTEXT},
+                {
+                    "role": "user",
+                    "content": CHAT_SUMMARY_PROMPT.format(
+                        summary=summary or "(empty)", conversation=conversation
+                    ),
+                },
+            ]
+            summary = generate_llm_response(
+                prompts, route_model("chat_summary"), use_cache=False
+            )
+            self._set_summary(key, summary)
+        except Exception:
+            logger.exception("Failed to summarize chat history")
+        finally:
+            with self._pending_lock:
+                self._pending.discard(key)
+
+
+@lazy_singleton
+def get_history_manager() -> ChatHistoryManager:
+    """
+    Get the process-wide chat history manager configured by
+    `STUDY_BUDDY_CHAT_HISTORY`.
+    """
+    config = get_settings("CHAT_HISTORY", DEFAULT_CHAT_HISTORY)
+    return ChatHistoryManager(
+        build_cache_backend(config),
+        config["TIMEOUT"],
+        config["MAX_TOKENS"],
+        config["SUMMARY_TOKENS"],
+        config["FOLD_STEP"],
+    )
@@ -0,0 +1,99 @@
+from uuid import uuid4
+
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .tasks import run_endpoint_job
+
+
+JOB_UPLOADS_DIR = "job_uploads"
+
+# Recorded when a job is enqueued, so that it can be told apart from an unknown
+# job id, which Celery reports as PENDING.
+QUEUED_STATE = "QUEUED"
+
+JOB_STATUSES = {
+    QUEUED_STATE: "pending",
+    "STARTED": "running",
+    "PROGRESS": "running",
+    "RETRY": "running",
+    "SUCCESS": "succeeded",
+    "FAILURE": "failed",
+    "REVOKED": "cancelled",
+}
+
+
+def serialize_job_body(body: dict) -> dict:
+    """
+    Make validated request data JSON-serializable for a Celery task, storing an
+    uploaded file in the default storage so that workers can read it.
+    """
+    body = dict(body)
+
+    if file := body.pop("file", None):
+        body["file_path"] = default_storage.save(
+            f"{JOB_UPLOADS_DIR}/{uuid4().hex}-{file.name}", file
+        )
+
+    return body
+
+
+def get_job_status(job_id: str) -> dict:
+    """
+    Describe the status, progress and result of a job.
+
+    Raises:
+        NotFound: If there is no such job, or its result has expired.
+    """
+    from celery.result import AsyncResult
+
+    result = AsyncResult(job_id)
+    if result.state == "PENDING":
+        raise NotFound("Job not found.")
+    job = {"job_id": job_id, "status": JOB_STATUSES.get(result.state, "running")}
+
+    if result.state == "PROGRESS":
+        job["progress"] = result.info
+    elif result.state == "SUCCESS":
+        if "error" in result.result:
+            job["status"] = JOB_STATUSES["FAILURE"]
+            job["error"] = result.result["error"]
+        else:
+            job["result"] = result.result
+    elif result.state == "FAILURE":
+        job["error"] = str(result.result)
+
+    return job
+
+
+class JobMixin:
+    """
+    Adds an opt-in job mode to a view, enabled with `?async=1`: the work is queued
+    as a Celery task and the request returns the job id immediately.
+    """
+
+    def wants_job(self, request) -> bool:
+        return request.query_params.get("async", "").lower() in ("1", "true")
+
+    def enqueue_job(self, endpoint: str, body: dict) -> Response:
+        job_id = uuid4().hex
+        # Recorded before sending, so that it can't overwrite the worker's state.
+        run_endpoint_job.backend.store_result(job_id, None, QUEUED_STATE)
+        run_endpoint_job.apply_async(
+            (endpoint, serialize_job_body(body)), task_id=job_id
+        )
+        status_url = self.request.build_absolute_uri(
+            reverse("job-status", args=[job_id])
+        )
+
+        # The job is described in JSON, even to clients asking for a stream.
+        self.request.accepted_renderer = JSONRenderer()
+        self.request.accepted_media_type = JSONRenderer.media_type
+        return Response(
+            {"job_id": job_id, "status": "pending", "status_url": status_url},
+            status=status.HTTP_202_ACCEPTED,
+        )
@@ -0,0 +1,174 @@
+"""
+Prometheus exposition of the API metrics.
+
+Renders the request and stage histograms of `study_buddy_api.timing` together
+with the state of the LLM scheduler, Ollama hosts and caches, in the Prometheus text format.
+Metrics are kept per process: with several workers, scrape each of them or use a
+single worker per metrics target.
+"""
+
+from .cache import get_llm_cache
+from .ollama_client import get_pool
+from .routing import get_model_router
+from .scheduler import get_scheduler
+from .semantic_cache import get_semantic_cache
+from .single_flight import get_single_flight
+from .timing import REQUEST_DURATION, STAGE_DURATION, Histogram
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape_label_value(str(value))}"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def render_histogram(histogram: Histogram) -> list:
+    lines = [
+        f"# HELP {histogram.name} {histogram.documentation}",
+        f"# TYPE {histogram.name} histogram",
+    ]
+    bounds = [str(bound) for bound in histogram.buckets] + ["+Inf"]
+
+    for labels, cumulative, total, count in histogram.collect():
+        for bound, bucket_count in zip(bounds, cumulative):
+            bucket_labels = format_labels(
+                histogram.label_names + ("le",), labels + (bound,)
+            )
+            lines.append(f"{histogram.name}_bucket{bucket_labels} {bucket_count}")
+        series_labels = format_labels(histogram.label_names, labels)
+        lines.append(f"{histogram.name}_sum{series_labels} {total}")
+        lines.append(f"{histogram.name}_count{series_labels} {count}")
+
+    return lines
+
+
+def render_metric(name: str, kind: str, documentation: str, samples: list) -> list:
+    """
+    Render a gauge or counter from `(labels dict, value)` samples.
+    """
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(
+            f"{name}{format_labels(tuple(labels), tuple(labels.values()))} {value}"
+        )
+    return lines
+
+
+def render_metrics() -> str:
+    scheduler_stats = get_scheduler().stats()
+    llm_cache_stats = get_llm_cache().stats()
+    pool_stats = get_pool().stats()
+
+    lines = render_histogram(REQUEST_DURATION) + render_histogram(STAGE_DURATION)
+    lines += render_metric(
+        "study_buddy_llm_active_generations",
+        "gauge",
+        "Generations holding a scheduler slot.",
+        [({}, scheduler_stats["active"])],
+    )
+    lines += render_metric(
+        "study_buddy_llm_queued_generations",
+        "gauge",
+        "Generations waiting for a scheduler slot.",
+        [({}, scheduler_stats["queued"])],
+    )
+    lines += render_metric(
+        "study_buddy_llm_rejected_total",
+        "counter",
+        "Generations rejected because the scheduler queue was full.",
+        [({}, scheduler_stats["rejected"])],
+    )
+    lines += render_metric(
+        "study_buddy_llm_expired_total",
+        "counter",
+        "Generations dropped because their request deadline passed while queued.",
+        [({}, scheduler_stats["expired"])],
+    )
+    lines += render_metric(
+        "study_buddy_llm_queue_wait_seconds_total",
+        "counter",
+        "Time spent waiting for a scheduler slot, per priority lane.",
+        [
+            ({"lane": lane}, stats["total_seconds"])
+            for lane, stats in scheduler_stats["queue_wait"].items()
+        ],
+    )
+    lines += render_metric(
+        "study_buddy_llm_routed_total",
+        "counter",
+        "Generations routed to each model, per task and tier.",
+        [
+            ({"task": task, "tier": tier, "model": model}, count)
+            for (task, tier, model), count in get_model_router().stats().items()
+        ],
+    )
+    lines += render_metric(
+        "study_buddy_ollama_host_up",
+        "gauge",
+        "Whether each Ollama host is available, i.e. healthy and not ejected.",
+        [({"host": host["host"]}, int(host["available"])) for host in pool_stats],
+    )
+    lines += render_metric(
+        "study_buddy_ollama_host_outstanding_requests",
+        "gauge",
+        "Requests in progress on each Ollama host.",
+        [({"host": host["host"]}, host["outstanding"]) for host in pool_stats],
+    )
+    lines += render_metric(
+        "study_buddy_ollama_host_requests_total",
+        "counter",
+        "Requests sent to each Ollama host.",
+        [({"host": host["host"]}, host["requests"]) for host in pool_stats],
+    )
+    lines += render_metric(
+        "study_buddy_ollama_host_failures_total",
+        "counter",
+        "Requests that failed because of the Ollama host.",
+        [({"host": host["host"]}, host["failures"]) for host in pool_stats],
+    )
+    lines += render_metric(
+        "study_buddy_llm_cache_requests_total",
+        "counter",
+        "LLM response cache lookups.",
+        [
+            ({"result": "hit"}, llm_cache_stats["hits"]),
+            ({"result": "miss"}, llm_cache_stats["misses"]),
+        ],
+    )
+
+    if single_flight := get_single_flight():
+        lines += render_metric(
+            "study_buddy_llm_coalesced_total",
+            "counter",
+            "Requests served by an identical generation already in flight, "
+            "in this process (local) or another one (shared).",
+            [
+                ({"scope": scope}, count)
+                for scope, count in single_flight.stats().items()
+            ],
+        )
+
+    if semantic_cache := get_semantic_cache():
+        semantic_cache_stats = semantic_cache.stats()
+        lines += render_metric(
+            "study_buddy_semantic_cache_requests_total",
+            "counter",
+            "Semantic cache lookups.",
+            [
+                ({"result": "hit"}, semantic_cache_stats["hits"]),
+                ({"result": "miss"}, semantic_cache_stats["misses"]),
+            ],
+        )
+
+    return "\n".join(lines) + "\n"
@@ -1,3 +1,76 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+from .prompts import ContextEnum
+
+
+class ChatSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    context = models.CharField(
+        max_length=32,
+        choices=[(context.value, context.name) for context in ContextEnum],
+        default=ContextEnum.STUDY_BUDDY.value,
+    )
+    # Kept up to date with every turn to locate the latest messages.
+    message_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def latest_messages(self, limit: int) -> list:
+        """
+        Get the latest `limit` messages of the session, oldest first.
+        """
+        messages = self.messages.order_by("-id")[:limit]
+        return list(reversed(messages))
+
+
+class ChatMessage(models.Model):
+    ROLE_USER = "user"
+    ROLE_ASSISTANT = "assistant"
+
+    session = models.ForeignKey(
+        ChatSession, on_delete=models.CASCADE, related_name="messages"
+    )
+    role = models.CharField(
+        max_length=16,
+        choices=[(ROLE_USER, "User"), (ROLE_ASSISTANT, "Assistant")],
+    )
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Latest messages of a session.
+            models.Index(fields=["session", "-id"], name="chat_message_latest_idx"),
+        ]
+
+    def as_prompt(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
+
+class Document(models.Model):
+    """
+    Text extracted from an upload, referenced by id from the content endpoints
+    instead of uploading and extracting the same document again.
+    """
+
+    # SHA-256 of the text, also the id of the document in the chat index.
+    id = models.CharField(primary_key=True, max_length=64, editable=False)
+    text = models.TextField()
+    char_count = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class DocumentSource(models.Model):
+    """
+    Sources a document was extracted from, so that uploading them again skips
+    the extraction.
+    """
+
+    # SHA-256 of the source contents, see `utils.get_source_hash`.
+    id = models.CharField(primary_key=True, max_length=64, editable=False)
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name="sources"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
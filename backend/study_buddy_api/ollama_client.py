@@ -0,0 +1,535 @@
+"""
+Managed Ollama clients.
+
+The module-level `ollama.chat` helpers create a client without timeouts or
+connection limits and let Ollama unload idle models after five minutes. The
+clients here are shared by the whole process so that HTTP connections are reused,
+and every request passes the configured `keep_alive` so models stay resident.
+
+Requests are spread over one or more Ollama hosts by the `OllamaPool`, so that
+generation capacity scales by adding hosts.
+
+`ollama` (and `httpx`) are imported when the first client is created, so that
+processes that never call Ollama, e.g. management commands, don't load them.
+"""
+
+import asyncio
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, AsyncIterator, Iterator
+
+from .conf import get_setting, lazy_singleton
+
+
+if TYPE_CHECKING:
+    import ollama
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OLLAMA_CLIENT = {
+    # Falls back to the OLLAMA_HOST environment variable, then localhost.
+    "HOST": None,
+    "TIMEOUT": 300,
+    "CONNECT_TIMEOUT": 5,
+    "MAX_CONNECTIONS": 32,
+    "MAX_KEEPALIVE_CONNECTIONS": 16,
+    # How long Ollama keeps a model loaded after its last request.
+    "KEEP_ALIVE": "30m",
+    "WARM_UP_MODELS": ["llama3.1"],
+    "WARM_UP_ON_STARTUP": True,
+}
+
+DEFAULT_OLLAMA_POOL = {
+    # Defaults to the single HOST of the client settings.
+    "HOSTS": [],
+    "MAX_ATTEMPTS": 2,
+    # Extra outstanding requests counted for hosts without the model loaded.
+    "MODEL_LOAD_PENALTY": 4,
+    # How much busier than the least loaded host the host of a session (see
+    # `OllamaPool.call`) may be before its requests go elsewhere.
+    "AFFINITY_MAX_EXTRA_LOAD": 2,
+    "EJECT_AFTER_FAILURES": 1,
+    "EJECT_DURATION": 30,
+    # Seconds between health checks, 0 disables them.
+    "HEALTH_CHECK_INTERVAL": 10,
+    "HEALTH_CHECK_TIMEOUT": 2,
+}
+
+
+def get_ollama_setting(name: str):
+    return get_setting("OLLAMA_CLIENT", name, DEFAULT_OLLAMA_CLIENT)
+
+
+def get_ollama_pool_setting(name: str):
+    return get_setting("OLLAMA_POOL", name, DEFAULT_OLLAMA_POOL)
+
+
+def _client_kwargs(host: str) -> dict:
+    import httpx
+
+    return {
+        "host": host,
+        "timeout": httpx.Timeout(
+            get_ollama_setting("TIMEOUT"),
+            connect=get_ollama_setting("CONNECT_TIMEOUT"),
+        ),
+        "limits": httpx.Limits(
+            max_connections=get_ollama_setting("MAX_CONNECTIONS"),
+            max_keepalive_connections=get_ollama_setting("MAX_KEEPALIVE_CONNECTIONS"),
+        ),
+    }
+
+
+def get_keep_alive():
+    return get_ollama_setting("KEEP_ALIVE")
+
+
+def normalize_model_name(model: str) -> str:
+    # Ollama reports loaded models with their tag, `llama3.1` is `llama3.1:latest`.
+    return model if ":" in model else f"{model}:latest"
+
+
+def is_host_failure(error: Exception) -> bool:
+    """
+    Whether an error is caused by the Ollama host rather than by the request.
+    """
+    import httpx
+    import ollama
+
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code >= 500
+    return isinstance(error, (httpx.TransportError, ConnectionError))
+
+
+class OllamaHost:
+    """
+    An Ollama server of the pool, with its clients and load.
+    """
+
+    def __init__(self, url: str, health_check_timeout: float):
+        import ollama
+
+        self.url = url
+        self.client = ollama.Client(**_client_kwargs(url))
+        # A dedicated client, so that health checks of a hung host time out fast.
+        self.health_client = ollama.Client(host=url, timeout=health_check_timeout)
+        self._async_clients = weakref.WeakKeyDictionary()
+
+        self.outstanding = 0
+        self.loaded_models = set()
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def get_async_client(self) -> "ollama.AsyncClient":
+        """
+        Get the async client of the running event loop.
+
+        Note:
+            Async connections can't be shared between event loops, so there is
+            one client per loop, dropped together with the loop.
+        """
+        import ollama
+
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            self._async_clients[loop] = ollama.AsyncClient(**_client_kwargs(self.url))
+        return self._async_clients[loop]
+
+    def is_available(self, now: float) -> bool:
+        return self.healthy and self.ejected_until <= now
+
+
+class OllamaPool:
+    """
+    Balances requests over the Ollama hosts of the pool.
+
+    Every request goes to the available host with the fewest outstanding
+    requests, counting `model_load_penalty` extra requests for hosts that don't
+    have the model loaded yet, so that requests stick to the hosts that already
+    hold their model until those are busier. Requests with an affinity key (e.g.
+    the turns of a chat session) go to the host the key hashes to, so that
+    Ollama can reuse its prompt cache, unless that host has more than
+    `affinity_max_extra_load` extra requests. Hosts are ejected for
+    `eject_duration` seconds after `eject_after_failures` consecutive failures,
+    and failed requests are retried on another host, up to `max_attempts`. A
+    background thread checks the health and loaded models of every host.
+    """
+
+    def __init__(
+        self,
+        urls: list,
+        max_attempts: int = 2,
+        model_load_penalty: int = 4,
+        affinity_max_extra_load: int = 2,
+        eject_after_failures: int = 1,
+        eject_duration: float = 30,
+        health_check_interval: float = 10,
+        health_check_timeout: float = 2,
+    ):
+        self.hosts = [OllamaHost(url, health_check_timeout) for url in urls]
+        self.max_attempts = max_attempts
+        self.model_load_penalty = model_load_penalty
+        self.affinity_max_extra_load = affinity_max_extra_load
+        self.eject_after_failures = eject_after_failures
+        self.eject_duration = eject_duration
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.Lock()
+        self._next = 0
+        self._health_checks = None
+
+    def _acquire(self, model: str, excluded: list, affinity: str = None) -> OllamaHost:
+        model = normalize_model_name(model)
+        now = time.monotonic()
+
+        def load(host):
+            return host.outstanding + (
+                0 if model in host.loaded_models else self.model_load_penalty
+            )
+
+        with self._lock:
+            candidates = [host for host in self.hosts if host not in excluded]
+            # When every host is down, still try one rather than fail outright.
+            candidates = (
+                [host for host in candidates if host.is_available(now)]
+                or candidates
+                or self.hosts
+            )
+
+            # Rotate the candidates so that ties are spread over the hosts.
+            self._next = (self._next + 1) % len(candidates)
+            candidates = candidates[self._next :] + candidates[: self._next]
+            host = min(candidates, key=load)
+
+            if affinity is not None:
+                # Rendezvous hashing: every process picks the same host for a
+                # key, and only the keys of a host that goes away move.
+                preferred = max(
+                    candidates,
+                    key=lambda host: hashlib.md5(
+                        f"{affinity}:{host.url}".encode()
+                    ).digest(),
+                )
+                if load(preferred) <= load(host) + self.affinity_max_extra_load:
+                    host = preferred
+
+            host.outstanding += 1
+            host.requests += 1
+            return host
+
+    def _release(self, host: OllamaHost, model: str, error: BaseException = None):
+        with self._lock:
+            host.outstanding -= 1
+
+            if error is None:
+                host.consecutive_failures = 0
+                # Ollama loads the model for the request, if it wasn't already.
+                host.loaded_models.add(normalize_model_name(model))
+                return
+            if not is_host_failure(error):
+                return
+
+            host.failures += 1
+            host.consecutive_failures += 1
+            if host.consecutive_failures >= self.eject_after_failures:
+                host.ejected_until = time.monotonic() + self.eject_duration
+                logger.warning(
+                    "Ejected Ollama host %s for %ss: %s",
+                    host.url,
+                    self.eject_duration,
+                    error,
+                )
+
+    def _should_retry(self, error: BaseException, attempt: int) -> bool:
+        if not is_host_failure(error):
+            return False
+        if attempt + 1 >= min(self.max_attempts, len(self.hosts)):
+            return False
+
+        logger.warning("Retrying on another Ollama host: %s", error)
+        return True
+
+    def call(self, model: str, request, affinity: str = None):
+        """
+        Run `request(client)` on a host of the pool, retrying on another host
+        if the first one fails. Requests with the same `affinity` key go to the
+        same host while it is available and not much busier than the others.
+        """
+        excluded = []
+        for attempt in itertools.count():
+            host = self._acquire(model, excluded, affinity)
+            try:
+                result = request(host.client)
+            except BaseException as e:
+                self._release(host, model, e)
+                if not self._should_retry(e, attempt):
+                    raise
+                excluded.append(host)
+            else:
+                self._release(host, model)
+                return result
+
+    async def acall(self, model: str, request, affinity: str = None):
+        """
+        Async variant of `call`, `request(client)` returns an awaitable.
+        """
+        excluded = []
+        for attempt in itertools.count():
+            host = self._acquire(model, excluded, affinity)
+            try:
+                result = await request(host.get_async_client())
+            except BaseException as e:
+                self._release(host, model, e)
+                if not self._should_retry(e, attempt):
+                    raise
+                excluded.append(host)
+            else:
+                self._release(host, model)
+                return result
+
+    def stream(self, model: str, request, affinity: str = None) -> Iterator:
+        """
+        Stream the chunks of `request(client)` from a host of the pool.
+
+        Note:
+            Only requests failing before their first chunk are retried. The host
+            counts the request as outstanding until the stream is exhausted or
+            closed.
+        """
+        excluded = []
+        for attempt in itertools.count():
+            host = self._acquire(model, excluded, affinity)
+            stream = None
+            try:
+                stream = request(host.client)
+                chunk = next(stream, None)
+            except BaseException as e:
+                try:
+                    # Close the response, even of a request that is not retried.
+                    if stream is not None:
+                        stream.close()
+                finally:
+                    self._release(host, model, e)
+                if not self._should_retry(e, attempt):
+                    raise
+                excluded.append(host)
+            else:
+                break
+
+        error = None
+        try:
+            if chunk is not None:
+                yield chunk
+                yield from stream
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            stream.close()
+            self._release(host, model, error)
+
+    async def astream(self, model: str, request, affinity: str = None) -> AsyncIterator:
+        """
+        Async variant of `stream`, `request(client)` returns an awaitable of an
+        async iterator.
+        """
+        excluded = []
+        for attempt in itertools.count():
+            host = self._acquire(model, excluded, affinity)
+            stream = None
+            try:
+                stream = await request(host.get_async_client())
+                chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                chunk = None
+                break
+            except BaseException as e:
+                try:
+                    if stream is not None:
+                        await stream.aclose()
+                finally:
+                    self._release(host, model, e)
+                if not self._should_retry(e, attempt):
+                    raise
+                excluded.append(host)
+            else:
+                break
+
+        error = None
+        try:
+            if chunk is not None:
+                yield chunk
+                async for chunk in stream:
+                    yield chunk
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await stream.aclose()
+            self._release(host, model, error)
+
+    def check_health(self):
+        """
+        Refresh the health and loaded models of every host.
+
+        Note:
+            Ejected hosts stay out until the end of their ejection even if they
+            pass the check, which doesn't exercise generation.
+        """
+        for host in self.hosts:
+            try:
+                models = {model["name"] for model in host.health_client.ps()["models"]}
+            except Exception as e:
+                with self._lock:
+                    if host.healthy:
+                        logger.warning("Ollama host %s is down: %s", host.url, e)
+                    host.healthy = False
+            else:
+                with self._lock:
+                    if not host.healthy:
+                        logger.info("Ollama host %s is back up", host.url)
+                    host.healthy = True
+                    host.loaded_models = models
+
+    def _run_health_checks(self):
+        while True:
+            self.check_health()
+            time.sleep(self.health_check_interval)
+
+    def start_health_checks(self):
+        """
+        Check the hosts in the background, unless there is a single one: it
+        gets every request whatever its state.
+        """
+        if len(self.hosts) < 2 or not self.health_check_interval:
+            return
+
+        with self._lock:
+            if self._health_checks is None:
+                self._health_checks = threading.Thread(
+                    target=self._run_health_checks,
+                    name="ollama-health-checks",
+                    daemon=True,
+                )
+                self._health_checks.start()
+
+    def stats(self) -> list:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "host": host.url,
+                    "available": host.is_available(now),
+                    "outstanding": host.outstanding,
+                    "requests": host.requests,
+                    "failures": host.failures,
+                    "loaded_models": sorted(host.loaded_models),
+                }
+                for host in self.hosts
+            ]
+
+
+@lazy_singleton
+def get_pool() -> OllamaPool:
+    """
+    Get the process-wide pool of the Ollama hosts configured by
+    `STUDY_BUDDY_OLLAMA_POOL`, or of the single HOST of the client settings.
+    """
+    pool = OllamaPool(
+        get_ollama_pool_setting("HOSTS")
+        or [
+            get_ollama_setting("HOST")
+            or os.getenv("OLLAMA_HOST")
+            or "http://127.0.0.1:11434"
+        ],
+        max_attempts=get_ollama_pool_setting("MAX_ATTEMPTS"),
+        model_load_penalty=get_ollama_pool_setting("MODEL_LOAD_PENALTY"),
+        affinity_max_extra_load=get_ollama_pool_setting("AFFINITY_MAX_EXTRA_LOAD"),
+        eject_after_failures=get_ollama_pool_setting("EJECT_AFTER_FAILURES"),
+        eject_duration=get_ollama_pool_setting("EJECT_DURATION"),
+        health_check_interval=get_ollama_pool_setting("HEALTH_CHECK_INTERVAL"),
+        health_check_timeout=get_ollama_pool_setting("HEALTH_CHECK_TIMEOUT"),
+    )
+    pool.start_health_checks()
+    return pool
+
+
+def warm_up_models(models: list = None) -> dict:
+    """
+    Load `models` (the configured WARM_UP_MODELS by default) into every Ollama
+    host so that the first request doesn't pay for the model load.
+
+    Returns:
+        The error of every model that failed to load, keyed by model (and host,
+        when there are several).
+    """
+    if models is None:
+        models = get_ollama_setting("WARM_UP_MODELS")
+
+    hosts = get_pool().hosts
+    errors = {}
+    for host in hosts:
+        for model in models:
+            try:
+                # A request without a prompt only loads the model.
+                host.client.generate(model=model, keep_alive=get_keep_alive())
+            except Exception as e:
+                logger.warning(
+                    "Failed to warm up model %s on %s: %s", model, host.url, e
+                )
+                errors[model if len(hosts) == 1 else f"{host.url} {model}"] = str(e)
+            else:
+                logger.info("Warmed up model %s on %s", model, host.url)
+
+    return errors
+
+
+def start_warm_up():
+    """
+    Warm up the configured models in the background, if enabled by
+    WARM_UP_ON_STARTUP. Called once the server application is loaded.
+    """
+    if not get_ollama_setting("WARM_UP_ON_STARTUP"):
+        return
+
+    threading.Thread(target=warm_up_models, name="ollama-warm-up", daemon=True).start()
+
+
+def loaded_models() -> list:
+    """
+    List the models currently loaded in the Ollama hosts, with their memory use
+    and when they are due to be unloaded. Hosts that can't be reached are
+    skipped, unless none can.
+    """
+    loaded, reached, error = [], False, None
+    for host in get_pool().hosts:
+        try:
+            models = host.client.ps()["models"]
+        except Exception as e:
+            error = e
+            continue
+
+        reached = True
+        loaded += [
+            {
+                "host": host.url,
+                "model": model["name"],
+                "size": model["size"],
+                "size_vram": model["size_vram"],
+                "expires_at": model["expires_at"],
+            }
+            for model in models
+        ]
+
+    if not reached:
+        raise error
+    return loaded
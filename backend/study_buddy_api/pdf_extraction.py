@@ -0,0 +1,158 @@
+"""
+Page-parallel PDF text extraction.
+
+Large documents are split into page ranges that are processed by a pool of worker
+processes. Every worker opens the same file on disk (shared through the OS page
+cache rather than copied into each request), and a one-byte shared memory block
+is used as an abort flag so the first page with images stops the other workers.
+
+This module only depends on PyMuPDF so that spawned workers stay cheap to start,
+and PyMuPDF itself is imported on the first extraction.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+
+
+logger = logging.getLogger(__name__)
+
+
+# Joins the text of consecutive pages, so that chunking can split on pages.
+PAGE_SEPARATOR = "\f"
+
+
+class PDFContainsImagesError(Exception):
+    pass
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(max_workers: int) -> ProcessPoolExecutor:
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            # Spawned (not forked) workers are safe to start from threaded servers.
+            _executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _extract_page_range(document, start: int, stop: int, aborted=None) -> list:
+    """
+    Extract the text of pages [start, stop), or return None as soon as a page
+    with images is found or `aborted()` becomes true.
+    """
+    texts = []
+
+    for page_num in range(start, stop):
+        if aborted is not None and aborted():
+            return None
+
+        page = document.load_page(page_num)
+        if page.get_images(full=True):
+            return None
+        texts.append(page.get_text("text"))
+
+    return texts
+
+
+def _extract_page_range_from_file(
+    path: str, abort_flag_name: str, start: int, stop: int
+) -> list:
+    import fitz
+
+    abort_flag = SharedMemory(name=abort_flag_name)
+    try:
+        with fitz.open(path, filetype="pdf") as document:
+            texts = _extract_page_range(
+                document, start, stop, aborted=lambda: abort_flag.buf[0]
+            )
+
+        if texts is None:
+            abort_flag.buf[0] = 1
+        return texts
+    finally:
+        abort_flag.close()
+
+
+def _extract_serially(document) -> str:
+    texts = _extract_page_range(document, 0, document.page_count)
+    if texts is None:
+        raise PDFContainsImagesError()
+
+    return PAGE_SEPARATOR.join(texts)
+
+
+def _extract_in_parallel(path: str, page_count: int, workers: int) -> str:
+    abort_flag = SharedMemory(create=True, size=1)
+    try:
+        abort_flag.buf[0] = 0
+
+        pages_per_worker = -(-page_count // workers)
+        executor = _get_executor(workers)
+        futures = [
+            executor.submit(
+                _extract_page_range_from_file,
+                path,
+                abort_flag.name,
+                start,
+                min(start + pages_per_worker, page_count),
+            )
+            for start in range(0, page_count, pages_per_worker)
+        ]
+        results = [future.result() for future in futures]
+    finally:
+        abort_flag.close()
+        abort_flag.unlink()
+
+    if any(texts is None for texts in results):
+        raise PDFContainsImagesError()
+
+    return PAGE_SEPARATOR.join(text for texts in results for text in texts)
+
+
+def extract_pdf_text(path: str, max_workers: int, min_pages_per_worker: int) -> str:
+    """
+    Extract the text of every page of the PDF file at `path`, in page order,
+    separated by form feeds.
+
+    Documents with fewer than `2 * min_pages_per_worker` pages are extracted in
+    the calling thread, larger ones are split across up to `max_workers` processes.
+
+    Raises:
+        PDFContainsImagesError: If any page contains images.
+    """
+    import fitz
+
+    with fitz.open(path, filetype="pdf") as document:
+        page_count = document.page_count
+        workers = min(max_workers, page_count // max(min_pages_per_worker, 1))
+
+        if workers <= 1:
+            return _extract_serially(document)
+
+    try:
+        return _extract_in_parallel(path, page_count, workers)
+    except BrokenProcessPool:
+        logger.warning("PDF extraction pool broke, extracting serially", exc_info=True)
+        _reset_executor()
+        with fitz.open(path, filetype="pdf") as document:
+            return _extract_serially(document)
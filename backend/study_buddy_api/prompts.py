@@ -27,6 +27,28 @@ STUDY_BUDDY_CONTEXT = (
     "Do not in any scenario tell students to reach out to their university or check its websites."
 )
 
+DOCUMENT_EXCERPTS_PROMPT = (
+    "The student is asking about one of their documents. "
+    "Use the following excerpts from it to answer when they are relevant:\n\n{excerpts}"
+)
+
+CHAT_SUMMARY_CONTEXT = (
+    "You are a note taker for a tutoring conversation between a student and an AI tutor. "
+    "Your task is to keep a concise running summary of the conversation that preserves the student's goals, "
+    "the topics covered, key facts and explanations given, and any open questions. "
+    "You should only output the summary without any introductory or explanatory phrases."
+)
+
+CHAT_SUMMARY_PROMPT = (
+    "Summary of the conversation so far:\n{summary}\n\n"
+    "New messages:\n{conversation}\n\n"
+    "Update the summary with the new messages."
+)
+
+CHAT_SUMMARY_MESSAGE = (
+    "Summary of the earlier conversation with the student:\n{summary}"
+)
+
 ############################### PARAPHRASING ####################################
 
 PARAPHRASE_CONTEXT = (
@@ -156,6 +178,11 @@ class QuizModeEnum(Enum):
     FLASH_CARDS = "flash_cards"
 
 
+class QuizFormatEnum(Enum):
+    JSON = "json"
+    TEXT = "text"
+
+
 MULTIPLE_CHOICE_QUESTION_CONTEXT = (
     "You are an expert quiz generator. Your task is to create multiple-choice questions with exactly four answer options. "
     "For each question, only one option should be correct, and you must clearly mark the correct answer. "
@@ -191,3 +218,24 @@ FLASHCARD_PROMPT = (
     "Answer: <Insert answer here>\n\n"
     "Follow this format strictly for every question and make sure to have exactly {question_count} questions."
 )
+
+MULTIPLE_CHOICE_QUESTION_JSON_PROMPT = (
+    "Create {question_count} well-structured, multiple-choice quiz questions on the topic: '{topic}'.\n"
+    "Each question must be clear, concise, and educational, covering a variety of aspects of the topic. "
+    "Ensure questions range from easy to challenging to create a balanced quiz.\n\n"
+    "Respond with a JSON object of this exact shape:\n"
+    '{{"questions": [{{"question": "<question>", "options": ["<option 1>", "<option 2>", "<option 3>", "<option 4>"], "answer": <number of the correct option, 1 to 4>}}]}}\n\n'
+    "Be sure to provide exactly {question_count} questions, each with four unique answer options."
+)
+
+FLASHCARD_JSON_PROMPT = (
+    "Generate {question_count} question about {topic}. "
+    "Respond with a JSON object of this exact shape:\n"
+    '{{"questions": [{{"question": "<question>", "answer": "<answer>"}}]}}\n\n'
+    "Make sure to have exactly {question_count} questions."
+)
+
+QUIZ_TOP_UP_PROMPT = (
+    "Create {question_count} more questions on the same topic, different from the ones above, "
+    "in exactly the same format."
+)
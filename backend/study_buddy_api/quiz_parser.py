@@ -0,0 +1,241 @@
+"""
+Incremental quiz parsers.
+
+The parsers consume the LLM response token by token and return every question as
+soon as it is complete, so quizzes can be streamed to the client and generation
+can be stopped once enough valid questions have been parsed.
+"""
+
+import json
+import re
+
+
+QUESTION_MARKER = "Question:"
+
+QUESTION_TEXT_PATTERN = re.compile(r"(.+?)\n1\.", re.DOTALL)
+OPTION_PATTERN = re.compile(r"(\d)\.\s(.+)")
+ANSWER_PATTERN = re.compile(r"Answer:\s*(\d)")
+FLASHCARD_PATTERN = re.compile(r"Question: (.*?)\nAnswer: (.*?)(?=\n\n|\Z)", re.DOTALL)
+
+JSON_DECODER = json.JSONDecoder()
+JSON_SEPARATORS = re.compile(r"[\s,]*")
+
+
+class QuizStreamParser:
+    """
+    Base class of the incremental parsers.
+
+    `feed` returns the questions completed by a new piece of the response, and
+    `close` the ones that are only known to be complete at the end of it.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        return self._parse(final=False)
+
+    def close(self) -> list:
+        return self._parse(final=True)
+
+    def _parse(self, final: bool) -> list:
+        raise NotImplementedError
+
+
+class MultiChoiceTextParser(QuizStreamParser):
+    """
+    Parse multiple-choice questions in the `Question: / 1. - 4. / Answer:` format.
+    A question is complete once its answer number or the next question is seen.
+    """
+
+    def _parse(self, final: bool) -> list:
+        questions = []
+
+        while (start := self._buffer.find(QUESTION_MARKER)) != -1:
+            body_start = start + len(QUESTION_MARKER)
+            next_start = self._buffer.find(QUESTION_MARKER, body_start)
+
+            if next_start != -1:
+                end = next_start
+            elif answer_match := ANSWER_PATTERN.search(self._buffer, body_start):
+                end = answer_match.end()
+            elif final:
+                end = len(self._buffer)
+            else:
+                break
+
+            block = self._buffer[body_start:end]
+            self._buffer = self._buffer[end:]
+            if question := parse_multi_choice_block(block):
+                questions.append(question)
+
+        return questions
+
+
+class FlashcardTextParser(QuizStreamParser):
+    """
+    Parse flashcards in the `Question: / Answer:` format. A flashcard is complete
+    once a blank line follows its answer.
+    """
+
+    def _parse(self, final: bool) -> list:
+        flashcards = []
+
+        while match := FLASHCARD_PATTERN.search(self._buffer):
+            # Until the stream ends, an answer running to the end of the buffer
+            # may still be growing.
+            if match.end() == len(self._buffer) and not final:
+                break
+
+            self._buffer = self._buffer[match.end() :]
+            flashcards.append(
+                {"Question": match[1].strip(), "Answer": match[2].strip()}
+            )
+
+        return flashcards
+
+
+class JSONQuizParser(QuizStreamParser):
+    """
+    Parse the items of the questions array of a JSON response as each of them is
+    closed, validating them with `validate`. Invalid items are dropped.
+    """
+
+    def __init__(self, validate):
+        super().__init__()
+        self.validate = validate
+        self._in_array = False
+        self._item_count = 0
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        # Items can only be completed by a closing brace.
+        if "}" not in text:
+            return []
+        return self._parse(final=False)
+
+    def _parse(self, final: bool) -> list:
+        questions = []
+
+        if not self._in_array:
+            if (start := self._buffer.find("[")) == -1:
+                return self._parse_whole_response() if final else []
+            self._buffer = self._buffer[start + 1 :]
+            self._in_array = True
+
+        while True:
+            position = JSON_SEPARATORS.match(self._buffer).end()
+            if position == len(self._buffer) or self._buffer[position] == "]":
+                break
+
+            try:
+                item, end = JSON_DECODER.raw_decode(self._buffer, position)
+            except json.JSONDecodeError:
+                break
+
+            self._buffer = self._buffer[end:]
+            self._item_count += 1
+            if isinstance(item, dict) and (question := self.validate(item)):
+                questions.append(question)
+
+        if final and not self._item_count:
+            return self._parse_whole_response()
+
+        return questions
+
+    def _parse_whole_response(self) -> list:
+        # Fallback for responses not shaped as expected, e.g. a single question.
+        try:
+            data = json.loads(self._buffer)
+        except ValueError:
+            return []
+
+        items = data.get("questions", [data]) if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return []
+
+        return [
+            question
+            for item in items
+            if isinstance(item, dict) and (question := self.validate(item))
+        ]
+
+
+def parse_multi_choice_block(block: str) -> dict:
+    """
+    Parse the text following a `Question:` marker, or return None if the block
+    has no question text.
+    """
+    if question_text_match := QUESTION_TEXT_PATTERN.search(block):
+        question_text = question_text_match[1].strip()
+    else:
+        return None
+
+    options = dict(OPTION_PATTERN.findall(block))
+
+    correct_answer_match = ANSWER_PATTERN.search(block)
+    correct_answer = correct_answer_match[1].strip() if correct_answer_match else None
+
+    return {
+        "question": question_text,
+        "options": options,
+        "correct_answer": correct_answer,
+    }
+
+
+def validate_multi_choice_item(item: dict) -> dict:
+    """
+    Validate a multiple-choice question generated in JSON mode and convert it to
+    the shape of the text parser, or return None if it is invalid.
+    """
+    question = item.get("question")
+    options = item.get("options")
+    answer = item.get("answer")
+
+    if not isinstance(question, str) or not question.strip():
+        return None
+    if (
+        not isinstance(options, list)
+        or len(options) != 4
+        or not all(isinstance(option, str) and option.strip() for option in options)
+        or len({option.strip() for option in options}) != 4
+    ):
+        return None
+    try:
+        answer = int(answer)
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= answer <= 4:
+        return None
+
+    return {
+        "question": question.strip(),
+        "options": {
+            str(number): option.strip() for number, option in enumerate(options, 1)
+        },
+        "correct_answer": str(answer),
+    }
+
+
+def validate_flashcard_item(item: dict) -> dict:
+    """
+    Validate a flashcard generated in JSON mode and convert it to the shape of
+    the text parser, or return None if it is invalid.
+    """
+    question = item.get("question")
+    answer = item.get("answer")
+
+    if not isinstance(question, str) or not question.strip():
+        return None
+    if not isinstance(answer, str) or not answer.strip():
+        return None
+
+    return {"Question": question.strip(), "Answer": answer.strip()}
+
+
+def parse_quiz_response(parser: QuizStreamParser, response: str) -> list:
+    """
+    Parse a complete response in one go.
+    """
+    return parser.feed(response) + parser.close()
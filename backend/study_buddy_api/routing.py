@@ -0,0 +1,109 @@
+"""
+Model routing per task.
+
+Every generation is routed to a model tier from its task (the endpoint) and
+variant (summary type, note level, quiz mode...), so that light work runs on a
+small, fast model and only the tasks that need it use the large one. Under load,
+once the scheduler queue reaches FALLBACK_QUEUE_DEPTH, tasks fall back to the
+FALLBACK_TIER to drain the queue faster.
+"""
+
+import logging
+import threading
+
+from .conf import get_settings, lazy_singleton
+from .scheduler import get_scheduler
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_ROUTING = {
+    "TIERS": {"small": "llama3.1", "large": "llama3.1"},
+    "DEFAULT_TIER": "large",
+    # Tier of every task, or `task:variant` for a specific variant of a task.
+    "ROUTES": {
+        "chat": "large",
+        "chat_summary": "small",
+        "paraphrase": "small",
+        "summarize:brief": "small",
+        "summarize": "large",
+        "note:brief": "small",
+        "note": "large",
+        "quiz:flash_cards": "small",
+        "quiz": "large",
+    },
+    "FALLBACK_TIER": "small",
+    # 0 disables the fallback.
+    "FALLBACK_QUEUE_DEPTH": 16,
+}
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        tiers: dict,
+        default_tier: str,
+        routes: dict,
+        fallback_tier: str = None,
+        fallback_queue_depth: int = 0,
+    ):
+        self.tiers = tiers
+        self.default_tier = default_tier
+        self.routes = routes
+        self.fallback_tier = fallback_tier
+        self.fallback_queue_depth = fallback_queue_depth
+
+        self._lock = threading.Lock()
+        self.routed = {}
+
+    def get_tier(self, task: str, variant: str = None) -> str:
+        if variant is not None and (tier := self.routes.get(f"{task}:{variant}")):
+            return tier
+        return self.routes.get(task, self.default_tier)
+
+    def route(self, task: str, variant: str = None) -> str:
+        """
+        Get the model that should serve a task.
+        """
+        tier = self.get_tier(task, variant)
+
+        if (
+            self.fallback_tier
+            and self.fallback_queue_depth
+            and tier != self.fallback_tier
+            and get_scheduler().queue_depth() >= self.fallback_queue_depth
+        ):
+            logger.info("Routing %s to %s under load", task, self.fallback_tier)
+            tier = self.fallback_tier
+
+        model = self.tiers[tier]
+        with self._lock:
+            key = (task, tier, model)
+            self.routed[key] = self.routed.get(key, 0) + 1
+        return model
+
+    def stats(self) -> dict:
+        """
+        Get the number of generations routed, keyed by `(task, tier, model)`.
+        """
+        with self._lock:
+            return dict(self.routed)
+
+
+@lazy_singleton
+def get_model_router() -> ModelRouter:
+    """
+    Get the process-wide model router configured by `STUDY_BUDDY_MODEL_ROUTING`.
+    """
+    config = get_settings("MODEL_ROUTING", DEFAULT_MODEL_ROUTING)
+    return ModelRouter(
+        config["TIERS"],
+        config["DEFAULT_TIER"],
+        config["ROUTES"],
+        config["FALLBACK_TIER"],
+        config["FALLBACK_QUEUE_DEPTH"],
+    )
+
+
+def route_model(task: str, variant: str = None) -> str:
+    return get_model_router().route(task, variant)
@@ -0,0 +1,284 @@
+"""
+Admission control for LLM calls.
+
+Every generation acquires a slot from the process-wide `LLMScheduler` first. The
+scheduler bounds the number of concurrent generations (globally and per model),
+serves waiting requests by priority lane, keeps a few slots for interactive
+requests, and rejects new requests with a 503 and `Retry-After` once its queue is
+full instead of letting latency grow without bound. Requests whose deadline
+passes while they are queued are dropped before they start, with a 504.
+"""
+
+import asyncio
+import bisect
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .conf import get_settings, lazy_singleton
+from .deadlines import DeadlineExceeded, get_deadline, get_remaining_time, is_expired
+from .timing import record_stage
+
+
+DEFAULT_LLM_SCHEDULER = {
+    "MAX_CONCURRENCY": 4,
+    "MODEL_CONCURRENCY": {},
+    "INTERACTIVE_RESERVED": 1,
+    "MAX_QUEUE_DEPTH": 64,
+    "RETRY_AFTER": 5,
+}
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
+class LLMBusyError(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The AI model is busy, please try again shortly."
+    default_code = "llm_busy"
+
+    def __init__(self, wait: int):
+        super().__init__()
+        # Rendered as a `Retry-After` header by DRF's exception handler.
+        self.wait = wait
+
+
+class _Waiter:
+    def __init__(self, model: str, priority: Priority, notify):
+        self.model = model
+        self.priority = priority
+        self.notify = notify
+        self.deadline = get_deadline()
+        self.granted = False
+        self.expired = False
+        self.enqueued_at = time.perf_counter()
+
+
+class LaneStats:
+    def __init__(self):
+        self.count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def observe(self, wait: float):
+        self.count += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+class LLMScheduler:
+    def __init__(
+        self,
+        max_concurrency: int,
+        model_concurrency: dict = None,
+        interactive_reserved: int = 0,
+        max_queue_depth: int = 0,
+        retry_after: int = 5,
+    ):
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency or {}
+        self.interactive_reserved = min(interactive_reserved, max_concurrency - 1)
+        self.max_queue_depth = max_queue_depth
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._queue = []
+        self._active = 0
+        self._active_by_model = {}
+        self.lane_stats = {priority: LaneStats() for priority in Priority}
+        self.rejected = 0
+        self.expired = 0
+
+    def _can_run(self, model: str, priority: Priority) -> bool:
+        limit = self.max_concurrency
+        if priority != Priority.INTERACTIVE:
+            limit -= self.interactive_reserved
+
+        model_limit = self.model_concurrency.get(model)
+        if (
+            model_limit is not None
+            and self._active_by_model.get(model, 0) >= model_limit
+        ):
+            return False
+
+        return self._active < limit
+
+    def _grant(self, waiter: _Waiter):
+        waiter.granted = True
+        self._active += 1
+        self._active_by_model[waiter.model] = (
+            self._active_by_model.get(waiter.model, 0) + 1
+        )
+        self.lane_stats[waiter.priority].observe(
+            time.perf_counter() - waiter.enqueued_at
+        )
+
+    def _submit(self, waiter: _Waiter):
+        """
+        Grant a slot right away if one is free, otherwise queue the waiter.
+
+        Note:
+            Queued waiters are granted as soon as they can run, so a free slot
+            never bypasses a waiter that could have used it.
+        """
+        with self._lock:
+            if is_expired(waiter.deadline):
+                self.expired += 1
+                raise DeadlineExceeded()
+
+            if self._can_run(waiter.model, waiter.priority):
+                self._grant(waiter)
+                return
+
+            if self.max_queue_depth and len(self._queue) >= self.max_queue_depth:
+                self.rejected += 1
+                raise LLMBusyError(self.retry_after)
+
+            bisect.insort(self._queue, (waiter.priority, next(self._sequence), waiter))
+
+    def _release(self, model: str):
+        with self._lock:
+            self._active -= 1
+            self._active_by_model[model] -= 1
+
+            # Wake up waiters in priority order, skipping those whose model is
+            # at its limit so they don't block other models. Expired waiters are
+            # dropped rather than granted.
+            for entry in list(self._queue):
+                waiter = entry[2]
+                if is_expired(waiter.deadline):
+                    self._queue.remove(entry)
+                    self._drop(waiter)
+                    waiter.notify()
+                elif self._can_run(waiter.model, waiter.priority):
+                    self._queue.remove(entry)
+                    self._grant(waiter)
+                    waiter.notify()
+
+    def _cancel(self, waiter: _Waiter) -> bool:
+        """
+        Remove a waiter from the queue, returns False if it was already granted.
+        """
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+            return True
+
+    def _drop(self, waiter: _Waiter):
+        if not waiter.expired:
+            waiter.expired = True
+            self.expired += 1
+
+    def _expire(self, waiter: _Waiter) -> bool:
+        """
+        Drop a waiter whose deadline has passed, returns False if it was granted
+        in the meantime.
+        """
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+            self._drop(waiter)
+            return True
+
+    @contextmanager
+    def slot(self, model: str, priority: Priority = Priority.BULK):
+        """
+        Hold a generation slot for `model`, blocking until one is available.
+
+        Raises:
+            LLMBusyError: If the queue is full.
+            DeadlineExceeded: If the request's deadline passes while it waits.
+        """
+        event = threading.Event()
+        waiter = _Waiter(model, priority, event.set)
+        self._submit(waiter)
+
+        if not waiter.granted:
+            event.wait(get_remaining_time(waiter.deadline))
+            if not waiter.granted and self._expire(waiter):
+                raise DeadlineExceeded()
+        record_stage("llm_queue", time.perf_counter() - waiter.enqueued_at)
+
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    @asynccontextmanager
+    async def aslot(self, model: str, priority: Priority = Priority.BULK):
+        """
+        Async variant of `slot`, waiting without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = _Waiter(
+            model,
+            priority,
+            lambda: loop.call_soon_threadsafe(
+                lambda: future.done() or future.set_result(None)
+            ),
+        )
+        self._submit(waiter)
+
+        if not waiter.granted:
+            try:
+                await asyncio.wait_for(future, get_remaining_time(waiter.deadline))
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                if not self._cancel(waiter):
+                    self._release(model)
+                raise
+            if not waiter.granted and self._expire(waiter):
+                raise DeadlineExceeded()
+        record_stage("llm_queue", time.perf_counter() - waiter.enqueued_at)
+
+        try:
+            yield
+        finally:
+            self._release(model)
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self._active,
+                "queued": len(self._queue),
+                "rejected": self.rejected,
+                "expired": self.expired,
+                "queue_wait": {
+                    priority.name.lower(): {
+                        "count": lane.count,
+                        "total_seconds": lane.total_wait,
+                        "max_seconds": lane.max_wait,
+                    }
+                    for priority, lane in self.lane_stats.items()
+                },
+            }
+
+
+@lazy_singleton
+def get_scheduler() -> LLMScheduler:
+    """
+    Get the process-wide scheduler configured by `STUDY_BUDDY_LLM_SCHEDULER`.
+    """
+    config = get_settings("LLM_SCHEDULER", DEFAULT_LLM_SCHEDULER)
+    return LLMScheduler(
+        max_concurrency=config["MAX_CONCURRENCY"],
+        model_concurrency=config["MODEL_CONCURRENCY"],
+        interactive_reserved=config["INTERACTIVE_RESERVED"],
+        max_queue_depth=config["MAX_QUEUE_DEPTH"],
+        retry_after=config["RETRY_AFTER"],
+    )
@@ -0,0 +1,207 @@
+"""
+Semantic cache for short, frequently repeated requests.
+
+Requests are embedded with a local Ollama embedding model, and a cached answer is
+served when a previous request of the same partition (e.g. chat context or quiz
+mode) is similar enough. Each partition keeps its normalized vectors in a NumPy
+matrix, so a lookup is a single matrix-vector product, and evicts the least
+recently used entry when full.
+"""
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from .conf import get_setting, get_settings, lazy_singleton
+from .ollama_client import get_keep_alive, get_pool
+
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEMANTIC_CACHE = {
+    "ENABLED": False,
+    "MODEL": "nomic-embed-text",
+    # Minimum cosine similarity for a cached answer to be served.
+    "THRESHOLD": 0.92,
+    "MAX_ENTRIES": 1024,
+    "TIMEOUT": 60 * 60 * 24,
+    # Longer requests (e.g. whole documents) are only served by the exact cache.
+    "MAX_QUERY_CHARS": 2000,
+}
+
+
+class SemanticIndex:
+    """
+    Fixed-capacity vector index of one partition. Not thread-safe.
+    """
+
+    def __init__(self, dimensions: int, max_entries: int):
+        import numpy as np
+
+        self.vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self.values = [None] * max_entries
+        self.last_used = np.zeros(max_entries, dtype=np.int64)
+        self.expires_at = np.zeros(max_entries, dtype=np.float64)
+        self.size = 0
+        self._clock = 0
+
+    def _touch(self, index: int):
+        self._clock += 1
+        self.last_used[index] = self._clock
+
+    def search(self, vector: "np.ndarray", threshold: float):
+        """
+        Get the value of the most similar live entry, or None if none reaches
+        `threshold`.
+        """
+        import numpy as np
+
+        if not self.size:
+            return None
+
+        similarities = self.vectors[: self.size] @ vector
+        similarities[self.expires_at[: self.size] < time.time()] = -1
+        index = int(np.argmax(similarities))
+        if similarities[index] < threshold:
+            return None
+
+        self._touch(index)
+        return self.values[index]
+
+    def add(self, vector: "np.ndarray", value, timeout: int):
+        import numpy as np
+
+        if self.size < len(self.values):
+            index = self.size
+            self.size += 1
+        else:
+            # Reuse an expired entry if any, otherwise evict the least recently
+            # used one.
+            expired = np.flatnonzero(self.expires_at < time.time())
+            index = int(expired[0]) if len(expired) else int(np.argmin(self.last_used))
+
+        self.vectors[index] = vector
+        self.values[index] = value
+        self.expires_at[index] = time.time() + timeout
+        self._touch(index)
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        model: str,
+        threshold: float,
+        max_entries: int,
+        timeout: int,
+        max_query_chars: int,
+    ):
+        self.model = model
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.max_query_chars = max_query_chars
+
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, text: str) -> "np.ndarray":
+        import numpy as np
+
+        response = get_pool().call(
+            self.model,
+            lambda client: client.embed(
+                model=self.model, input=text, keep_alive=get_keep_alive()
+            ),
+        )
+        vector = np.asarray(response["embeddings"][0], dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def get(self, partition: str, text: str) -> tuple:
+        """
+        Look up a request, returning `(value, vector)`. The vector is None if the
+        request can't be cached, and should otherwise be passed to `set` on a miss.
+        """
+        if len(text) > self.max_query_chars:
+            return None, None
+
+        try:
+            vector = self.embed(text)
+        except Exception:
+            logger.warning("Semantic cache embedding failed", exc_info=True)
+            return None, None
+
+        with self._lock:
+            index = self._indexes.get(partition)
+            value = index.search(vector, self.threshold) if index else None
+
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value, vector
+
+    def set(self, partition: str, vector: "np.ndarray", value):
+        if vector is None:
+            return
+
+        with self._lock:
+            index = self._indexes.get(partition)
+            if index is None or index.vectors.shape[1] != len(vector):
+                index = self._indexes[partition] = SemanticIndex(
+                    len(vector), self.max_entries
+                )
+            index.add(vector, value, self.timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": {
+                    partition: index.size for partition, index in self._indexes.items()
+                },
+            }
+
+
+@lazy_singleton
+def _get_semantic_cache() -> SemanticCache:
+    config = get_settings("SEMANTIC_CACHE", DEFAULT_SEMANTIC_CACHE)
+    return SemanticCache(
+        config["MODEL"],
+        config["THRESHOLD"],
+        config["MAX_ENTRIES"],
+        config["TIMEOUT"],
+        config["MAX_QUERY_CHARS"],
+    )
+
+
+def get_semantic_cache() -> SemanticCache:
+    """
+    Get the process-wide semantic cache configured by
+    `STUDY_BUDDY_SEMANTIC_CACHE`, or None if it is disabled.
+    """
+    if not get_setting("SEMANTIC_CACHE", "ENABLED", DEFAULT_SEMANTIC_CACHE):
+        return None
+    return _get_semantic_cache()
+
+
+def semantic_lookup(partition: str, text: str) -> tuple:
+    """
+    Look up a request in the semantic cache, returning `(cached_value, store)`.
+    `store(value)` caches the value generated on a miss, and does nothing when
+    the cache is disabled or the request can't be cached.
+    """
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is None:
+        return None, lambda value: None
+
+    cached_value, vector = semantic_cache.get(partition, text)
+    return cached_value, lambda value: semantic_cache.set(partition, vector, value)
@@ -1,20 +1,87 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from .prompts import ContextEnum, NoteLevelEnum, QuizModeEnum, SummaryTypeEnum, ToneEnum
+from .models import ChatMessage, ChatSession
+from .prompts import (
+    ContextEnum,
+    NoteLevelEnum,
+    QuizFormatEnum,
+    QuizModeEnum,
+    SummaryTypeEnum,
+    ToneEnum,
+)
+
+
+class ChatHistoryMessageSerializer(serializers.Serializer):
+    role = serializers.ChoiceField(
+        choices=[ChatMessage.ROLE_USER, ChatMessage.ROLE_ASSISTANT]
+    )
+    content = serializers.CharField(
+        allow_blank=True, trim_whitespace=False, max_length=32000
+    )
 
 
 class ChatSerializer(serializers.Serializer):
-    history = serializers.ListField(child=serializers.JSONField(), required=False)
+    history = ChatHistoryMessageSerializer(many=True, required=False, max_length=500)
     context = serializers.ChoiceField(
         choices=[(context.value, context.name) for context in ContextEnum],
         default=ContextEnum.STUDY_BUDDY.value,
     )
+    # Id returned by the documents endpoint, to chat about that document.
+    document_id = serializers.CharField(required=False, max_length=64)
+
+
+class ChatSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatSession
+        fields = ["id", "context", "message_count", "created_at", "updated_at"]
+        read_only_fields = ["message_count"]
+
+
+class ChatMessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatMessage
+        fields = ["id", "role", "content", "created_at"]
+
+
+class ChatTurnSerializer(serializers.Serializer):
+    content = serializers.CharField(max_length=32000)
+
+
+def validate_upload_size(file):
+    max_size = getattr(settings, "STUDY_BUDDY_MAX_UPLOAD_SIZE", None)
+    if max_size and file.size > max_size:
+        raise serializers.ValidationError(
+            f"File is too large, the maximum size is {max_size} bytes."
+        )
+    return file
 
 
 class BaseContentSerializer(serializers.Serializer):
     file = serializers.FileField(required=False)
     youtube_url = serializers.URLField(required=False)
     text = serializers.CharField(required=False)
+    # Id returned by the documents endpoint, instead of uploading the document.
+    document_id = serializers.CharField(required=False, max_length=64)
+    # Return the id of the stored source text rather than the text itself.
+    return_document_id = serializers.BooleanField(default=False)
+
+    def validate_file(self, file):
+        return validate_upload_size(file)
+
+    def validate(self, data):
+        if data.get("document_id") and any(
+            data.get(source) for source in ("file", "youtube_url", "text")
+        ):
+            raise serializers.ValidationError(
+                "A document_id can't be combined with other sources."
+            )
+        return data
+
+
+class DocumentSerializer(BaseContentSerializer):
+    document_id = None
+    return_document_id = None
 
 
 class ParaphraseSerializer(BaseContentSerializer):
@@ -45,3 +112,83 @@ class QuizSerializer(BaseContentSerializer):
         required=True,
     )
     question_count = serializers.IntegerField(min_value=1, max_value=100, required=True)
+    # Output format requested from the model, JSON is validated more reliably.
+    generation_format = serializers.ChoiceField(
+        choices=[
+            (quiz_format.value, quiz_format.name) for quiz_format in QuizFormatEnum
+        ],
+        default=QuizFormatEnum.JSON.value,
+    )
+
+
+class BatchSerializer(serializers.Serializer):
+    files = serializers.ListField(
+        child=serializers.FileField(), required=False, max_length=20
+    )
+    youtube_urls = serializers.ListField(
+        child=serializers.URLField(), required=False, max_length=20
+    )
+    texts = serializers.ListField(
+        child=serializers.CharField(), required=False, max_length=20
+    )
+    operations = serializers.JSONField()
+    # Store the text extracted from each document and return its id.
+    return_document_id = serializers.BooleanField(default=False)
+
+    operation_serializers = {
+        "note": NoteSerializer,
+        "paraphrase": ParaphraseSerializer,
+        "quiz": QuizSerializer,
+        "summarize": SummarizeSerializer,
+    }
+
+    def validate_files(self, files):
+        return [validate_upload_size(file) for file in files]
+
+    def validate_operations(self, operations):
+        """
+        Validate each operation with the serializer of its endpoint, e.g.
+        `{"type": "summarize", "summary_type": "brief"}`.
+        """
+        if not isinstance(operations, list) or not operations:
+            raise serializers.ValidationError("Expected a non-empty list.")
+        if len(operations) > 10:
+            raise serializers.ValidationError("At most 10 operations are allowed.")
+
+        validated_operations = []
+        errors = {}
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                errors[index] = ["Expected an object."]
+                continue
+
+            params = dict(operation)
+            operation_type = params.pop("type", None)
+            if operation_type not in self.operation_serializers:
+                errors[index] = {
+                    "type": [
+                        f"Expected one of: {', '.join(self.operation_serializers)}."
+                    ]
+                }
+                continue
+
+            serializer = self.operation_serializers[operation_type](data=params)
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+
+            validated_operations.append(
+                {"type": operation_type, **serializer.validated_data}
+            )
+
+        if errors:
+            raise serializers.ValidationError(errors)
+
+        return validated_operations
+
+    def validate(self, attrs):
+        if not any(attrs.get(field) for field in ("files", "youtube_urls", "texts")):
+            raise serializers.ValidationError(
+                "Provide at least one document in files, youtube_urls or texts."
+            )
+        return attrs
@@ -0,0 +1,469 @@
+"""
+Endpoint logic shared by the API views, the Celery job tasks and batch requests.
+
+Each service takes the validated data of the matching serializer and returns the
+response body of the endpoint.
+"""
+
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from .deadlines import DeadlineExceeded
+from .documents import find_document, retrieve_chunks, store_document
+from .history import get_history_manager
+from .models import ChatMessage, ChatSession
+from .prompts import (
+    DOCUMENT_EXCERPTS_PROMPT,
+    PARAPHRASE_CONTEXT,
+    STUDY_NOTES_CONTEXT,
+    SUMMARIZE_CONTEXT,
+    NoteLevelEnum,
+    SummaryTypeEnum,
+    get_context_string,
+    get_note_prompt_template,
+    get_paraphrase_prompt_template,
+    get_summary_prompt_template,
+)
+from .routing import route_model
+from .scheduler import Priority
+from .semantic_cache import semantic_lookup
+from .utils import (
+    create_prompt_and_get_response,
+    create_prompt_and_stream_response,
+    generate_llm_response,
+    generate_quiz_questions,
+    get_extracted_text_from_sources,
+    get_source_hash,
+    stream_llm_response,
+    stream_quiz_questions,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def route_request_model(task: str, body: dict) -> str:
+    """
+    Route a request of an endpoint to a model, by summary type, note level or
+    quiz mode.
+    """
+    if task == "summarize":
+        variant = body["summary_type"]
+    elif task == "note":
+        variant = NoteLevelEnum(body["level"]).name.lower()
+    elif task == "quiz":
+        variant = body["mode"]
+    else:
+        variant = None
+
+    return route_model(task, variant)
+
+
+def chat_system_message(body: dict) -> dict:
+    """
+    Build the system message of a chat, with the excerpts of the document most
+    relevant to the last message when the chat is about a document.
+    """
+    context_message = get_context_string(body["context"])
+
+    history = body.get("history", [])
+    if (document_id := body.get("document_id")) and history:
+        query = str(history[-1].get("content", ""))
+        excerpts = "\n\n".join(retrieve_chunks(document_id, query))
+        context_message = (
+            f"{context_message}\n\n"
+            f"{DOCUMENT_EXCERPTS_PROMPT.format(excerpts=excerpts)}"
+        )
+
+    return {"role": "system", "content": context_message}
+
+
+def _chat_prompts(body: dict) -> list:
+    return get_history_manager().build_messages(
+        chat_system_message(body), body.get("history", [])
+    )
+
+
+def chat_semantic_lookup(body: dict, model: str) -> tuple:
+    """
+    Look up the question of a single-turn chat to `model` in the semantic cache,
+    returning `(cached_response, store)` as `semantic_lookup` does.
+    Conversations with history are never served from it.
+    """
+    history = body.get("history", [])
+    if (
+        len(history) != 1
+        or not isinstance(history[0], dict)
+        or history[0].get("role") != "user"
+        or not isinstance(history[0].get("content"), str)
+    ):
+        return None, lambda value: None
+
+    partition = f"chat:{model}:{body['context']}:{body.get('document_id', '')}"
+    return semantic_lookup(partition, history[0]["content"])
+
+
+def chat(body: dict) -> dict:
+    model = route_model("chat")
+    cached_response, store = chat_semantic_lookup(body, model)
+    if cached_response is not None:
+        return {"data": cached_response, "model": model}
+
+    llm_response = generate_llm_response(
+        _chat_prompts(body), model, use_cache=False, priority=Priority.INTERACTIVE
+    )
+    store(llm_response)
+
+    return {"data": llm_response, "model": model}
+
+
+def stream_chat(body: dict) -> tuple:
+    model = route_model("chat")
+    cached_response, store = chat_semantic_lookup(body, model)
+    if cached_response is not None:
+        return iter([cached_response]), {"model": model}
+
+    def tokens():
+        response = []
+        for token in stream_llm_response(
+            _chat_prompts(body), model, use_cache=False, priority=Priority.INTERACTIVE
+        ):
+            response.append(token)
+            yield token
+        store("".join(response).strip())
+
+    return tokens(), {"model": model}
+
+
+def _session_chat_prompts(session: ChatSession, content: str) -> list:
+    """
+    Build the prompts of a session turn from the latest stored messages and the
+    new user message.
+
+    Note:
+        Summaries are keyed by session and message position, so the prompt prefix
+        (system prompt, summary, older turns) only changes when messages are
+        folded into the summary, and Ollama can reuse its cache for the prefix.
+    """
+    limit = getattr(settings, "STUDY_BUDDY_CHAT_SESSION_MESSAGES", 100)
+    history = [message.as_prompt() for message in session.latest_messages(limit)]
+    history.append({"role": ChatMessage.ROLE_USER, "content": content})
+
+    context_message = get_context_string(session.context)
+    return get_history_manager().build_messages(
+        {"role": "system", "content": context_message},
+        history,
+        conversation_id=f"session:{session.id}",
+        offset=session.message_count - len(history) + 1,
+    )
+
+
+def _save_session_turn(session: ChatSession, content: str, llm_response: str):
+    """
+    Store a user message and its reply together, so failed generations leave
+    no unanswered message behind.
+    """
+    with transaction.atomic():
+        ChatMessage.objects.bulk_create(
+            [
+                ChatMessage(
+                    session=session, role=ChatMessage.ROLE_USER, content=content
+                ),
+                ChatMessage(
+                    session=session,
+                    role=ChatMessage.ROLE_ASSISTANT,
+                    content=llm_response,
+                ),
+            ]
+        )
+        ChatSession.objects.filter(pk=session.pk).update(
+            message_count=F("message_count") + 2, updated_at=timezone.now()
+        )
+
+
+def session_chat(session: ChatSession, content: str) -> dict:
+    model = route_model("chat")
+    llm_response = generate_llm_response(
+        _session_chat_prompts(session, content),
+        model,
+        use_cache=False,
+        priority=Priority.INTERACTIVE,
+        affinity=f"session:{session.id}",
+    )
+    _save_session_turn(session, content, llm_response)
+
+    return {"data": llm_response, "model": model}
+
+
+def stream_session_chat(session: ChatSession, content: str) -> tuple:
+    prompts = _session_chat_prompts(session, content)
+    model = route_model("chat")
+
+    def tokens():
+        response = []
+        for token in stream_llm_response(
+            prompts,
+            model,
+            use_cache=False,
+            priority=Priority.INTERACTIVE,
+            affinity=f"session:{session.id}",
+        ):
+            response.append(token)
+            yield token
+        _save_session_turn(session, content, "".join(response).strip())
+
+    return tokens(), {"model": model}
+
+
+def content_source_fields(body: dict, extracted_text: str) -> dict:
+    """
+    Describe the source of a content response: the extracted text, or the id of
+    the stored document when the request references one or asks for it.
+    """
+    if document_id := body.get("document_id"):
+        return {"document_id": document_id}
+
+    if body.get("return_document_id"):
+        return {"document_id": store_document(extracted_text).id}
+
+    return {"extracted_text": extracted_text}
+
+
+def paraphrase_prompt_args(body: dict) -> tuple:
+    return PARAPHRASE_CONTEXT, body, get_paraphrase_prompt_template(body["tone"])
+
+
+def paraphrase(body: dict) -> dict:
+    model = route_request_model("paraphrase", body)
+    llm_response, extracted_text = create_prompt_and_get_response(
+        *paraphrase_prompt_args(body), model=model
+    )
+
+    return {
+        "data": llm_response,
+        "model": model,
+        **content_source_fields(body, extracted_text),
+    }
+
+
+def stream_paraphrase(body: dict) -> tuple:
+    model = route_request_model("paraphrase", body)
+    tokens, extracted_text = create_prompt_and_stream_response(
+        *paraphrase_prompt_args(body), model=model
+    )
+    return tokens, {"model": model, **content_source_fields(body, extracted_text)}
+
+
+def summarize_prompt_args(body: dict) -> tuple:
+    template = get_summary_prompt_template(body["summary_type"])
+    # Chunks of long documents are condensed in detail before the final pass.
+    map_template = get_summary_prompt_template(SummaryTypeEnum.DETAILED.value)
+    return SUMMARIZE_CONTEXT, body, template, map_template
+
+
+def summarize(body: dict) -> dict:
+    model = route_request_model("summarize", body)
+    llm_response, extracted_text = create_prompt_and_get_response(
+        *summarize_prompt_args(body), model=model
+    )
+
+    return {
+        "data": llm_response,
+        "model": model,
+        **content_source_fields(body, extracted_text),
+    }
+
+
+def stream_summarize(body: dict) -> tuple:
+    model = route_request_model("summarize", body)
+    tokens, extracted_text = create_prompt_and_stream_response(
+        *summarize_prompt_args(body), model=model
+    )
+    return tokens, {"model": model, **content_source_fields(body, extracted_text)}
+
+
+def note_prompt_args(body: dict) -> tuple:
+    template = get_note_prompt_template(body["level"])
+    # Chunks of long documents are condensed in detail before the final pass.
+    map_template = get_note_prompt_template(NoteLevelEnum.DETAILED.value)
+    return STUDY_NOTES_CONTEXT, body, template, map_template
+
+
+def note(body: dict) -> dict:
+    model = route_request_model("note", body)
+    llm_response, extracted_text = create_prompt_and_get_response(
+        *note_prompt_args(body), model=model
+    )
+
+    return {
+        "data": llm_response,
+        "model": model,
+        **content_source_fields(body, extracted_text),
+    }
+
+
+def stream_note(body: dict) -> tuple:
+    model = route_request_model("note", body)
+    tokens, extracted_text = create_prompt_and_stream_response(
+        *note_prompt_args(body), model=model
+    )
+    return tokens, {"model": model, **content_source_fields(body, extracted_text)}
+
+
+def _quiz_args(body: dict) -> tuple:
+    topic = get_extracted_text_from_sources(body)
+    return topic, body["question_count"], body["mode"], body["generation_format"]
+
+
+def quiz(body: dict) -> dict:
+    model = route_request_model("quiz", body)
+    llm_response = generate_quiz_questions(*_quiz_args(body), model)
+
+    return {"data": llm_response, "model": model}
+
+
+def stream_quiz(body: dict) -> tuple:
+    model = route_request_model("quiz", body)
+    return stream_quiz_questions(*_quiz_args(body), model), {"model": model}
+
+
+def document(body: dict) -> dict:
+    """
+    Store the text of a document, extracting it only if the same sources were
+    not uploaded before.
+    """
+    source_hash = get_source_hash(body)
+    if (stored_document := find_document(source_hash)) is None:
+        stored_document = store_document(
+            get_extracted_text_from_sources(body), source_hash
+        )
+
+    return {
+        "data": {
+            "document_id": stored_document.id,
+            "char_count": stored_document.char_count,
+        }
+    }
+
+
+ENDPOINT_SERVICES = {
+    "chat": chat,
+    "document": document,
+    "note": note,
+    "paraphrase": paraphrase,
+    "quiz": quiz,
+    "summarize": summarize,
+}
+
+
+def _describe_documents(body: dict) -> list:
+    return (
+        [{"file": file} for file in body.get("files", [])]
+        + [{"youtube_url": url} for url in body.get("youtube_urls", [])]
+        + [{"text": text} for text in body.get("texts", [])]
+    )
+
+
+def _run_batch_step(func, *args) -> tuple:
+    """
+    Run one step of a batch, returning `(result, error)` so that a failing
+    item does not fail the whole batch.
+    """
+    try:
+        return func(*args), None
+    except DeadlineExceeded:
+        # The whole request has run out of time, not just this item.
+        raise
+    except APIException as e:
+        return None, e.detail
+    except Exception as e:
+        logger.exception("Batch item failed")
+        return None, str(e)
+
+
+def _run_operation(operation: dict, extracted_text: str) -> dict:
+    params = {
+        key: value
+        for key, value in operation.items()
+        if key not in ("type", "document_id")
+    }
+    response = ENDPOINT_SERVICES[operation["type"]]({**params, "text": extracted_text})
+    response.pop("extracted_text", None)
+    return response
+
+
+def batch(body: dict) -> dict:
+    """
+    Run every operation on every document of a batch request.
+
+    Each document is extracted once, and its operations are queued as soon as
+    its extraction is done. Extractions and LLM calls share a pool of
+    `STUDY_BUDDY_BATCH_CONCURRENCY` workers. Errors are reported per item.
+    The extracted texts are not returned, but stored when `return_document_id`
+    is set, with the `document_id` of each item.
+    """
+    documents = _describe_documents(body)
+    operations = body["operations"]
+    concurrency = getattr(settings, "STUDY_BUDDY_BATCH_CONCURRENCY", 4)
+    # Run every step in its own copy of the request's context, so that it keeps
+    # the request deadline and timings.
+    request_context = contextvars.copy_context()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        def submit(func, *args):
+            return executor.submit(request_context.copy().run, func, *args)
+
+        def process_document(document):
+            text, error = _run_batch_step(get_extracted_text_from_sources, document)
+            if error is not None:
+                return text, error, []
+
+            return (
+                text,
+                None,
+                [
+                    submit(_run_batch_step, _run_operation, operation, text)
+                    for operation in operations
+                ],
+            )
+
+        document_futures = [
+            submit(process_document, document) for document in documents
+        ]
+
+        items = []
+        for document, document_future in zip(documents, document_futures):
+            text, error, operation_futures = document_future.result()
+
+            source = next(iter(document))
+            item = {"source": source}
+            if source != "text":
+                item[source] = getattr(document[source], "name", document[source])
+
+            if error is not None:
+                item["error"] = error
+                items.append(item)
+                continue
+
+            if body.get("return_document_id"):
+                item["document_id"] = store_document(text).id
+            item["results"] = []
+            for operation, operation_future in zip(operations, operation_futures):
+                data, operation_error = operation_future.result()
+                result = {"operation": operation["type"]}
+                if operation_error is not None:
+                    result["error"] = operation_error
+                else:
+                    result.update(data)
+                item["results"].append(result)
+            items.append(item)
+
+    return {"data": items}
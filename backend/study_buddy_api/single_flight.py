@@ -0,0 +1,363 @@
+"""
+Coalescing of identical in-flight generations.
+
+When several requests need the same generation at once (e.g. a class summarizing
+a shared video), the first one runs it and the others wait for its result
+instead of queueing identical GPU jobs. Generations are keyed by a fingerprint of
+everything that determines them, see `make_flight_key`.
+
+Within a process, waiting requests share the result (or the error) of the
+running one. With the "redis" backend, the running request also holds a lock in
+Redis, and requests of other workers wait for the result it publishes. If it
+fails or is cancelled, the waiting requests run the generation themselves, as
+they do when it runs past its own request deadline.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+
+from .conf import get_setting, lazy_singleton
+from .deadlines import DeadlineExceeded, check_deadline, get_remaining_time
+from .timing import stage
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SINGLE_FLIGHT = {
+    "ENABLED": True,
+    # "local" coalesces within a process, "redis" across processes too.
+    "BACKEND": "local",
+    "LOCATION": "redis://127.0.0.1:6379/1",
+    "KEY_PREFIX": "study_buddy:flight:",
+    # Expiry of the Redis lock, in case its holder dies; longer than a generation.
+    "LOCK_TIMEOUT": 600,
+    # How long results stay in Redis for the waiting requests to read them.
+    "RESULT_TIMEOUT": 60,
+    "POLL_INTERVAL": 0.2,
+}
+
+# Deletes the lock only if it is still held by the given token.
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def make_flight_key(*parts) -> str:
+    """
+    Hash the parts that determine a generation into a key, e.g. the model,
+    prompts and extracted text.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RedisFlightBackend:
+    """
+    Cross-process locks and results of in-flight generations, stored in Redis.
+    """
+
+    def __init__(
+        self,
+        location: str,
+        key_prefix: str = "",
+        lock_timeout: int = 600,
+        result_timeout: int = 60,
+    ):
+        import redis
+
+        self.client = redis.Redis.from_url(location)
+        self.key_prefix = key_prefix
+        self.lock_timeout = lock_timeout
+        self.result_timeout = result_timeout
+        self._release_lock = self.client.register_script(RELEASE_LOCK_SCRIPT)
+
+    def acquire(self, key: str):
+        """
+        Get the lock of a generation, returning its token, or None if another
+        process holds it.
+        """
+        token = uuid.uuid4().hex
+        if self.client.set(
+            f"{self.key_prefix}lock:{key}", token, nx=True, ex=self.lock_timeout
+        ):
+            return token
+        return None
+
+    def release(self, key: str, token: str):
+        self._release_lock(keys=[f"{self.key_prefix}lock:{key}"], args=[token])
+
+    def is_locked(self, key: str) -> bool:
+        return bool(self.client.exists(f"{self.key_prefix}lock:{key}"))
+
+    def get_result(self, key: str):
+        value = self.client.get(f"{self.key_prefix}result:{key}")
+        return json.loads(value) if value is not None else None
+
+    def set_result(self, key: str, result):
+        self.client.set(
+            f"{self.key_prefix}result:{key}",
+            json.dumps(result),
+            ex=self.result_timeout,
+        )
+
+
+class _Call:
+    """
+    A generation in flight in this process, awaited by sync and async callers.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def finish(self, result=None, error: Exception = None, cancelled: bool = False):
+        with self._lock:
+            self.result, self.error, self.cancelled = result, error, cancelled
+            self.done.set()
+            futures, self._futures = self._futures, []
+
+        for loop, future in futures:
+            loop.call_soon_threadsafe(
+                lambda future: future.done() or future.set_result(None), future
+            )
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.done.is_set():
+                return
+            future = loop.create_future()
+            self._futures.append((loop, future))
+        await future
+
+
+class SingleFlight:
+    def __init__(self, backend: RedisFlightBackend = None, poll_interval: float = 0.2):
+        self.backend = backend
+        self.poll_interval = poll_interval
+
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = {"local": 0, "shared": 0}
+
+    def _join(self, key: str) -> tuple:
+        """
+        Get the call in flight for `key`, and whether the caller leads it.
+        """
+        with self._lock:
+            if key in self._calls:
+                self.coalesced["local"] += 1
+                return self._calls[key], False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def _finish(self, key: str, call: _Call, **outcome):
+        with self._lock:
+            del self._calls[key]
+        call.finish(**outcome)
+
+    def _follow(self, call: _Call):
+        # The leader was cancelled (e.g. its client disconnected): lead instead.
+        if call.cancelled:
+            return False, None
+        if call.error is not None:
+            raise call.error
+        return True, call.result
+
+    def do(self, key: str, generate):
+        """
+        Run `generate()`, or wait for the identical generation in flight and get
+        its result.
+        """
+        while True:
+            call, leader = self._join(key)
+            if not leader:
+                with stage("llm_coalesced"):
+                    if not call.done.wait(get_remaining_time()):
+                        raise DeadlineExceeded()
+                done, result = self._follow(call)
+                if done:
+                    return result
+                continue
+
+            try:
+                result = self._run_shared(key, generate)
+            except DeadlineExceeded:
+                self._finish(key, call, cancelled=True)
+                raise
+            except Exception as e:
+                self._finish(key, call, error=e)
+                raise
+            except BaseException:
+                self._finish(key, call, cancelled=True)
+                raise
+            self._finish(key, call, result=result)
+            return result
+
+    async def ado(self, key: str, generate):
+        """
+        Async variant of `do`, `generate()` returns an awaitable.
+        """
+        while True:
+            call, leader = self._join(key)
+            if not leader:
+                with stage("llm_coalesced"):
+                    try:
+                        await asyncio.wait_for(call.wait(), get_remaining_time())
+                    except asyncio.TimeoutError:
+                        raise DeadlineExceeded()
+                done, result = self._follow(call)
+                if done:
+                    return result
+                continue
+
+            try:
+                result = await self._arun_shared(key, generate)
+            except DeadlineExceeded:
+                self._finish(key, call, cancelled=True)
+                raise
+            except Exception as e:
+                self._finish(key, call, error=e)
+                raise
+            except BaseException:
+                self._finish(key, call, cancelled=True)
+                raise
+            self._finish(key, call, result=result)
+            return result
+
+    def _count_shared(self):
+        with self._lock:
+            self.coalesced["shared"] += 1
+
+    def _run_shared(self, key: str, generate):
+        if self.backend is None:
+            return generate()
+
+        try:
+            while True:
+                if (result := self.backend.get_result(key)) is not None:
+                    self._count_shared()
+                    return result
+                if (token := self.backend.acquire(key)) is not None:
+                    break
+                # Another process is generating: wait until it releases the lock,
+                # then read its result, or generate if it failed.
+                with stage("llm_coalesced"):
+                    while self.backend.is_locked(key):
+                        check_deadline()
+                        time.sleep(self.poll_interval)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            logger.warning("Single-flight lock failed", exc_info=True)
+            return generate()
+
+        try:
+            result = generate()
+            self._publish(key, result)
+            return result
+        finally:
+            self._release(key, token)
+
+    async def _arun_shared(self, key: str, generate):
+        if self.backend is None:
+            return await generate()
+
+        try:
+            while True:
+                result = await asyncio.to_thread(self.backend.get_result, key)
+                if result is not None:
+                    self._count_shared()
+                    return result
+                token = await asyncio.to_thread(self.backend.acquire, key)
+                if token is not None:
+                    break
+                with stage("llm_coalesced"):
+                    while await asyncio.to_thread(self.backend.is_locked, key):
+                        check_deadline()
+                        await asyncio.sleep(self.poll_interval)
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            logger.warning("Single-flight lock failed", exc_info=True)
+            return await generate()
+
+        try:
+            result = await generate()
+            await asyncio.to_thread(self._publish, key, result)
+            return result
+        finally:
+            await asyncio.to_thread(self._release, key, token)
+
+    def _publish(self, key: str, result):
+        try:
+            self.backend.set_result(key, result)
+        except Exception:
+            logger.warning("Single-flight result store failed", exc_info=True)
+
+    def _release(self, key: str, token: str):
+        try:
+            self.backend.release(key, token)
+        except Exception:
+            logger.warning("Single-flight lock release failed", exc_info=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.coalesced)
+
+
+def get_single_flight_setting(name: str):
+    return get_setting("SINGLE_FLIGHT", name, DEFAULT_SINGLE_FLIGHT)
+
+
+@lazy_singleton
+def _get_single_flight() -> SingleFlight:
+    backend = None
+    if get_single_flight_setting("BACKEND") == "redis":
+        backend = RedisFlightBackend(
+            get_single_flight_setting("LOCATION"),
+            get_single_flight_setting("KEY_PREFIX"),
+            get_single_flight_setting("LOCK_TIMEOUT"),
+            get_single_flight_setting("RESULT_TIMEOUT"),
+        )
+    return SingleFlight(backend, get_single_flight_setting("POLL_INTERVAL"))
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    Get the process-wide single-flight group configured by
+    `STUDY_BUDDY_SINGLE_FLIGHT`, or None if it is disabled.
+    """
+    if not get_single_flight_setting("ENABLED"):
+        return None
+    return _get_single_flight()
+
+
+def coalesce(key: str, generate):
+    """
+    Run `generate()` through the single-flight group, if enabled.
+    """
+    if (single_flight := get_single_flight()) is None:
+        return generate()
+    return single_flight.do(key, generate)
+
+
+async def acoalesce(key: str, generate):
+    """
+    Async variant of `coalesce`.
+    """
+    if (single_flight := get_single_flight()) is None:
+        return await generate()
+    return await single_flight.ado(key, generate)
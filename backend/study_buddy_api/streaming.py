@@ -0,0 +1,230 @@
+"""
+Server-Sent Events responses relaying LLM tokens as they are generated.
+
+Under WSGI, token iterators are consumed by the worker thread of the request.
+Under ASGI, Django buffers sync iterators whole before sending them, so the
+tokens of sync views are produced in a thread of their own and relayed by an
+async iterator (see `aiterate_in_thread`), as are the async tokens of the async
+views. Under ASGI, streams are cancelled when the client disconnects (see
+`Ensuite.handlers`), which closes their Ollama stream and frees their scheduler
+slot. Under WSGI, a disconnect only shows once a write fails, so the generation
+runs until the next token is sent.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, Union
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+
+logger = logging.getLogger(__name__)
+
+EVENT_STREAM_CONTENT_TYPE = "text/event-stream"
+
+
+def format_sse_event(data: dict, event: str = None) -> str:
+    """
+    Format a payload as a single Server-Sent Event.
+    """
+    lines = [f"event: {event}"] if event else []
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Renders regular DRF responses (e.g. validation errors) as an SSE error event
+    so that clients sending `Accept: text/event-stream` still get a readable body.
+    """
+
+    media_type = EVENT_STREAM_CONTENT_TYPE
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return format_sse_event(data, event="error").encode(self.charset)
+
+
+class EventStreamMixin:
+    """
+    Adds an opt-in token streaming mode to a view, enabled with `?stream=1`
+    or an `Accept: text/event-stream` header.
+    """
+
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [EventStreamRenderer]
+
+    def wants_event_stream(self, request) -> bool:
+        return wants_event_stream(request)
+
+    def event_stream_response(
+        self, tokens: Iterator, metadata: dict = None, event: str = "token"
+    ) -> StreamingHttpResponse:
+        """
+        `event_stream_response` for the tokens of a sync view, relayed by an
+        async iterator under ASGI.
+        """
+        if is_asgi_request(self.request):
+            tokens = aiterate_in_thread(tokens)
+        return event_stream_response(tokens, metadata, event)
+
+
+def wants_event_stream(request) -> bool:
+    """
+    Whether a request opts in to token streaming, with `?stream=1` or an
+    `Accept: text/event-stream` header.
+    """
+    if request.GET.get("stream", "").lower() in ("1", "true"):
+        return True
+    return EVENT_STREAM_CONTENT_TYPE in request.META.get("HTTP_ACCEPT", "")
+
+
+def is_asgi_request(request) -> bool:
+    # DRF requests wrap the Django request.
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+def _close_in_thread(items: Iterator):
+    if close := getattr(items, "close", None):
+        close()
+    # The thread ends with the stream, as would a WSGI worker's request.
+    connections.close_all()
+
+
+async def aiterate_in_thread(items: Iterator) -> AsyncIterator:
+    """
+    Iterate over a blocking iterator from async code, getting its items in a
+    thread of its own, with the context of the caller.
+
+    Closing the async iterator, e.g. when the ASGI handler cancels the response
+    of a disconnected client, waits for the item in progress and then closes
+    `items`, which stops its generation.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-stream")
+    end = object()
+
+    def run_in_thread(func, *args) -> asyncio.Future:
+        context = contextvars.copy_context()
+        return loop.run_in_executor(executor, context.run, func, *args)
+
+    pending = None
+    try:
+        while True:
+            # Shielded, as the thread can't be interrupted: a cancellation
+            # waits for the item in progress below.
+            pending = run_in_thread(next, items, end)
+            item = await asyncio.shield(pending)
+            if item is end:
+                return
+            yield item
+    finally:
+        if pending is not None and not pending.done():
+            await asyncio.wait([pending])
+        await asyncio.shield(run_in_thread(_close_in_thread, items))
+        executor.shutdown(wait=False)
+
+
+class StreamTimings:
+    """
+    Time to first token, total time and token count of a stream, sent in its
+    final `done` event.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.first_token_at = None
+        self.token_count = 0
+
+    def add_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.token_count += 1
+
+    def as_dict(self) -> dict:
+        finished_at = time.perf_counter()
+        return {
+            "time_to_first_token_ms": (
+                round((self.first_token_at - self.started_at) * 1000, 1)
+                if self.first_token_at is not None
+                else None
+            ),
+            "total_ms": round((finished_at - self.started_at) * 1000, 1),
+            "token_count": self.token_count,
+        }
+
+
+def format_stream_error(error: Exception) -> str:
+    """
+    Format an error raised while streaming as an SSE `error` event. Called
+    from the `except` block handling it.
+    """
+    if isinstance(error, APIException):
+        data = {"detail": error.detail}
+        if wait := getattr(error, "wait", None):
+            data["retry_after"] = wait
+        return format_sse_event(data, event="error")
+
+    logger.exception("LLM stream failed")
+    return format_sse_event({"detail": str(error)}, event="error")
+
+
+def event_stream_response(
+    tokens: Union[Iterator, AsyncIterator],
+    metadata: dict = None,
+    event: str = "token",
+) -> StreamingHttpResponse:
+    """
+    Relay LLM tokens to the client as SSE `token` events, followed by a final
+    `done` event carrying the metadata and timings of the generation.
+
+    Note:
+        Other kinds of items (e.g. quiz questions) are sent as `event` events,
+        with the item under the `event` key. `tokens` may be an async iterator,
+        which only streams under ASGI.
+    """
+    timings = StreamTimings()
+
+    def events():
+        try:
+            for token in tokens:
+                timings.add_token()
+                yield format_sse_event({event: token}, event=event)
+        except Exception as e:
+            yield format_stream_error(e)
+            return
+
+        yield format_sse_event(
+            {**(metadata or {}), "timings": timings.as_dict()}, event="done"
+        )
+
+    async def aevents():
+        try:
+            async for token in tokens:
+                timings.add_token()
+                yield format_sse_event({event: token}, event=event)
+        except Exception as e:
+            yield format_stream_error(e)
+            return
+
+        yield format_sse_event(
+            {**(metadata or {}), "timings": timings.as_dict()}, event="done"
+        )
+
+    response = StreamingHttpResponse(
+        aevents() if hasattr(tokens, "__aiter__") else events(),
+        content_type=EVENT_STREAM_CONTENT_TYPE,
+    )
+    response["Cache-Control"] = "no-cache"
+    # Disable proxy buffering (nginx) so tokens reach the client immediately.
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,57 @@
+from celery import shared_task
+from django.conf import settings
+from django.core.files.storage import default_storage
+from rest_framework.exceptions import APIException
+
+from .scheduler import LLMBusyError
+from .services import ENDPOINT_SERVICES
+from .utils import get_extracted_text_from_sources
+
+
+SOURCE_FIELDS = ("file", "youtube_url", "text")
+
+
+@shared_task(bind=True)
+def run_endpoint_job(self, endpoint: str, body: dict) -> dict:
+    """
+    Run the work of an API endpoint outside of the HTTP request.
+
+    Uploaded files are passed as a `file_path` in the default storage, which is
+    removed once the job is done. Validation errors raised by the endpoint are
+    returned as `{"error": ...}` rather than failing the task, as is an
+    `LLMBusyError` once the job has been retried STUDY_BUDDY_JOB_MAX_RETRIES
+    times.
+    """
+    file_path = body.pop("file_path", None)
+
+    try:
+        if file_path:
+            body["file"] = default_storage.open(file_path)
+
+        # Stored documents are loaded by the endpoint itself, and the document
+        # endpoint only extracts sources it has not stored before.
+        if endpoint not in ("chat", "document") and not body.get("document_id"):
+            self.update_state(state="PROGRESS", meta={"stage": "extracting"})
+            extracted_text = get_extracted_text_from_sources(body)
+            body = {
+                key: value for key, value in body.items() if key not in SOURCE_FIELDS
+            }
+            body["text"] = extracted_text
+
+        self.update_state(state="PROGRESS", meta={"stage": "generating"})
+        return ENDPOINT_SERVICES[endpoint](body)
+    except LLMBusyError as e:
+        # The worker's own scheduler is saturated, try again later rather than
+        # failing the job, with the extracted text so that the upload (removed
+        # below) is not needed anymore.
+        max_retries = getattr(settings, "STUDY_BUDDY_JOB_MAX_RETRIES", 20)
+        if self.request.retries >= max_retries:
+            return {"error": e.detail, "status_code": e.status_code}
+        raise self.retry(
+            args=(endpoint, body), exc=e, countdown=e.wait, max_retries=max_retries
+        )
+    except APIException as e:
+        return {"error": e.detail, "status_code": e.status_code}
+    finally:
+        if file_path:
+            default_storage.delete(file_path)
@@ -0,0 +1,184 @@
+"""
+Base test case running the API against the stub Ollama servers of the
+benchmarks.
+"""
+
+import json
+import socket
+import time
+from urllib.parse import urlencode
+
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import close_old_connections
+from django.test import TestCase, override_settings
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_server
+from Ensuite.handlers import get_asgi_application
+
+from ..cache import get_llm_cache
+from ..documents import get_document_index
+from ..history import get_history_manager
+from ..ollama_client import get_pool
+from ..routing import get_model_router
+from ..scheduler import get_scheduler
+from ..semantic_cache import _get_semantic_cache
+from ..single_flight import _get_single_flight
+from ..transcripts import get_transcript_store
+
+
+# Process-wide components, rebuilt from the settings of every test.
+COMPONENTS = (
+    get_llm_cache,
+    get_document_index,
+    get_history_manager,
+    get_pool,
+    get_model_router,
+    get_scheduler,
+    _get_semantic_cache,
+    _get_single_flight,
+    get_transcript_store,
+)
+
+
+def reset_components():
+    for get_component in COMPONENTS:
+        get_component.reset()
+
+
+def get_unused_url() -> str:
+    """
+    Get the URL of a local port nothing listens on, standing in for a dead host.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return "http://127.0.0.1:%d" % sock.getsockname()[1]
+
+
+class ASGIRequest:
+    """
+    A POST to the ASGI application, sent as an ASGI server would, whose
+    response messages are received with the time they took to arrive.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        data: dict,
+        content_type: str = "application/x-www-form-urlencoded",
+    ):
+        path, _, query_string = path.partition("?")
+        if content_type == "application/json":
+            self.body = json.dumps(data).encode()
+        else:
+            self.body = urlencode(data).encode()
+        self.communicator = ApplicationCommunicator(
+            get_asgi_application(),
+            {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "POST",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": query_string.encode(),
+                "root_path": "",
+                "headers": [
+                    (b"host", b"testserver"),
+                    (b"content-type", content_type.encode()),
+                    (b"content-length", str(len(self.body)).encode()),
+                ],
+                "client": ("127.0.0.1", 50000),
+                "server": ("testserver", 80),
+            },
+        )
+
+    async def send(self):
+        self.sent_at = time.monotonic()
+        await self.communicator.send_input(
+            {"type": "http.request", "body": self.body, "more_body": False}
+        )
+
+    async def receive(self, timeout: float = 5) -> tuple:
+        """
+        Get the next message of the response, and the seconds since the request.
+        """
+        message = await self.communicator.receive_output(timeout)
+        return time.monotonic() - self.sent_at, message
+
+    async def receive_all(self, timeout: float = 5) -> list:
+        messages = []
+        while True:
+            messages.append(await self.receive(timeout))
+            if not messages[-1][1].get("more_body", False) and (
+                messages[-1][1]["type"] == "http.response.body"
+            ):
+                return messages
+
+    async def disconnect(self, timeout: float = 5):
+        await self.communicator.send_input({"type": "http.disconnect"})
+        await self.communicator.wait(timeout)
+
+
+class FakeOllamaTestCase(TestCase):
+    """
+    Runs the tests against `host_count` fake Ollama servers, which make up the
+    Ollama pool of every test.
+    """
+
+    host_count = 1
+    fake_ollama_config = FakeOllamaConfig(
+        tokens_per_second=1000, first_token_delay=0, response_tokens=10
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake_ollamas = [
+            start_server("127.0.0.1", 0, cls.fake_ollama_config)
+            for _ in range(cls.host_count)
+        ]
+        cls.ollama_urls = [
+            "http://127.0.0.1:%d" % server.server_address[1]
+            for server in cls.fake_ollamas
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        for server in cls.fake_ollamas:
+            server.shutdown()
+            server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.override_study_buddy_settings("OLLAMA_POOL", HOSTS=self.ollama_urls)
+        self.addCleanup(reset_components)
+
+    def override_study_buddy_settings(self, group: str, **values):
+        """
+        Override some of the `STUDY_BUDDY_<group>` settings for the rest of the
+        test, and rebuild the components from them.
+        """
+        name = f"STUDY_BUDDY_{group}"
+        overrides = override_settings(**{name: {**getattr(settings, name), **values}})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_components()
+
+    def start_asgi_request(self, path: str, data: dict, **kwargs) -> ASGIRequest:
+        """
+        Get an `ASGIRequest` to the app, which can only be sent from async tests.
+        """
+        # As the test client does, keep the test's database connection open.
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+        return ASGIRequest(path, data, **kwargs)
+
+    def get_request_counts(self) -> list:
+        """
+        Get the number of requests sent to every host of the pool.
+        """
+        return [host["requests"] for host in get_pool().stats()]
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+from benchmarks.fake_ollama import WORDS, FakeOllamaConfig
+
+from ..scheduler import LLMBusyError
+from .base import FakeOllamaTestCase
+
+
+class AsyncViewTests(FakeOllamaTestCase):
+    def test_async_and_sync_views_share_their_responses(self):
+        body = {"text": "Plants make glucose.", "tone": "formal"}
+
+        async_response = self.client.post("/study_buddy_api/async/paraphrase/", body)
+        sync_response = self.client.post("/study_buddy_api/paraphrase/", body)
+
+        self.assertEqual(async_response.status_code, 200)
+        self.assertTrue(async_response.json()["data"].startswith(WORDS[0]))
+        self.assertEqual(async_response.json(), sync_response.json())
+        # The second response came from the cache filled by the first.
+        self.assertEqual(self.get_request_counts(), [1])
+
+    def test_chat_accepts_json_bodies(self):
+        response = self.client.post(
+            "/study_buddy_api/async/chat/",
+            {"history": [{"role": "user", "content": "What is photosynthesis?"}]},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["data"])
+
+    def test_quiz_returns_question_count_questions(self):
+        response = self.client.post(
+            "/study_buddy_api/async/quiz/",
+            {"text": "photosynthesis", "mode": "multiple_choice", "question_count": 3},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["data"]), 3)
+
+    def test_invalid_requests_are_rejected_as_by_the_sync_views(self):
+        body = {"text": "Plants.", "tone": "rude"}
+
+        async_response = self.client.post("/study_buddy_api/async/paraphrase/", body)
+        sync_response = self.client.post("/study_buddy_api/paraphrase/", body)
+
+        self.assertEqual(async_response.status_code, 400)
+        self.assertEqual(async_response.json(), sync_response.json())
+
+    def test_malformed_json_is_rejected(self):
+        response = self.client.post(
+            "/study_buddy_api/async/chat/", "{", content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("JSON parse error", response.json()["detail"])
+
+    def test_busy_scheduler_responses_tell_when_to_retry(self):
+        with mock.patch(
+            "study_buddy_api.async_views.acreate_prompt_and_get_response",
+            side_effect=LLMBusyError(5),
+        ):
+            response = self.client.post(
+                "/study_buddy_api/async/paraphrase/",
+                {"text": "Plants.", "tone": "formal"},
+            )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
+
+
+class AsyncViewConcurrencyTests(FakeOllamaTestCase):
+    # Half a second per generation.
+    fake_ollama_config = FakeOllamaConfig(
+        tokens_per_second=20, first_token_delay=0, response_tokens=10
+    )
+
+    async def test_requests_are_served_concurrently_by_one_event_loop(self):
+        requests = [
+            self.start_asgi_request(
+                "/study_buddy_api/async/paraphrase/",
+                {"text": f"Plants {number}.", "tone": "formal"},
+            )
+            for number in range(3)
+        ]
+        started = time.monotonic()
+
+        async def get_response(request):
+            await request.send()
+            start = (await request.receive())[1]
+            body = b"".join(
+                message.get("body", b"")
+                for elapsed, message in await request.receive_all()
+            )
+            return start["status"], json.loads(body)
+
+        responses = await asyncio.gather(*map(get_response, requests))
+
+        self.assertEqual([status for status, body in responses], [200] * 3)
+        # Well under the second and a half of three generations in a row.
+        self.assertLess(time.monotonic() - started, 1.2)
@@ -0,0 +1,111 @@
+import json
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from ..documents import get_document_text
+from ..utils import get_extracted_text_from_sources
+from .base import FakeOllamaTestCase
+
+
+SUMMARIZE = {"type": "summarize", "summary_type": "brief"}
+
+
+class BatchTests(FakeOllamaTestCase):
+    def post_batch(self, data: dict) -> list:
+        response = self.client.post(
+            "/study_buddy_api/batch/", data, content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def test_extracted_texts_are_not_returned(self):
+        [item] = self.post_batch({"texts": ["Plants."], "operations": [SUMMARIZE]})
+
+        self.assertNotIn("extracted_text", item)
+        self.assertNotIn("document_id", item)
+        self.assertEqual(item["results"][0]["operation"], "summarize")
+
+    def test_extracted_texts_are_stored_when_asked_to(self):
+        [item] = self.post_batch(
+            {
+                "texts": ["Plants."],
+                "operations": [SUMMARIZE],
+                "return_document_id": True,
+            }
+        )
+
+        self.assertNotIn("extracted_text", item)
+        self.assertEqual(get_document_text(item["document_id"]), "Plants.")
+
+    def test_failing_documents_do_not_fail_the_batch(self):
+        items = self.client.post(
+            "/study_buddy_api/batch/",
+            {
+                "files": [SimpleUploadedFile("notes.docx", b"Plants.")],
+                "texts": ["Plants."],
+                "operations": json.dumps([SUMMARIZE]),
+            },
+        ).json()["data"]
+
+        self.assertEqual(
+            items[0],
+            {
+                "source": "file",
+                "file": "notes.docx",
+                "error": ["Unsupported file extension: docx"],
+            },
+        )
+        self.assertEqual(items[1]["source"], "text")
+        self.assertTrue(items[1]["results"][0]["data"])
+
+    def test_failing_operations_do_not_fail_their_document(self):
+        with mock.patch.dict(
+            "study_buddy_api.services.ENDPOINT_SERVICES",
+            {"paraphrase": mock.Mock(side_effect=RuntimeError("Ollama crashed"))},
+        ), self.assertLogs("study_buddy_api.services", "ERROR"):
+            [item] = self.post_batch(
+                {
+                    "texts": ["Plants."],
+                    "operations": [SUMMARIZE, {"type": "paraphrase", "tone": "formal"}],
+                }
+            )
+
+        summary, paraphrase = item["results"]
+        self.assertTrue(summary["data"])
+        self.assertEqual(
+            paraphrase, {"operation": "paraphrase", "error": "Ollama crashed"}
+        )
+
+    def test_documents_are_extracted_once_for_all_their_operations(self):
+        with mock.patch(
+            "study_buddy_api.services.get_extracted_text_from_sources",
+            wraps=get_extracted_text_from_sources,
+        ) as extract:
+            [item] = self.post_batch(
+                {
+                    "texts": ["Plants."],
+                    "operations": [
+                        SUMMARIZE,
+                        {"type": "paraphrase", "tone": "formal"},
+                        {"type": "note", "level": "1"},
+                    ],
+                }
+            )
+
+        self.assertEqual(
+            [result["operation"] for result in item["results"]],
+            ["summarize", "paraphrase", "note"],
+        )
+        extract.assert_called_once()
+
+    def test_invalid_operations_are_rejected_by_index(self):
+        response = self.client.post(
+            "/study_buddy_api/batch/",
+            {"texts": ["Plants."], "operations": [SUMMARIZE, {"type": "translate"}]},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("type", response.json()["operations"]["1"])
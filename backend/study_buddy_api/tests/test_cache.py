@@ -0,0 +1,102 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..cache import LLMResponseCache, LocalLRUCache, get_llm_cache
+from .base import FakeOllamaTestCase
+
+
+class LocalLRUCacheTests(SimpleTestCase):
+    def test_least_recently_used_entries_are_evicted_past_max_bytes(self):
+        cache = LocalLRUCache(max_bytes=15)
+        cache.set("a", "12345")
+        cache.set("b", "12345")
+        cache.get("a")
+
+        cache.set("c", "12345")
+
+        self.assertEqual(cache.get("a"), "12345")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "12345")
+
+    def test_expired_entries_are_misses(self):
+        cache = LocalLRUCache(max_bytes=100, default_timeout=60)
+        cache.set("a", "1")
+
+        with mock.patch("study_buddy_api.cache.time.monotonic", return_value=1e12):
+            self.assertIsNone(cache.get("a"))
+
+    def test_values_larger_than_the_cache_are_not_stored(self):
+        cache = LocalLRUCache(max_bytes=4)
+        cache.set("a", "12345")
+
+        self.assertIsNone(cache.get("a"))
+
+
+class LLMResponseCacheTests(SimpleTestCase):
+    def test_lookups_are_counted_as_hits_and_misses(self):
+        cache = LLMResponseCache(LocalLRUCache(max_bytes=100))
+        cache.get("a")
+        cache.set("a", "1")
+        cache.get("a")
+        cache.get("a")
+
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 1})
+
+    def test_concurrent_lookups_are_all_counted(self):
+        cache = LLMResponseCache(LocalLRUCache(max_bytes=100))
+        cache.set("a", "1")
+
+        def look_up():
+            for _ in range(1000):
+                cache.get("a")
+                cache.get("b")
+
+        threads = [threading.Thread(target=look_up) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(cache.stats(), {"hits": 8000, "misses": 8000})
+
+    def test_backend_errors_are_misses(self):
+        backend = mock.Mock()
+        backend.get.side_effect = ConnectionError
+        backend.set.side_effect = ConnectionError
+        cache = LLMResponseCache(backend)
+
+        with self.assertLogs("study_buddy_api.cache", "WARNING"):
+            cache.set("a", "1")
+            self.assertIsNone(cache.get("a"))
+
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 1})
+
+    def test_disabled_cache_stores_and_counts_nothing(self):
+        cache = LLMResponseCache()
+        cache.set("a", "1")
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 0})
+
+
+class ResponseCachingTests(FakeOllamaTestCase):
+    def test_different_prompts_miss_the_cache(self):
+        for tone in ("formal", "formal", "friendly"):
+            self.client.post(
+                "/study_buddy_api/paraphrase/", {"text": "Plants.", "tone": tone}
+            )
+
+        self.assertEqual(get_llm_cache().stats(), {"hits": 1, "misses": 2})
+        self.assertEqual(self.get_request_counts(), [2])
+
+    def test_disabled_cache_is_bypassed(self):
+        self.override_study_buddy_settings("LLM_CACHE", BACKEND=None)
+
+        for _ in range(2):
+            self.client.post(
+                "/study_buddy_api/paraphrase/", {"text": "Plants.", "tone": "formal"}
+            )
+
+        self.assertEqual(self.get_request_counts(), [2])
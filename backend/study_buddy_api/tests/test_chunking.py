@@ -0,0 +1,135 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from benchmarks.fake_ollama import build_response_tokens
+
+from ..chunking import CHARS_PER_TOKEN, split_text_into_chunks
+from ..pdf_extraction import PAGE_SEPARATOR, extract_pdf_text
+from ..utils import build_map_reduce_prompts, build_prompts
+from .base import FakeOllamaTestCase
+
+
+# What the fake Ollama server answers to every chat request of the tests.
+FAKE_RESPONSE = "".join(build_response_tokens({}, 10))
+
+
+def build_page(number: int, sentence_count: int) -> str:
+    """
+    Build the text of a page, in paragraphs of three sentences.
+    """
+    sentences = [
+        f"Page {number} explains how plants turn light into glucose."
+    ] * sentence_count
+    return "\n\n".join(
+        " ".join(sentences[start : start + 3]) for start in range(0, sentence_count, 3)
+    )
+
+
+class SplitTextIntoChunksTests(SimpleTestCase):
+    def test_text_that_fits_is_a_single_chunk(self):
+        text = build_page(1, 6)
+
+        self.assertEqual(split_text_into_chunks(text, 100), [text])
+
+    def test_chunks_break_on_page_boundaries(self):
+        pages = [build_page(number, 6) for number in range(3)]
+
+        chunks = split_text_into_chunks(PAGE_SEPARATOR.join(pages), 100)
+
+        self.assertEqual(chunks, pages)
+
+    def test_small_pages_are_packed_into_a_chunk(self):
+        pages = [build_page(number, 3) for number in range(4)]
+
+        chunks = split_text_into_chunks(PAGE_SEPARATOR.join(pages), 100)
+
+        self.assertEqual(
+            chunks,
+            [PAGE_SEPARATOR.join(pages[:2]), PAGE_SEPARATOR.join(pages[2:])],
+        )
+
+    def test_large_pages_break_on_paragraphs_then_sentences(self):
+        page = build_page(1, 40)
+        max_chars = 100 * CHARS_PER_TOKEN
+
+        chunks = split_text_into_chunks(page, 100)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), max_chars)
+            self.assertTrue(chunk.startswith("Page 1"))
+            self.assertTrue(chunk.endswith("glucose."))
+
+    def test_text_without_separators_is_cut_at_the_limit(self):
+        text = "x" * 1000
+
+        chunks = split_text_into_chunks(text, 100)
+
+        self.assertEqual(chunks, ["x" * 400, "x" * 400, "x" * 200])
+
+    def test_blank_chunks_are_dropped(self):
+        text = PAGE_SEPARATOR.join([build_page(1, 6), "  \n ", build_page(2, 6)])
+
+        self.assertEqual(len(split_text_into_chunks(text, 100)), 2)
+
+
+class PDFPageSeparatorTests(SimpleTestCase):
+    def test_pages_are_separated_by_form_feeds(self):
+        import fitz
+
+        document = fitz.open()
+        for number in range(3):
+            document.new_page().insert_text((50, 50), f"Page {number}")
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+            pdf_file.write(document.tobytes())
+        self.addCleanup(os.remove, pdf_file.name)
+
+        for max_workers in (1, 2):
+            with self.subTest(max_workers=max_workers):
+                text = extract_pdf_text(pdf_file.name, max_workers, 1)
+                self.assertEqual(
+                    [page.strip() for page in text.split(PAGE_SEPARATOR)],
+                    ["Page 0", "Page 1", "Page 2"],
+                )
+
+
+class MapReduceTests(FakeOllamaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.override_study_buddy_settings("CHUNKING", MAX_CHUNK_TOKENS=100)
+
+    def test_text_that_fits_is_not_reduced(self):
+        text = build_page(1, 6)
+
+        prompts = build_map_reduce_prompts("context", "Summarize:", text, "Map:")
+
+        self.assertEqual(prompts, build_prompts("context", "Summarize:", text))
+        self.assertEqual(self.get_request_counts(), [0])
+
+    def test_chunks_are_reduced_in_order_before_the_final_prompt(self):
+        pages = [build_page(number, 6) for number in range(3)]
+
+        prompts = build_map_reduce_prompts(
+            "context", "Summarize:", PAGE_SEPARATOR.join(pages), "Map:"
+        )
+
+        self.assertEqual(
+            prompts,
+            build_prompts("context", "Summarize:", "\n\n".join([FAKE_RESPONSE] * 3)),
+        )
+        self.assertEqual(self.get_request_counts(), [3])
+
+    def test_summarize_endpoint_maps_large_documents(self):
+        pages = [build_page(number, 6) for number in range(3)]
+
+        response = self.client.post(
+            "/study_buddy_api/summarize/",
+            {"text": PAGE_SEPARATOR.join(pages), "summary_type": "brief"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"], FAKE_RESPONSE)
+        # One generation per chunk, and the final one.
+        self.assertEqual(self.get_request_counts(), [4])
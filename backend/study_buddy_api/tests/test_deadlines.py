@@ -0,0 +1,91 @@
+import time
+
+from benchmarks.fake_ollama import FakeOllamaConfig
+
+from ..ollama_client import get_pool
+from ..scheduler import get_scheduler
+from .base import FakeOllamaTestCase
+from .test_streaming import parse_sse_events
+
+
+class DeadlineTests(FakeOllamaTestCase):
+    # A second of generation, well past the deadlines of the tests.
+    fake_ollama_config = FakeOllamaConfig(
+        tokens_per_second=10, first_token_delay=0, response_tokens=10
+    )
+
+    def assert_generation_stopped(self):
+        self.assertEqual([host["outstanding"] for host in get_pool().stats()], [0])
+        self.assertEqual(get_scheduler().stats()["active"], 0)
+
+    def post(self, path: str, data: dict, timeout: str = "0.2"):
+        return self.client.post(
+            f"/study_buddy_api/{path}", data, headers={"x-request-timeout": timeout}
+        )
+
+    def test_request_exceeding_its_deadline_fails_with_a_504(self):
+        started = time.monotonic()
+        response = self.post("paraphrase/", {"text": "Plants.", "tone": "formal"})
+
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(
+            response.json()["detail"],
+            "The request did not complete within its deadline.",
+        )
+        self.assertLess(time.monotonic() - started, 0.8)
+        self.assert_generation_stopped()
+
+    def test_async_request_exceeding_its_deadline_fails_with_a_504(self):
+        response = self.post("async/paraphrase/", {"text": "Plants.", "tone": "formal"})
+
+        self.assertEqual(response.status_code, 504)
+        self.assert_generation_stopped()
+
+    def test_stream_exceeding_its_deadline_ends_with_an_error_event(self):
+        response = self.post(
+            "paraphrase/?stream=1", {"text": "Plants.", "tone": "formal"}
+        )
+
+        events = parse_sse_events(b"".join(response.streaming_content))
+        event, data = events[-1]
+        self.assertEqual(event, "error")
+        self.assertEqual(
+            data["detail"], "The request did not complete within its deadline."
+        )
+        self.assert_generation_stopped()
+
+    def test_invalid_timeout_is_rejected(self):
+        response = self.post(
+            "paraphrase/", {"text": "Plants.", "tone": "formal"}, timeout="soon"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("X-Request-Timeout", response.json())
+
+
+class DisconnectTests(FakeOllamaTestCase):
+    fake_ollama_config = FakeOllamaConfig(
+        tokens_per_second=10, first_token_delay=0, response_tokens=10
+    )
+
+    async def assert_stream_stops_on_disconnect(self, path: str):
+        request = self.start_asgi_request(
+            f"/study_buddy_api/{path}", {"text": "Plants.", "tone": "formal"}
+        )
+        await request.send()
+        await request.receive()
+        await request.receive()
+
+        await request.disconnect()
+
+        # Stopped well before the second of generation is over.
+        elapsed = time.monotonic() - request.sent_at
+        self.assertLess(elapsed, 0.8)
+        self.assertEqual([host["outstanding"] for host in get_pool().stats()], [0])
+        self.assertEqual(get_scheduler().stats()["active"], 0)
+
+    async def test_async_stream_stops_when_the_client_disconnects(self):
+        await self.assert_stream_stops_on_disconnect("async/paraphrase/?stream=1")
+
+    async def test_sync_stream_stops_when_the_client_disconnects(self):
+        await self.assert_stream_stops_on_disconnect("paraphrase/?stream=1")
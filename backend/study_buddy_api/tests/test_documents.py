@@ -0,0 +1,187 @@
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.exceptions import NotFound
+
+from ..documents import (
+    DocumentIndex,
+    get_document_index,
+    ingest_document,
+    retrieve_chunks,
+    store_document,
+)
+from ..models import Document
+from ..utils import generate_llm_response, get_extracted_text_from_sources
+from .base import FakeOllamaTestCase
+
+
+PARAGRAPHS = [
+    "Chlorophyll absorbs light.",
+    "Roots take up water.",
+    "Stomata let carbon dioxide in.",
+    "Glucose stores the energy.",
+]
+DOCUMENT = "\n\n".join(PARAGRAPHS)
+
+
+class DocumentRetrievalTests(FakeOllamaTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # One paragraph per chunk.
+        self.override_study_buddy_settings(
+            "DOCUMENT_INDEX", DIRECTORY=directory.name, CHUNK_TOKENS=10, TOP_K=2
+        )
+
+    def test_documents_are_embedded_once(self):
+        first = ingest_document(DOCUMENT)
+        second = ingest_document(DOCUMENT)
+
+        self.assertEqual(first, second)
+        self.assertEqual(first["chunk_count"], 4)
+        # A single batch of embeddings.
+        self.assertEqual(self.get_request_counts(), [1])
+
+    def test_most_relevant_chunks_are_retrieved_in_document_order(self):
+        document_id = store_document(DOCUMENT).id
+
+        # The fake embeddings only match identical texts.
+        chunks = retrieve_chunks(document_id, PARAGRAPHS[3])
+
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(chunks[-1], PARAGRAPHS[3])
+
+    def test_unknown_documents_are_not_found(self):
+        with self.assertRaises(NotFound):
+            retrieve_chunks("0" * 64, "Light?")
+
+    def test_index_is_shared_through_its_directory(self):
+        document_id = ingest_document(DOCUMENT)["document_id"]
+        index = get_document_index()
+
+        other_index = DocumentIndex(index.directory, index.model)
+
+        self.assertIn(document_id, other_index)
+        self.assertEqual(other_index.chunk_count(document_id), 4)
+        with self.assertRaises(ValueError):
+            DocumentIndex(index.directory, "other-model").chunk_count(document_id)
+
+    def test_chat_about_a_document_is_given_its_relevant_excerpts(self):
+        document_id = store_document(DOCUMENT).id
+
+        with mock.patch(
+            "study_buddy_api.services.generate_llm_response",
+            wraps=generate_llm_response,
+        ) as generate:
+            response = self.client.post(
+                "/study_buddy_api/chat/",
+                {
+                    "document_id": document_id,
+                    "history": [{"role": "user", "content": PARAGRAPHS[1]}],
+                },
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        system_message = generate.call_args.args[0][0]["content"]
+        self.assertIn(PARAGRAPHS[1], system_message)
+
+    def test_chat_about_an_unknown_document_is_not_found(self):
+        response = self.client.post(
+            "/study_buddy_api/chat/",
+            {"document_id": "0" * 64, "history": [{"role": "user", "content": "Hi"}]},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+
+class DocumentStorageTests(FakeOllamaTestCase):
+    def post_document(self, data: dict) -> dict:
+        response = self.client.post("/study_buddy_api/documents/", data)
+
+        self.assertEqual(response.status_code, 201)
+        return response.json()["data"]
+
+    def patch_extraction(self):
+        return mock.patch(
+            "study_buddy_api.services.get_extracted_text_from_sources",
+            wraps=get_extracted_text_from_sources,
+        )
+
+    def test_same_upload_is_extracted_once(self):
+        with self.patch_extraction() as extract:
+            documents = [
+                self.post_document(
+                    {"file": SimpleUploadedFile("notes.txt", DOCUMENT.encode())}
+                )
+                for _ in range(2)
+            ]
+
+        self.assertEqual(documents[0], documents[1])
+        self.assertEqual(documents[0]["char_count"], len(DOCUMENT))
+        self.assertEqual(extract.call_count, 1)
+        self.assertEqual(Document.objects.count(), 1)
+
+    def test_every_url_form_of_a_video_matches(self):
+        urls = [
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+            "https://youtu.be/dQw4w9WgXcQ",
+        ]
+
+        with self.patch_extraction() as extract, mock.patch(
+            "study_buddy_api.transcripts.fetch_transcript",
+            return_value=[{"text": DOCUMENT}],
+        ):
+            documents = [self.post_document({"youtube_url": url}) for url in urls]
+
+        self.assertEqual(documents[0], documents[1])
+        self.assertEqual(extract.call_count, 1)
+
+    def test_documents_can_be_used_instead_of_their_upload(self):
+        document_id = self.post_document({"text": DOCUMENT})["document_id"]
+
+        with mock.patch(
+            "study_buddy_api.utils.generate_llm_response",
+            wraps=generate_llm_response,
+        ) as generate:
+            response = self.client.post(
+                "/study_buddy_api/paraphrase/",
+                {"document_id": document_id, "tone": "formal"},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["document_id"], document_id)
+        self.assertNotIn("extracted_text", response.json())
+        self.assertIn(PARAGRAPHS[0], generate.call_args.args[0][1]["content"])
+
+    def test_extracted_text_can_be_stored_instead_of_returned(self):
+        response = self.client.post(
+            "/study_buddy_api/paraphrase/",
+            {"text": DOCUMENT, "tone": "formal", "return_document_id": True},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        document = Document.objects.get(pk=response.json()["document_id"])
+        self.assertEqual(document.text, DOCUMENT)
+        self.assertNotIn("extracted_text", response.json())
+
+    def test_unknown_documents_are_not_found(self):
+        response = self.client.post(
+            "/study_buddy_api/paraphrase/",
+            {"document_id": "0" * 64, "tone": "formal"},
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_documents_are_not_combined_with_other_sources(self):
+        document_id = self.post_document({"text": DOCUMENT})["document_id"]
+
+        response = self.client.post(
+            "/study_buddy_api/paraphrase/",
+            {"document_id": document_id, "text": "Plants.", "tone": "formal"},
+        )
+
+        self.assertEqual(response.status_code, 400)
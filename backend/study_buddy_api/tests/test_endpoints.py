@@ -0,0 +1,36 @@
+from benchmarks.fake_ollama import WORDS
+
+from .base import FakeOllamaTestCase
+
+
+API_PREFIX = "/study_buddy_api"
+
+
+class EndpointTests(FakeOllamaTestCase):
+    def test_models_lists_the_models_loaded_on_the_hosts(self):
+        response = self.client.get(f"{API_PREFIX}/models/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [model["model"] for model in response.json()["data"]["loaded"]],
+            ["llama3.1:latest"],
+        )
+
+    def test_paraphrase_returns_the_generated_text(self):
+        response = self.client.post(
+            f"{API_PREFIX}/paraphrase/",
+            {"text": "Plants make glucose.", "tone": "formal"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["data"].startswith(WORDS[0]))
+        self.assertEqual(response.json()["model"], "llama3.1")
+
+    def test_identical_requests_are_served_from_the_response_cache(self):
+        body = {"text": "Plants make glucose.", "tone": "formal"}
+
+        first = self.client.post(f"{API_PREFIX}/paraphrase/", body)
+        second = self.client.post(f"{API_PREFIX}/paraphrase/", body)
+
+        self.assertEqual(first.json()["data"], second.json()["data"])
+        self.assertEqual(self.get_request_counts(), [1])
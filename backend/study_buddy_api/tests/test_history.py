@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..cache import LocalLRUCache
+from ..history import ChatHistoryManager, count_message_tokens
+from ..prompts import CHAT_SUMMARY_MESSAGE
+
+
+SYSTEM_MESSAGE = {"role": "system", "content": "S"}
+
+
+def build_history(count: int) -> list:
+    # 14 tokens per message.
+    return [
+        {
+            "role": ("user", "assistant")[index % 2],
+            "content": f"Message {index:02}".ljust(36),
+        }
+        for index in range(count)
+    ]
+
+
+def summarize(prompts: list, *args, **kwargs) -> str:
+    return "summary of %d messages" % prompts[1]["content"].count("Message ")
+
+
+class ChatHistoryManagerTests(SimpleTestCase):
+    def setUp(self):
+        self.manager = ChatHistoryManager(
+            LocalLRUCache(max_bytes=1024 * 1024),
+            max_tokens=80,
+            summary_tokens=20,
+            fold_step=2,
+        )
+        self.addCleanup(self.manager._executor.shutdown)
+        patcher = mock.patch(
+            "study_buddy_api.history.generate_llm_response", side_effect=summarize
+        )
+        self.generate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait_for_summaries(self):
+        # Summaries are generated one at a time, after those already scheduled.
+        self.manager._executor.submit(lambda: None).result()
+
+    def get_summary(self, messages: list) -> str:
+        self.assertEqual(messages[1]["role"], "system")
+        prefix = CHAT_SUMMARY_MESSAGE.format(summary="")
+        self.assertTrue(messages[1]["content"].startswith(prefix))
+        return messages[1]["content"][len(prefix) :]
+
+    def test_history_within_the_budget_is_sent_whole(self):
+        history = build_history(5)
+
+        messages = self.manager.build_messages(SYSTEM_MESSAGE, history)
+
+        self.assertEqual(messages, [SYSTEM_MESSAGE] + history)
+        self.generate.assert_not_called()
+
+    def test_older_messages_are_left_out_until_their_summary_is_ready(self):
+        history = build_history(8)
+
+        messages = self.manager.build_messages(SYSTEM_MESSAGE, history)
+        self.assertEqual(messages, [SYSTEM_MESSAGE] + history[6:])
+
+        self.wait_for_summaries()
+        messages = self.manager.build_messages(SYSTEM_MESSAGE, history)
+
+        self.assertEqual(self.get_summary(messages), "summary of 6 messages")
+        self.assertEqual(messages[2:], history[6:])
+        # The recent messages leave SUMMARY_TOKENS of the budget to the summary.
+        self.assertLessEqual(
+            sum(map(count_message_tokens, [SYSTEM_MESSAGE] + messages[2:])), 80 - 20
+        )
+        [call] = self.generate.call_args_list
+        conversation = call.args[0][1]["content"]
+        self.assertIn("Message 00", conversation)
+        self.assertIn("Message 05", conversation)
+        self.assertNotIn("Message 06", conversation)
+
+    def test_summaries_roll_forward_as_the_conversation_grows(self):
+        history = build_history(10)
+        self.manager.build_messages(SYSTEM_MESSAGE, history[:8])
+        self.wait_for_summaries()
+        first_summary = self.get_summary(
+            self.manager.build_messages(SYSTEM_MESSAGE, history[:8])
+        )
+
+        messages = self.manager.build_messages(SYSTEM_MESSAGE, history)
+        # The previous summary is used until the next one is ready.
+        self.assertEqual(self.get_summary(messages), first_summary)
+        self.assertEqual(messages[2:], history[8:])
+
+        self.wait_for_summaries()
+        messages = self.manager.build_messages(SYSTEM_MESSAGE, history)
+
+        self.assertEqual(self.get_summary(messages), "summary of 2 messages")
+        # Only the newly left out messages are summarized, with the summary.
+        conversation = self.generate.call_args.args[0][1]["content"]
+        self.assertIn(first_summary, conversation)
+        self.assertNotIn("Message 05", conversation)
+        self.assertIn("Message 06", conversation)
+
+    def test_last_message_is_kept_whatever_its_size(self):
+        history = build_history(3) + [{"role": "user", "content": "x" * 1000}]
+
+        messages = self.manager.build_messages(SYSTEM_MESSAGE, history)
+
+        self.assertEqual(messages[-1], history[-1])
+
+    def test_failed_summaries_are_retried_by_the_next_request(self):
+        history = build_history(8)
+        self.generate.side_effect = [RuntimeError("Ollama crashed"), "summary"]
+
+        with self.assertLogs("study_buddy_api.history", "ERROR"):
+            self.manager.build_messages(SYSTEM_MESSAGE, history)
+            self.wait_for_summaries()
+        self.manager.build_messages(SYSTEM_MESSAGE, history)
+        self.wait_for_summaries()
+
+        messages = self.manager.build_messages(SYSTEM_MESSAGE, history)
+        self.assertEqual(self.get_summary(messages), "summary")
+        self.assertEqual(self.generate.call_count, 2)
@@ -0,0 +1,104 @@
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+
+from ..jobs import JOB_UPLOADS_DIR
+from ..scheduler import LLMBusyError
+from ..utils import get_extracted_text_from_sources
+from .base import FakeOllamaTestCase
+
+
+def list_job_uploads() -> set:
+    if not default_storage.exists(JOB_UPLOADS_DIR):
+        return set()
+    return set(default_storage.listdir(JOB_UPLOADS_DIR)[1])
+
+
+class JobTests(FakeOllamaTestCase):
+    """
+    Celery runs the jobs eagerly in the tests, within the request enqueuing them.
+    """
+
+    def enqueue(self, endpoint: str, data: dict) -> dict:
+        response = self.client.post(f"/study_buddy_api/{endpoint}/?async=1", data)
+
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job["status"], "pending")
+        self.assertTrue(job["status_url"].endswith(f"/jobs/{job['job_id']}/"))
+        return job
+
+    def get_job(self, job_id: str) -> dict:
+        response = self.client.get(f"/study_buddy_api/jobs/{job_id}/")
+
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_job_result_is_returned_once_done(self):
+        job = self.enqueue("paraphrase", {"text": "Plants.", "tone": "formal"})
+
+        status = self.get_job(job["job_id"])
+
+        self.assertEqual(status["status"], "succeeded")
+        self.assertTrue(status["result"]["data"])
+        self.assertEqual(self.get_request_counts(), [1])
+
+    def test_job_is_described_in_json_to_clients_asking_for_a_stream(self):
+        response = self.client.post(
+            "/study_buddy_api/paraphrase/?async=1",
+            {"text": "Plants.", "tone": "formal"},
+            headers={"accept": "text/event-stream"},
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.json()["status"], "pending")
+
+    def test_unknown_job_is_not_found(self):
+        response = self.client.get("/study_buddy_api/jobs/unknown/")
+
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(STUDY_BUDDY_JOB_MAX_RETRIES=2)
+    def test_busy_jobs_are_retried_then_failed(self):
+        paraphrase = mock.Mock(side_effect=LLMBusyError(0))
+
+        with mock.patch.dict(
+            "study_buddy_api.tasks.ENDPOINT_SERVICES", {"paraphrase": paraphrase}
+        ):
+            job = self.enqueue("paraphrase", {"text": "Plants.", "tone": "formal"})
+
+        status = self.get_job(job["job_id"])
+        self.assertEqual(status["status"], "failed")
+        self.assertEqual(status["error"], LLMBusyError.default_detail)
+        self.assertEqual(paraphrase.call_count, 3)
+
+    def test_uploaded_files_are_removed_after_the_job(self):
+        uploads = list_job_uploads()
+        upload = SimpleUploadedFile("notes.txt", b"Plants turn light into glucose.")
+
+        job = self.enqueue("summarize", {"file": upload, "summary_type": "brief"})
+
+        self.assertEqual(self.get_job(job["job_id"])["status"], "succeeded")
+        self.assertEqual(list_job_uploads(), uploads)
+
+    def test_document_jobs_do_not_extract_sources_stored_before(self):
+        def upload():
+            return SimpleUploadedFile("notes.txt", b"Plants turn light into glucose.")
+
+        extract = mock.Mock(wraps=get_extracted_text_from_sources)
+        with mock.patch(
+            "study_buddy_api.tasks.get_extracted_text_from_sources", extract
+        ), mock.patch(
+            "study_buddy_api.services.get_extracted_text_from_sources", extract
+        ):
+            job = self.enqueue("documents", {"file": upload()})
+            job_result = self.get_job(job["job_id"])["result"]
+            response = self.client.post(
+                "/study_buddy_api/documents/", {"file": upload()}
+            )
+
+        self.assertEqual(response.json()["data"], job_result["data"])
+        self.assertEqual(extract.call_count, 1)
@@ -0,0 +1,96 @@
+import asyncio
+from unittest import mock
+
+from benchmarks.fake_ollama import FakeOllamaConfig
+
+from ..ollama_client import get_pool, start_warm_up, warm_up_models
+from .base import FakeOllamaTestCase, get_unused_url
+
+
+class OllamaClientTests(FakeOllamaTestCase):
+    host_count = 2
+    fake_ollama_config = FakeOllamaConfig(
+        tokens_per_second=1000,
+        first_token_delay=0,
+        response_tokens=10,
+        loaded_models=(),
+    )
+
+    def setUp(self):
+        super().setUp()
+        for server in self.fake_ollamas:
+            self.addCleanup(server.loaded_models.clear)
+
+    def test_models_are_warmed_up_on_every_host(self):
+        errors = warm_up_models(["llama3.1", "mistral"])
+
+        self.assertEqual(errors, {})
+        for server in self.fake_ollamas:
+            self.assertEqual(
+                server.loaded_models, {"llama3.1:latest", "mistral:latest"}
+            )
+        response = self.client.get("/study_buddy_api/models/")
+        self.assertEqual(len(response.json()["data"]["loaded"]), 4)
+
+    def test_warm_up_failures_are_reported_by_host(self):
+        dead_url = get_unused_url()
+        self.override_study_buddy_settings(
+            "OLLAMA_POOL", HOSTS=[dead_url, self.ollama_urls[0]]
+        )
+
+        with self.assertLogs("study_buddy_api.ollama_client", "WARNING"):
+            errors = warm_up_models(["llama3.1"])
+
+        self.assertEqual(list(errors), [f"{dead_url} llama3.1"])
+        self.assertEqual(self.fake_ollamas[0].loaded_models, {"llama3.1:latest"})
+
+    def test_warm_up_on_startup_can_be_disabled(self):
+        self.override_study_buddy_settings("OLLAMA_CLIENT", WARM_UP_ON_STARTUP=False)
+
+        with mock.patch("study_buddy_api.ollama_client.threading.Thread") as thread:
+            start_warm_up()
+
+        thread.assert_not_called()
+
+    def test_requests_keep_their_model_loaded(self):
+        self.override_study_buddy_settings("OLLAMA_CLIENT", KEEP_ALIVE="-1m")
+        chats = []
+        for host in get_pool().hosts:
+            patcher = mock.patch.object(host.client, "chat", wraps=host.client.chat)
+            chats.append(patcher.start())
+            self.addCleanup(patcher.stop)
+
+        for number in range(2):
+            self.client.post(
+                "/study_buddy_api/paraphrase/",
+                {"text": f"Plants {number}.", "tone": "formal"},
+            )
+
+        calls = [call for chat in chats for call in chat.call_args_list]
+        self.assertEqual(len(calls), 2)
+        for call in calls:
+            self.assertEqual(call.kwargs["keep_alive"], "-1m")
+
+    def test_connections_are_reused_across_requests(self):
+        self.override_study_buddy_settings("OLLAMA_POOL", HOSTS=self.ollama_urls[:1])
+
+        for number in range(3):
+            self.client.post(
+                "/study_buddy_api/paraphrase/",
+                {"text": f"Plants {number}.", "tone": "formal"},
+            )
+
+        transport = get_pool().hosts[0].client._client._transport
+        self.assertEqual(len(transport._pool.connections), 1)
+
+    def test_async_clients_are_shared_within_an_event_loop_only(self):
+        host = get_pool().hosts[0]
+
+        async def get_clients():
+            return host.get_async_client(), host.get_async_client()
+
+        first, second = asyncio.run(get_clients())
+        other, _ = asyncio.run(get_clients())
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
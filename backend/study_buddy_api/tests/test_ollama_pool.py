@@ -0,0 +1,154 @@
+import asyncio
+
+from ..ollama_client import OllamaPool, get_pool, is_host_failure
+from .base import FakeOllamaTestCase, get_unused_url
+
+
+MESSAGES = [{"role": "user", "content": "What is photosynthesis?"}]
+
+
+def chat(client):
+    return client.chat(model="llama3.1", messages=MESSAGES)
+
+
+def stream_chat(client):
+    return client.chat(model="llama3.1", messages=MESSAGES, stream=True)
+
+
+class OllamaPoolFailoverTests(FakeOllamaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dead_url = get_unused_url()
+        self.pool = OllamaPool(
+            [self.dead_url, *self.ollama_urls],
+            max_attempts=2,
+            eject_duration=60,
+            health_check_interval=0,
+        )
+        # The host went down with the model loaded, so it is tried first.
+        self.pool.hosts[0].loaded_models.add("llama3.1:latest")
+
+    def get_host_stats(self, url: str) -> dict:
+        return next(host for host in self.pool.stats() if host["host"] == url)
+
+    def assert_dead_host_ejected(self, logs):
+        dead_host = self.get_host_stats(self.dead_url)
+        # Tried once, then left out until the end of its ejection.
+        self.assertEqual(dead_host["requests"], 1)
+        self.assertEqual(dead_host["failures"], 1)
+        self.assertFalse(dead_host["available"])
+        self.assertEqual(self.get_host_stats(self.ollama_urls[0])["failures"], 0)
+        self.assertIn(f"Ejected Ollama host {self.dead_url}", "\n".join(logs.output))
+
+    def test_calls_fail_over_to_the_live_host(self):
+        with self.assertLogs("study_buddy_api.ollama_client", "WARNING") as logs:
+            for _ in range(4):
+                response = self.pool.call("llama3.1", chat)
+                self.assertTrue(response["message"]["content"])
+
+        self.assert_dead_host_ejected(logs)
+
+    def test_streams_fail_over_to_the_live_host(self):
+        with self.assertLogs("study_buddy_api.ollama_client", "WARNING") as logs:
+            for _ in range(4):
+                chunks = list(self.pool.stream("llama3.1", stream_chat))
+                self.assertTrue(chunks[-1]["done"])
+
+        self.assert_dead_host_ejected(logs)
+        self.assertEqual([host["outstanding"] for host in self.pool.stats()], [0, 0])
+
+    def test_async_calls_fail_over_to_the_live_host(self):
+        async def call_pool():
+            for _ in range(4):
+                response = await self.pool.acall("llama3.1", chat)
+                self.assertTrue(response["message"]["content"])
+
+        with self.assertLogs("study_buddy_api.ollama_client", "WARNING") as logs:
+            asyncio.run(call_pool())
+
+        self.assert_dead_host_ejected(logs)
+
+    def test_affinity_moves_off_a_dead_host(self):
+        with self.assertLogs("study_buddy_api.ollama_client", "WARNING") as logs:
+            for session in range(8):
+                self.pool.call("llama3.1", chat, affinity=f"session:{session}")
+
+        self.assertFalse(self.get_host_stats(self.dead_url)["available"])
+        self.assertEqual(self.get_host_stats(self.ollama_urls[0])["requests"], 8)
+        self.assertIn(f"Ejected Ollama host {self.dead_url}", "\n".join(logs.output))
+
+    def test_request_errors_are_not_retried(self):
+        attempts = []
+
+        def invalid_request(client):
+            attempts.append(client)
+            raise ValueError("invalid request")
+
+        with self.assertRaises(ValueError):
+            self.pool.call("llama3.1", invalid_request)
+
+        self.assertEqual(len(attempts), 1)
+        self.assertTrue(all(host["available"] for host in self.pool.stats()))
+
+    def test_streams_failing_on_their_first_chunk_are_closed(self):
+        responses = []
+
+        class InvalidResponse:
+            closed = False
+
+            def __iter__(self):
+                return self
+
+            def __next__(self):
+                raise ValueError("invalid request")
+
+            def close(self):
+                self.closed = True
+
+        def invalid_stream(client):
+            responses.append(InvalidResponse())
+            return responses[-1]
+
+        with self.assertRaises(ValueError):
+            list(self.pool.stream("llama3.1", invalid_stream))
+
+        [response] = responses
+        self.assertTrue(response.closed)
+        self.assertEqual([host["outstanding"] for host in self.pool.stats()], [0, 0])
+
+    def test_failure_of_every_host_is_raised(self):
+        pool = OllamaPool([self.dead_url, get_unused_url()], health_check_interval=0)
+
+        with self.assertLogs("study_buddy_api.ollama_client", "WARNING"):
+            with self.assertRaises(Exception) as context:
+                pool.call("llama3.1", chat)
+
+        self.assertTrue(is_host_failure(context.exception))
+        self.assertEqual([host["failures"] for host in pool.stats()], [1, 1])
+
+    def test_health_checks_mark_dead_hosts_down(self):
+        with self.assertLogs("study_buddy_api.ollama_client", "WARNING") as logs:
+            self.pool.check_health()
+
+        self.assertFalse(self.get_host_stats(self.dead_url)["available"])
+        live_host = self.get_host_stats(self.ollama_urls[0])
+        self.assertTrue(live_host["available"])
+        self.assertEqual(live_host["loaded_models"], ["llama3.1:latest"])
+        self.assertIn(f"Ollama host {self.dead_url} is down", logs.output[0])
+
+    def test_endpoints_are_served_while_a_host_is_down(self):
+        self.override_study_buddy_settings(
+            "OLLAMA_POOL", HOSTS=[self.dead_url, *self.ollama_urls]
+        )
+        get_pool().hosts[0].loaded_models.add("llama3.1:latest")
+
+        with self.assertLogs("study_buddy_api.ollama_client", "WARNING") as logs:
+            for number in range(4):
+                response = self.client.post(
+                    "/study_buddy_api/paraphrase/",
+                    {"text": f"Plants {number}.", "tone": "formal"},
+                )
+                self.assertEqual(response.status_code, 200)
+
+        self.assertIn(f"Ejected Ollama host {self.dead_url}", logs.output[0])
+        self.assertEqual(self.get_request_counts(), [1, 4])
@@ -0,0 +1,113 @@
+import tempfile
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from unittest import mock
+
+import fitz
+from django.test import SimpleTestCase
+
+from benchmarks.pdf_extraction import build_pdf
+
+from ..pdf_extraction import (
+    PAGE_SEPARATOR,
+    PDFContainsImagesError,
+    _extract_page_range_from_file,
+    _reset_executor,
+    extract_pdf_text,
+)
+
+
+def add_image(path: str, page_num: int) -> str:
+    """
+    Add an image to a page of the PDF at `path`, returning the new PDF's path.
+    """
+    with fitz.open(path) as document:
+        pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), False)
+        document[page_num].insert_image(fitz.Rect(0, 0, 8, 8), pixmap=pixmap)
+        image_path = path.replace(".pdf", "-image.pdf")
+        document.save(image_path)
+    return image_path
+
+
+class PDFExtractionTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.directory.cleanup)
+        # Shut down the worker processes started by the tests.
+        cls.addClassCleanup(_reset_executor)
+        cls.path = build_pdf(cls.directory.name, 8)
+
+    def extract(self, path: str, **kwargs) -> str:
+        return extract_pdf_text(
+            path, **{"max_workers": 4, "min_pages_per_worker": 2, **kwargs}
+        )
+
+    def test_parallel_extraction_keeps_the_page_order(self):
+        text = self.extract(self.path)
+
+        pages = text.split(PAGE_SEPARATOR)
+        self.assertEqual(len(pages), 8)
+        self.assertEqual(
+            [page.split("\n", 1)[0] for page in pages],
+            [f"Page {page_num}" for page_num in range(8)],
+        )
+        self.assertEqual(text, self.extract(self.path, max_workers=1))
+
+    def test_images_are_rejected_by_parallel_and_serial_extraction(self):
+        image_path = add_image(self.path, 5)
+
+        for max_workers in (4, 1):
+            with self.subTest(max_workers=max_workers):
+                with self.assertRaises(PDFContainsImagesError):
+                    self.extract(image_path, max_workers=max_workers)
+
+    def test_broken_pool_falls_back_to_serial_extraction(self):
+        executor = mock.Mock()
+        executor.submit.side_effect = BrokenProcessPool
+
+        with mock.patch(
+            "study_buddy_api.pdf_extraction._get_executor", return_value=executor
+        ), self.assertLogs("study_buddy_api.pdf_extraction", "WARNING"):
+            text = self.extract(self.path)
+
+        self.assertEqual(len(text.split(PAGE_SEPARATOR)), 8)
+
+
+class AbortFlagTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.directory.cleanup)
+        cls.path = build_pdf(cls.directory.name, 4)
+
+    def setUp(self):
+        self.abort_flag = SharedMemory(create=True, size=1)
+        self.abort_flag.buf[0] = 0
+        self.addCleanup(self.abort_flag.unlink)
+        self.addCleanup(self.abort_flag.close)
+
+    def test_workers_stop_once_another_one_found_images(self):
+        self.abort_flag.buf[0] = 1
+
+        with mock.patch("fitz.Document.load_page") as load_page:
+            texts = _extract_page_range_from_file(self.path, self.abort_flag.name, 0, 4)
+
+        self.assertIsNone(texts)
+        load_page.assert_not_called()
+
+    def test_worker_finding_images_raises_the_flag(self):
+        image_path = add_image(self.path, 2)
+
+        texts = _extract_page_range_from_file(image_path, self.abort_flag.name, 0, 4)
+
+        self.assertIsNone(texts)
+        self.assertEqual(self.abort_flag.buf[0], 1)
+
+    def test_worker_without_images_leaves_the_flag_down(self):
+        texts = _extract_page_range_from_file(self.path, self.abort_flag.name, 1, 3)
+
+        self.assertEqual(len(texts), 2)
+        self.assertEqual(self.abort_flag.buf[0], 0)
@@ -0,0 +1,232 @@
+import json
+
+from django.test import SimpleTestCase
+
+from benchmarks.fake_ollama import build_quiz_json
+
+from ..cache import get_llm_cache, make_cache_key
+from ..prompts import QuizFormatEnum, QuizModeEnum
+from ..quiz_parser import (
+    FlashcardTextParser,
+    JSONQuizParser,
+    MultiChoiceTextParser,
+    parse_quiz_response,
+    validate_flashcard_item,
+    validate_multi_choice_item,
+)
+from ..utils import (
+    QUIZ_GENERATION,
+    build_quiz_prompts,
+    generate_flash_quiz_questions,
+    generate_multi_choice_quiz_questions,
+    stream_quiz_questions,
+)
+from .base import FakeOllamaTestCase
+
+
+def multi_choice_item(number: int) -> dict:
+    return {
+        "question": f"Question {number}?",
+        "options": ["Light", "Water", "Oxygen", "Glucose"],
+        "answer": 2,
+    }
+
+
+def feed_by_character(parser, response: str) -> list:
+    """
+    Feed the response one character at a time, returning the position at which
+    every question was completed, and the questions.
+    """
+    completed = []
+    for position, character in enumerate(response):
+        completed.extend((position, question) for question in parser.feed(character))
+    completed.extend((len(response), question) for question in parser.close())
+    return completed
+
+
+class JSONQuizParserTests(SimpleTestCase):
+    def test_questions_are_completed_by_the_closing_brace_of_their_item(self):
+        items = [multi_choice_item(1), multi_choice_item(2)]
+        response = json.dumps({"questions": items})
+
+        completed = feed_by_character(
+            JSONQuizParser(validate_multi_choice_item), response
+        )
+
+        first_item_end = response.index("}")
+        second_item_end = response.index("}", first_item_end + 1)
+        self.assertEqual(
+            [position for position, question in completed],
+            [first_item_end, second_item_end],
+        )
+        self.assertEqual(
+            [question["question"] for position, question in completed],
+            ["Question 1?", "Question 2?"],
+        )
+        self.assertEqual(
+            completed[0][1]["options"],
+            {"1": "Light", "2": "Water", "3": "Oxygen", "4": "Glucose"},
+        )
+        self.assertEqual(completed[0][1]["correct_answer"], "2")
+
+    def test_braces_and_brackets_within_strings_do_not_end_an_item(self):
+        item = {"question": "What does {x} [y] mean?", "answer": "Nothing }"}
+        response = json.dumps({"questions": [item]})
+
+        completed = feed_by_character(JSONQuizParser(validate_flashcard_item), response)
+
+        self.assertEqual(
+            [question for position, question in completed],
+            [{"Question": "What does {x} [y] mean?", "Answer": "Nothing }"}],
+        )
+
+    def test_invalid_items_are_dropped(self):
+        items = [
+            multi_choice_item(1),
+            {**multi_choice_item(2), "options": ["Light", "Water", "Oxygen"]},
+            {**multi_choice_item(3), "answer": 5},
+            {**multi_choice_item(4), "options": ["Light", "Light", "Water", "Air"]},
+            "Question 5?",
+            multi_choice_item(6),
+        ]
+        response = json.dumps({"questions": items})
+
+        questions = parse_quiz_response(
+            JSONQuizParser(validate_multi_choice_item), response
+        )
+
+        self.assertEqual(
+            [question["question"] for question in questions],
+            ["Question 1?", "Question 6?"],
+        )
+
+    def test_truncated_response_keeps_the_completed_questions(self):
+        response = json.dumps({"questions": [multi_choice_item(1)] * 2})
+        truncated = response[: response.rindex("Oxygen")]
+
+        questions = parse_quiz_response(
+            JSONQuizParser(validate_multi_choice_item), truncated
+        )
+
+        self.assertEqual(len(questions), 1)
+
+    def test_malformed_json_yields_no_questions(self):
+        for response in ["", "Sorry, I can't do that.", '{"questions": [{"que', "[}"]:
+            with self.subTest(response=response):
+                self.assertEqual(
+                    parse_quiz_response(
+                        JSONQuizParser(validate_flashcard_item), response
+                    ),
+                    [],
+                )
+
+    def test_single_question_object_is_parsed_at_the_end(self):
+        response = json.dumps({"question": "Why?", "answer": "Because."})
+
+        completed = feed_by_character(JSONQuizParser(validate_flashcard_item), response)
+
+        self.assertEqual(
+            completed,
+            [(len(response), {"Question": "Why?", "Answer": "Because."})],
+        )
+
+
+class MultiChoiceTextParserTests(SimpleTestCase):
+    def test_question_is_completed_by_its_answer(self):
+        response = (
+            "Question: What do plants need?\n1. Light\n2. Sand\n3. Iron\n4. Salt\n"
+            "Answer: 1\n\nQuestion: What do plants make?\n1. Glucose\n2. Sand\n"
+        )
+
+        completed = feed_by_character(MultiChoiceTextParser(), response)
+
+        self.assertEqual(
+            [position for position, question in completed],
+            [response.index("Answer: 1") + len("Answer: 1") - 1, len(response)],
+        )
+        self.assertEqual(
+            completed[0][1],
+            {
+                "question": "What do plants need?",
+                "options": {"1": "Light", "2": "Sand", "3": "Iron", "4": "Salt"},
+                "correct_answer": "1",
+            },
+        )
+        # Only known to be complete at the end of the response, without answer.
+        self.assertIsNone(completed[1][1]["correct_answer"])
+
+    def test_blocks_without_question_text_are_dropped(self):
+        response = "Question: \nQuestion: Why?\n1. A\n2. B\n3. C\n4. D\nAnswer: 2"
+
+        questions = parse_quiz_response(MultiChoiceTextParser(), response)
+
+        self.assertEqual([question["question"] for question in questions], ["Why?"])
+
+
+class FlashcardTextParserTests(SimpleTestCase):
+    def test_flashcard_is_completed_by_a_blank_line(self):
+        response = "Question: Why?\nAnswer: Because.\n\nQuestion: How?\nAnswer: So."
+
+        completed = feed_by_character(FlashcardTextParser(), response)
+
+        self.assertEqual(
+            completed,
+            [
+                (
+                    response.index("\n\n") + 1,
+                    {"Question": "Why?", "Answer": "Because."},
+                ),
+                (len(response), {"Question": "How?", "Answer": "So."}),
+            ],
+        )
+
+
+class QuizStreamingTests(FakeOllamaTestCase):
+    def get_cached_response(self, topic: str, question_count: int):
+        context, prompt, parser_class, key, format = QUIZ_GENERATION[
+            (QuizModeEnum.MULTIPLE_CHOICE.value, QuizFormatEnum.JSON.value)
+        ]
+        prompts = build_quiz_prompts(topic, question_count, context, prompt)
+        return get_llm_cache().get(make_cache_key("llama3.1", prompts, None, format))
+
+    def test_generation_stops_once_question_count_questions_are_parsed(self):
+        questions = list(
+            stream_quiz_questions(
+                "photosynthesis", 5, QuizModeEnum.MULTIPLE_CHOICE.value
+            )
+        )
+
+        self.assertEqual(len(questions), 5)
+        # The fake server sends the closing "]}" as a separate token, which is
+        # never read: the response is cached as it was stopped.
+        self.assertEqual(
+            self.get_cached_response("photosynthesis", 5),
+            build_quiz_json(5, multiple_choice=True)[: -len("]}")],
+        )
+
+    def test_quiz_closed_by_the_client_is_not_cached(self):
+        questions = stream_quiz_questions(
+            "photosynthesis", 3, QuizModeEnum.MULTIPLE_CHOICE.value
+        )
+        next(questions)
+        questions.close()
+
+        self.assertIsNone(self.get_cached_response("photosynthesis", 3))
+
+    def test_quiz_endpoint_returns_question_count_questions(self):
+        response = self.client.post(
+            "/study_buddy_api/quiz/",
+            {"text": "photosynthesis", "mode": "flash_cards", "question_count": 4},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["data"]), 4)
+
+    def test_mode_wrappers_generate_questions_of_their_mode(self):
+        questions = generate_multi_choice_quiz_questions("photosynthesis", 2)
+        flashcards = generate_flash_quiz_questions("photosynthesis", 3)
+
+        self.assertEqual(len(questions), 2)
+        self.assertEqual(len(questions[0]["options"]), 4)
+        self.assertEqual(len(flashcards), 3)
+        self.assertNotIn("options", flashcards[0])
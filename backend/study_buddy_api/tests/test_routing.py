@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..routing import DEFAULT_MODEL_ROUTING, ModelRouter, get_model_router
+from .base import FakeOllamaTestCase
+
+
+TIERS = {"small": "llama3.2:1b", "large": "llama3.1:70b"}
+
+
+def patch_queue_depth(depth: int):
+    return mock.patch(
+        "study_buddy_api.routing.get_scheduler",
+        return_value=mock.Mock(queue_depth=mock.Mock(return_value=depth)),
+    )
+
+
+class ModelRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ModelRouter(
+            TIERS,
+            DEFAULT_MODEL_ROUTING["DEFAULT_TIER"],
+            DEFAULT_MODEL_ROUTING["ROUTES"],
+            fallback_tier="small",
+            fallback_queue_depth=4,
+        )
+
+    def route(self, task: str, variant: str = None, queue_depth: int = 0) -> str:
+        with patch_queue_depth(queue_depth):
+            return self.router.route(task, variant)
+
+    def test_variants_are_routed_before_their_task(self):
+        self.assertEqual(self.route("summarize", "brief"), TIERS["small"])
+        self.assertEqual(self.route("summarize", "detailed"), TIERS["large"])
+        self.assertEqual(self.route("quiz", "flash_cards"), TIERS["small"])
+        self.assertEqual(self.route("paraphrase"), TIERS["small"])
+
+    def test_unrouted_tasks_use_the_default_tier(self):
+        self.assertEqual(self.route("translate"), TIERS["large"])
+
+    def test_tasks_fall_back_under_load(self):
+        self.assertEqual(self.route("note", "detailed", queue_depth=3), TIERS["large"])
+
+        with self.assertLogs("study_buddy_api.routing", "INFO"):
+            model = self.route("note", "detailed", queue_depth=4)
+
+        self.assertEqual(model, TIERS["small"])
+
+    def test_fallback_can_be_disabled(self):
+        self.router.fallback_queue_depth = 0
+
+        self.assertEqual(self.route("chat", queue_depth=100), TIERS["large"])
+
+    def test_routed_generations_are_counted_by_task_tier_and_model(self):
+        self.route("chat")
+        self.route("chat")
+        with self.assertLogs("study_buddy_api.routing", "INFO"):
+            self.route("chat", queue_depth=4)
+
+        self.assertEqual(
+            self.router.stats(),
+            {
+                ("chat", "large", TIERS["large"]): 2,
+                ("chat", "small", TIERS["small"]): 1,
+            },
+        )
+
+
+class RequestRoutingTests(FakeOllamaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.override_study_buddy_settings("MODEL_ROUTING", TIERS=TIERS)
+
+    def test_requests_are_routed_by_summary_type_and_note_level(self):
+        responses = [
+            self.client.post(
+                "/study_buddy_api/summarize/",
+                {"text": "Plants.", "summary_type": "brief"},
+            ),
+            self.client.post(
+                "/study_buddy_api/note/", {"text": "Plants.", "level": "3"}
+            ),
+        ]
+
+        self.assertEqual([response.status_code for response in responses], [200] * 2)
+        self.assertEqual(
+            get_model_router().stats(),
+            {
+                ("summarize", "small", TIERS["small"]): 1,
+                ("note", "large", TIERS["large"]): 1,
+            },
+        )
+
+    def test_routed_generations_are_exported(self):
+        self.override_study_buddy_settings("REQUEST_TIMING", ENABLED=True)
+        self.client.post(
+            "/study_buddy_api/paraphrase/", {"text": "Plants.", "tone": "formal"}
+        )
+
+        response = self.client.get("/metrics")
+
+        self.assertIn(
+            'study_buddy_llm_routed_total{task="paraphrase",tier="small",'
+            'model="%s"} 1' % TIERS["small"],
+            response.content.decode(),
+        )
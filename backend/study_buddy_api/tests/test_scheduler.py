@@ -0,0 +1,185 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from ..deadlines import DeadlineExceeded, start_deadline
+from ..scheduler import LLMBusyError, LLMScheduler, Priority, get_scheduler
+from .base import FakeOllamaTestCase
+
+
+def wait_until(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the condition.")
+        time.sleep(0.005)
+
+
+class QueuedSlot:
+    """
+    Waits for a slot of the scheduler in a thread, holding it until released.
+    """
+
+    def __init__(self, scheduler, model="llama3.1", priority=Priority.BULK):
+        self.scheduler = scheduler
+        self.model = model
+        self.priority = priority
+        self.granted = threading.Event()
+        self.release = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        with self.scheduler.slot(self.model, self.priority):
+            self.granted.set()
+            self.release.wait(5)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def finish(self):
+        self.release.set()
+        self.thread.join(5)
+
+
+class LLMSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        self.slots = []
+        self.addCleanup(self.finish_slots)
+
+    def hold(self, scheduler, *args, **kwargs) -> QueuedSlot:
+        slot = QueuedSlot(scheduler, *args, **kwargs).start()
+        self.slots.append(slot)
+        return slot
+
+    def finish_slots(self):
+        # Queued slots only finish once the slots running before them do.
+        for slot in self.slots:
+            slot.release.set()
+        for slot in self.slots:
+            slot.thread.join(5)
+
+    def test_slots_are_granted_up_to_max_concurrency(self):
+        scheduler = LLMScheduler(max_concurrency=2)
+        first, second = self.hold(scheduler), self.hold(scheduler)
+        self.assertTrue(first.granted.wait(5) and second.granted.wait(5))
+
+        third = self.hold(scheduler)
+        wait_until(lambda: scheduler.queue_depth() == 1)
+        self.assertFalse(third.granted.is_set())
+
+        first.finish()
+        self.assertTrue(third.granted.wait(5))
+        self.assertEqual(scheduler.queue_depth(), 0)
+
+    def test_reserved_slots_only_admit_interactive_requests(self):
+        scheduler = LLMScheduler(max_concurrency=2, interactive_reserved=1)
+        bulk = self.hold(scheduler)
+        self.assertTrue(bulk.granted.wait(5))
+
+        queued_bulk = self.hold(scheduler)
+        wait_until(lambda: scheduler.queue_depth() == 1)
+        interactive = self.hold(scheduler, priority=Priority.INTERACTIVE)
+
+        self.assertTrue(interactive.granted.wait(5))
+        self.assertFalse(queued_bulk.granted.is_set())
+
+    def test_waiters_are_granted_by_priority_then_arrival(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        running = self.hold(scheduler)
+        self.assertTrue(running.granted.wait(5))
+
+        order = []
+
+        def run(name, priority):
+            with scheduler.slot("llama3.1", priority):
+                order.append(name)
+
+        threads = []
+        for name, priority in [
+            ("bulk 1", Priority.BULK),
+            ("bulk 2", Priority.BULK),
+            ("interactive", Priority.INTERACTIVE),
+        ]:
+            threads.append(threading.Thread(target=run, args=(name, priority)))
+            threads[-1].start()
+            wait_until(lambda: scheduler.queue_depth() == len(threads))
+
+        running.finish()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(order, ["interactive", "bulk 1", "bulk 2"])
+        self.assertEqual(scheduler.stats()["queue_wait"]["interactive"]["count"], 1)
+
+    def test_model_limit_does_not_block_other_models(self):
+        scheduler = LLMScheduler(max_concurrency=3, model_concurrency={"large": 1})
+        large = self.hold(scheduler, model="large")
+        self.assertTrue(large.granted.wait(5))
+
+        queued_large = self.hold(scheduler, model="large")
+        wait_until(lambda: scheduler.queue_depth() == 1)
+        small = self.hold(scheduler, model="small")
+
+        self.assertTrue(small.granted.wait(5))
+        self.assertFalse(queued_large.granted.is_set())
+
+    def test_full_queue_rejects_requests(self):
+        scheduler = LLMScheduler(max_concurrency=1, max_queue_depth=1, retry_after=7)
+        self.assertTrue(self.hold(scheduler).granted.wait(5))
+        self.hold(scheduler)
+        wait_until(lambda: scheduler.queue_depth() == 1)
+
+        with self.assertRaises(LLMBusyError) as context:
+            with scheduler.slot("llama3.1"):
+                pass
+
+        self.assertEqual(context.exception.wait, 7)
+        self.assertEqual(scheduler.stats()["rejected"], 1)
+
+    def test_queued_requests_are_dropped_once_their_deadline_passes(self):
+        scheduler = LLMScheduler(max_concurrency=1)
+        self.assertTrue(self.hold(scheduler).granted.wait(5))
+        errors = []
+
+        def wait_for_slot():
+            start_deadline(0.05)
+            try:
+                with scheduler.slot("llama3.1"):
+                    pass
+            except DeadlineExceeded as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=wait_for_slot)
+        thread.start()
+        thread.join(5)
+
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(scheduler.queue_depth(), 0)
+        self.assertEqual(scheduler.stats()["expired"], 1)
+
+
+class BackpressureTests(FakeOllamaTestCase):
+    def test_busy_scheduler_answers_503_with_retry_after(self):
+        self.override_study_buddy_settings(
+            "LLM_SCHEDULER",
+            MAX_CONCURRENCY=1,
+            INTERACTIVE_RESERVED=0,
+            MAX_QUEUE_DEPTH=1,
+            RETRY_AFTER=7,
+        )
+        scheduler = get_scheduler()
+        running = QueuedSlot(scheduler).start()
+        queued = QueuedSlot(scheduler).start()
+        self.addCleanup(queued.finish)
+        self.addCleanup(running.finish)
+        wait_until(lambda: scheduler.queue_depth() == 1)
+
+        response = self.client.post(
+            "/study_buddy_api/paraphrase/", {"text": "Plants.", "tone": "formal"}
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(self.get_request_counts(), [0])
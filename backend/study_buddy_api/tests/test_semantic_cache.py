@@ -0,0 +1,143 @@
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ..semantic_cache import SemanticCache, SemanticIndex, get_semantic_cache
+from .base import FakeOllamaTestCase
+
+
+def unit_vector(*components) -> np.ndarray:
+    vector = np.asarray(components, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class SemanticIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = SemanticIndex(dimensions=2, max_entries=2)
+        self.index.add(unit_vector(1, 0), "east", timeout=60)
+
+    def test_entries_within_the_threshold_are_served(self):
+        # Cosine similarity of about 0.95.
+        vector = unit_vector(1, 0.33)
+
+        self.assertEqual(self.index.search(vector, threshold=0.92), "east")
+        self.assertIsNone(self.index.search(vector, threshold=0.96))
+
+    def test_most_similar_entry_is_served(self):
+        self.index.add(unit_vector(1, 1), "north-east", timeout=60)
+
+        self.assertEqual(self.index.search(unit_vector(1, 0.8), 0.9), "north-east")
+
+    def test_expired_entries_are_not_served(self):
+        with mock.patch("study_buddy_api.semantic_cache.time.time", return_value=1e12):
+            self.assertIsNone(self.index.search(unit_vector(1, 0), 0.92))
+
+    def test_least_recently_used_entry_is_evicted_when_full(self):
+        self.index.add(unit_vector(0, 1), "north", timeout=60)
+        self.index.search(unit_vector(1, 0), 0.92)
+
+        self.index.add(unit_vector(-1, 0), "west", timeout=60)
+
+        self.assertEqual(self.index.search(unit_vector(1, 0), 0.92), "east")
+        self.assertIsNone(self.index.search(unit_vector(0, 1), 0.92))
+        self.assertEqual(self.index.search(unit_vector(-1, 0), 0.92), "west")
+
+
+class SemanticCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = SemanticCache(
+            "nomic-embed-text",
+            threshold=0.92,
+            max_entries=8,
+            timeout=60,
+            max_query_chars=100,
+        )
+        patcher = mock.patch.object(self.cache, "embed", return_value=unit_vector(1, 0))
+        self.embed = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_partitions_are_looked_up_separately(self):
+        _, vector = self.cache.get("chat:study_buddy", "What is photosynthesis?")
+        self.cache.set("chat:study_buddy", vector, "An answer.")
+
+        self.assertEqual(
+            self.cache.get("chat:study_buddy", "What's photosynthesis?")[0],
+            "An answer.",
+        )
+        self.assertIsNone(
+            self.cache.get("chat:chemistry", "What is photosynthesis?")[0]
+        )
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_long_requests_are_not_cached(self):
+        value, vector = self.cache.get("chat:study_buddy", "x" * 101)
+
+        self.assertEqual((value, vector), (None, None))
+        self.embed.assert_not_called()
+
+    def test_embedding_failures_are_misses_that_are_not_stored(self):
+        self.embed.side_effect = ConnectionError
+
+        with self.assertLogs("study_buddy_api.semantic_cache", "WARNING"):
+            value, vector = self.cache.get("chat:study_buddy", "Photosynthesis?")
+        self.cache.set("chat:study_buddy", vector, "An answer.")
+
+        self.assertIsNone(value)
+        self.assertEqual(self.cache.stats()["entries"], {})
+
+
+class SemanticChatCacheTests(FakeOllamaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.override_study_buddy_settings("SEMANTIC_CACHE", ENABLED=True)
+
+    def chat(self, *contents: str) -> str:
+        history = [
+            {"role": ("user", "assistant")[index % 2], "content": content}
+            for index, content in enumerate(contents)
+        ]
+        response = self.client.post(
+            "/study_buddy_api/chat/",
+            {"history": history},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["data"]
+
+    def get_chat_count(self) -> int:
+        # Every lookup sends an embedding request to the host.
+        stats = get_semantic_cache().stats()
+        return self.get_request_counts()[0] - stats["hits"] - stats["misses"]
+
+    def test_repeated_questions_are_served_from_the_cache(self):
+        answers = [self.chat("What is photosynthesis?") for _ in range(2)]
+
+        self.assertEqual(answers[0], answers[1])
+        self.assertEqual(get_semantic_cache().stats()["hits"], 1)
+        self.assertEqual(self.get_chat_count(), 1)
+
+    def test_different_questions_are_generated(self):
+        self.chat("What is photosynthesis?")
+        self.chat("Who discovered penicillin?")
+
+        self.assertEqual(get_semantic_cache().stats()["hits"], 0)
+        self.assertEqual(self.get_chat_count(), 2)
+
+    def test_threshold_above_one_disables_serving(self):
+        self.override_study_buddy_settings(
+            "SEMANTIC_CACHE", ENABLED=True, THRESHOLD=1.01
+        )
+
+        for _ in range(2):
+            self.chat("What is photosynthesis?")
+
+        self.assertEqual(self.get_chat_count(), 2)
+
+    def test_conversations_with_history_are_not_cached(self):
+        for _ in range(2):
+            self.chat("What is photosynthesis?", "A process.", "Why?")
+
+        self.assertEqual(get_semantic_cache().stats()["misses"], 0)
+        self.assertEqual(self.get_request_counts(), [2])
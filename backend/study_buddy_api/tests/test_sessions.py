@@ -0,0 +1,119 @@
+import uuid
+from unittest import mock
+
+import httpx
+
+from django.test import override_settings
+
+from ..models import ChatMessage
+from ..utils import generate_llm_response
+from .base import FakeOllamaTestCase, get_unused_url
+from .test_streaming import parse_sse_events
+
+
+class ChatSessionTests(FakeOllamaTestCase):
+    host_count = 2
+
+    def setUp(self):
+        super().setUp()
+        response = self.client.post("/study_buddy_api/chat/sessions/", {})
+        self.assertEqual(response.status_code, 201)
+        self.session = response.json()
+        self.messages_url = (
+            f"/study_buddy_api/chat/sessions/{self.session['id']}/messages/"
+        )
+
+    def send(self, content: str, path: str = ""):
+        return self.client.post(self.messages_url + path, {"content": content})
+
+    def get_messages(self, **params) -> list:
+        response = self.client.get(self.messages_url, params)
+
+        self.assertEqual(response.status_code, 200)
+        return [
+            (message["role"], message["content"]) for message in response.json()["data"]
+        ]
+
+    def test_turns_are_stored_with_their_replies(self):
+        replies = [self.send(content).json()["data"] for content in ("Hi", "Why?")]
+
+        self.assertEqual(
+            self.get_messages(),
+            [
+                ("user", "Hi"),
+                ("assistant", replies[0]),
+                ("user", "Why?"),
+                ("assistant", replies[1]),
+            ],
+        )
+        self.assertEqual(
+            self.get_messages(limit=2), [("user", "Why?"), ("assistant", replies[1])]
+        )
+
+    def test_prompts_are_built_from_the_stored_history(self):
+        self.send("Hi")
+
+        with mock.patch(
+            "study_buddy_api.services.generate_llm_response",
+            wraps=generate_llm_response,
+        ) as generate:
+            self.send("Why?")
+
+        prompts = generate.call_args.args[0]
+        self.assertEqual(prompts[0]["role"], "system")
+        self.assertEqual(
+            [(prompt["role"], prompt["content"]) for prompt in prompts[1:]],
+            self.get_messages()[:2] + [("user", "Why?")],
+        )
+
+    @override_settings(STUDY_BUDDY_CHAT_SESSION_MESSAGES=2)
+    def test_only_the_latest_stored_messages_are_loaded(self):
+        for content in ("One", "Two", "Three"):
+            self.send(content)
+
+        with mock.patch(
+            "study_buddy_api.services.generate_llm_response",
+            wraps=generate_llm_response,
+        ) as generate:
+            self.send("Four")
+
+        prompts = generate.call_args.args[0]
+        self.assertEqual(
+            [prompt["content"] for prompt in prompts[1::2]], ["Three", "Four"]
+        )
+
+    def test_streamed_replies_are_stored_once_complete(self):
+        response = self.send("Hi", "?stream=1")
+        events = parse_sse_events(b"".join(response.streaming_content))
+
+        reply = "".join(data["token"] for event, data in events[:-1])
+        self.assertEqual(self.get_messages(), [("user", "Hi"), ("assistant", reply)])
+
+    def test_failed_turns_are_not_stored(self):
+        self.override_study_buddy_settings("OLLAMA_POOL", HOSTS=[get_unused_url()])
+
+        with self.assertLogs("study_buddy_api.ollama_client", "WARNING"):
+            with self.assertRaises(httpx.TransportError):
+                self.send("Hi")
+
+        self.assertFalse(ChatMessage.objects.exists())
+        self.assertEqual(self.get_messages(), [])
+
+    def test_turns_of_a_session_go_to_the_same_host(self):
+        for number in range(4):
+            self.send(f"Question {number}")
+
+        self.assertEqual(sorted(self.get_request_counts()), [0, 4])
+
+    def test_unknown_sessions_are_not_found(self):
+        response = self.client.post(
+            f"/study_buddy_api/chat/sessions/{uuid.uuid4()}/messages/",
+            {"content": "Hi"},
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_limits_are_rejected(self):
+        response = self.client.get(self.messages_url, {"limit": "all"})
+
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase, override_settings
+
+from benchmarks.fake_ollama import FakeOllamaConfig
+
+from ..deadlines import DeadlineExceeded
+from ..single_flight import SingleFlight, _get_single_flight, coalesce
+from ..utils import create_prompt_and_get_response
+from .base import FakeOllamaTestCase
+
+
+class BlockingGeneration:
+    """
+    A generation that runs until released, counting its runs.
+    """
+
+    def __init__(self, result="summary", error: BaseException = None):
+        self.result = result
+        self.error = error
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.runs = 0
+
+    def __call__(self):
+        self.runs += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            # Only the first run fails, followers that take over succeed.
+            error, self.error = self.error, None
+            raise error
+        return self.result
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.single_flight = SingleFlight()
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(self.executor.shutdown)
+
+    def start_calls(self, generate, count: int) -> list:
+        """
+        Start a leading call of `generate`, then `count - 1` calls joining it.
+        """
+        leader = self.executor.submit(self.single_flight.do, "key", generate)
+        self.assertTrue(generate.started.wait(5))
+        followers = [
+            self.executor.submit(self.single_flight.do, "key", generate)
+            for _ in range(count - 1)
+        ]
+        self.wait_for_followers(count - 1)
+        return [leader, *followers]
+
+    def wait_for_followers(self, count: int):
+        for _ in range(500):
+            if self.single_flight.stats()["local"] == count:
+                return
+            time.sleep(0.01)
+        self.fail("The followers did not join the call in flight.")
+
+    def test_concurrent_calls_share_a_single_generation(self):
+        generate = BlockingGeneration()
+        calls = self.start_calls(generate, 4)
+
+        generate.release.set()
+
+        self.assertEqual([call.result(5) for call in calls], ["summary"] * 4)
+        self.assertEqual(generate.runs, 1)
+        self.assertEqual(self.single_flight.stats(), {"local": 3, "shared": 0})
+
+    def test_calls_after_completion_generate_again(self):
+        generate = BlockingGeneration()
+        generate.release.set()
+
+        self.single_flight.do("key", generate)
+        self.single_flight.do("key", generate)
+
+        self.assertEqual(generate.runs, 2)
+        self.assertEqual(self.single_flight.stats()["local"], 0)
+
+    def test_errors_are_shared_with_the_waiting_calls(self):
+        generate = BlockingGeneration(error=ValueError("invalid response"))
+        calls = self.start_calls(generate, 3)
+
+        generate.release.set()
+
+        for call in calls:
+            with self.assertRaisesMessage(ValueError, "invalid response"):
+                call.result(5)
+        self.assertEqual(generate.runs, 1)
+
+    def test_waiting_call_takes_over_from_a_cancelled_one(self):
+        generate = BlockingGeneration(error=DeadlineExceeded())
+        leader, follower = self.start_calls(generate, 2)
+
+        generate.release.set()
+
+        with self.assertRaises(DeadlineExceeded):
+            leader.result(5)
+        self.assertEqual(follower.result(5), "summary")
+        self.assertEqual(generate.runs, 2)
+
+    def test_async_waiting_call_takes_over_from_a_cancelled_task(self):
+        runs = []
+
+        async def generate():
+            runs.append(asyncio.current_task())
+            await asyncio.sleep(0 if len(runs) > 1 else 5)
+            return "summary"
+
+        async def run_calls():
+            leader = asyncio.create_task(self.single_flight.ado("key", generate))
+            await asyncio.sleep(0.01)
+            follower = asyncio.create_task(self.single_flight.ado("key", generate))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await asyncio.wait_for(follower, 5)
+
+        self.assertEqual(asyncio.run(run_calls()), "summary")
+        self.assertEqual(len(runs), 2)
+        self.assertEqual(self.single_flight.stats()["local"], 1)
+
+    def test_async_calls_share_a_single_generation(self):
+        runs = []
+
+        async def generate():
+            runs.append(None)
+            await asyncio.sleep(0.05)
+            return "summary"
+
+        async def run_calls():
+            return await asyncio.gather(
+                *(self.single_flight.ado("key", generate) for _ in range(4))
+            )
+
+        self.assertEqual(asyncio.run(run_calls()), ["summary"] * 4)
+        self.assertEqual(len(runs), 1)
+
+
+class CoalesceTests(SimpleTestCase):
+    def test_disabled_single_flight_generates_directly(self):
+        generate = BlockingGeneration()
+        generate.release.set()
+
+        with override_settings(STUDY_BUDDY_SINGLE_FLIGHT={"ENABLED": False}):
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                calls = [executor.submit(coalesce, "key", generate) for _ in range(2)]
+                results = [call.result(5) for call in calls]
+
+        self.assertEqual(results, ["summary"] * 2)
+        self.assertEqual(generate.runs, 2)
+
+
+class CoalescedGenerationTests(FakeOllamaTestCase):
+    # Slow enough for the concurrent requests to join the first generation.
+    fake_ollama_config = FakeOllamaConfig(
+        tokens_per_second=20, first_token_delay=0, response_tokens=10
+    )
+
+    def test_identical_concurrent_prompts_share_a_generation(self):
+        def summarize():
+            response, extracted_text = create_prompt_and_get_response(
+                "context", {"text": "Plants turn light into glucose."}, "Summarize:"
+            )
+            return response
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(lambda _: summarize(), range(4)))
+
+        self.assertEqual(len(set(responses)), 1)
+        self.assertEqual(self.get_request_counts(), [1])
+        self.assertEqual(_get_single_flight().stats()["local"], 3)
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.test import SimpleTestCase
+
+from benchmarks.startup import BACKEND_DIR, IMPORT_SCRIPT, LAZY_MODULES
+
+
+# Prints the class of the ASGI application, and the lazy modules it loaded.
+ASGI_SCRIPT = """
+import json, sys
+
+from Ensuite.asgi import application
+
+print(json.dumps({
+    "application": type(application).__name__,
+    "protocols": sorted(application.application_mapping),
+    "loaded": [name for name in sys.argv[1:] if name in sys.modules],
+}))
+"""
+
+
+def run_script(script: str) -> dict:
+    """
+    Run a script in a fresh interpreter set up with the test settings, returning
+    the JSON it printed last.
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", script, *LAZY_MODULES],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "DJANGO_SETTINGS_MODULE": "Ensuite.test_settings"},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+class StartupTests(SimpleTestCase):
+    def test_heavy_dependencies_are_not_imported_at_startup(self):
+        result = run_script(IMPORT_SCRIPT)
+
+        self.assertEqual(result["loaded"], [])
+
+    def test_asgi_application_loads(self):
+        result = run_script(ASGI_SCRIPT)
+
+        self.assertEqual(result["application"], "ProtocolTypeRouter")
+        self.assertEqual(result["protocols"], ["http", "websocket"])
+        self.assertEqual(result["loaded"], [])
@@ -0,0 +1,160 @@
+import json
+
+from django.test import SimpleTestCase
+
+from benchmarks.fake_ollama import FakeOllamaConfig, build_response_tokens
+
+from ..streaming import format_sse_event
+from .base import FakeOllamaTestCase, get_unused_url
+
+
+RESPONSE_TOKENS = build_response_tokens({}, 10)
+
+
+def parse_sse_events(body: bytes) -> list:
+    """
+    Parse a Server-Sent Events body into `(event, data)` pairs.
+    """
+    events = []
+    for block in body.decode("utf-8").split("\n\n"):
+        if not block:
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+
+class FormatSSEEventTests(SimpleTestCase):
+    def test_event_is_framed_by_a_blank_line(self):
+        self.assertEqual(
+            format_sse_event({"token": "Hi\n"}, event="token"),
+            'event: token\ndata: {"token": "Hi\\n"}\n\n',
+        )
+
+    def test_event_name_is_optional(self):
+        self.assertEqual(format_sse_event({"a": 1}), 'data: {"a": 1}\n\n')
+
+
+class EventStreamTests(FakeOllamaTestCase):
+    def post_stream(self, path: str, data: dict, **headers) -> list:
+        response = self.client.post(
+            f"/study_buddy_api/{path}", data, headers=headers or None
+        )
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        return parse_sse_events(b"".join(response.streaming_content))
+
+    def test_tokens_are_sent_as_they_are_generated_then_done(self):
+        events = self.post_stream(
+            "paraphrase/?stream=1", {"text": "Plants.", "tone": "formal"}
+        )
+
+        self.assertEqual(
+            events[:-1], [("token", {"token": token}) for token in RESPONSE_TOKENS]
+        )
+        event, done = events[-1]
+        self.assertEqual(event, "done")
+        self.assertEqual(done["model"], "llama3.1")
+        self.assertEqual(done["extracted_text"], "Plants.")
+        self.assertEqual(done["timings"]["token_count"], len(RESPONSE_TOKENS))
+        self.assertLessEqual(
+            done["timings"]["time_to_first_token_ms"], done["timings"]["total_ms"]
+        )
+
+    def test_accept_header_opts_in_to_streaming(self):
+        events = self.post_stream(
+            "summarize/",
+            {"text": "Plants.", "summary_type": "brief"},
+            accept="text/event-stream",
+        )
+
+        self.assertEqual(events[-1][0], "done")
+
+    def test_quiz_questions_are_sent_as_question_events(self):
+        events = self.post_stream(
+            "quiz/?stream=1",
+            {"text": "photosynthesis", "mode": "multiple_choice", "question_count": 3},
+        )
+
+        self.assertEqual([event for event, data in events], ["question"] * 3 + ["done"])
+        self.assertEqual(
+            events[0][1]["question"]["question"], "Question 1 about photosynthesis?"
+        )
+
+    def test_validation_errors_are_sent_as_an_error_event(self):
+        response = self.client.post(
+            "/study_buddy_api/paraphrase/?stream=1",
+            {"text": "Plants.", "tone": "rude"},
+            headers={"accept": "text/event-stream"},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        [(event, data)] = parse_sse_events(response.content)
+        self.assertEqual(event, "error")
+        self.assertIn("tone", data)
+
+    def test_generation_errors_end_the_stream_with_an_error_event(self):
+        self.override_study_buddy_settings("OLLAMA_POOL", HOSTS=[get_unused_url()])
+
+        with self.assertLogs("study_buddy_api.ollama_client", "WARNING"):
+            with self.assertLogs("study_buddy_api.streaming", "ERROR"):
+                events = self.post_stream(
+                    "paraphrase/?stream=1", {"text": "Plants.", "tone": "formal"}
+                )
+
+        [(event, data)] = events
+        self.assertEqual(event, "error")
+        self.assertTrue(data["detail"])
+
+
+class ASGIEventStreamTests(FakeOllamaTestCase):
+    # Slow enough for the first token to arrive well before the last one.
+    fake_ollama_config = FakeOllamaConfig(
+        tokens_per_second=20, first_token_delay=0, response_tokens=10
+    )
+
+    async def assert_tokens_are_sent_as_generated(self, path: str, data: dict):
+        request = self.start_asgi_request(f"/study_buddy_api/{path}", data)
+        await request.send()
+
+        elapsed, start = await request.receive()
+        self.assertEqual(start["status"], 200)
+        messages = await request.receive_all()
+        await request.communicator.wait()
+
+        first_token_at = messages[0][0]
+        done_at = messages[-1][0]
+        # Half a second of generation, sent token by token rather than buffered.
+        self.assertLess(first_token_at, done_at / 2)
+        body = b"".join(message.get("body", b"") for elapsed, message in messages)
+        events = parse_sse_events(body)
+        self.assertEqual(
+            "".join(data["token"] for event, data in events[:-1]),
+            "".join(RESPONSE_TOKENS),
+        )
+        self.assertEqual(events[-1][0], "done")
+
+    async def test_sync_views_stream_under_asgi(self):
+        await self.assert_tokens_are_sent_as_generated(
+            "paraphrase/?stream=1", {"text": "Plants.", "tone": "formal"}
+        )
+
+    async def test_async_views_stream_under_asgi(self):
+        await self.assert_tokens_are_sent_as_generated(
+            "async/paraphrase/?stream=1", {"text": "Plants.", "tone": "formal"}
+        )
+
+    async def test_async_chat_streams_under_asgi(self):
+        request = self.start_asgi_request(
+            "/study_buddy_api/async/chat/?stream=1",
+            {"history": [{"role": "user", "content": "Hi"}]},
+            content_type="application/json",
+        )
+        await request.send()
+        await request.receive()
+        messages = await request.receive_all()
+
+        body = b"".join(message.get("body", b"") for elapsed, message in messages)
+        events = parse_sse_events(body)
+        self.assertEqual(events[-1][0], "done")
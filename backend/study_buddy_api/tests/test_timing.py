@@ -0,0 +1,148 @@
+import time
+
+from django.test import SimpleTestCase
+
+from benchmarks.fake_ollama import FakeOllamaConfig
+
+from ..timing import REQUEST_DURATION, STAGE_DURATION, Histogram, stage
+from .base import FakeOllamaTestCase
+
+
+PARAPHRASE = "study_buddy_api/paraphrase/"
+
+
+def get_series(histogram: Histogram, labels: tuple):
+    """
+    Get `(cumulative bucket counts, sum, count)` of a series, if any.
+    """
+    for series_labels, counts, total, count in histogram.collect():
+        if series_labels == labels:
+            return counts, total, count
+    return None
+
+
+def get_count(histogram: Histogram, labels: tuple) -> int:
+    series = get_series(histogram, labels)
+    return series[2] if series else 0
+
+
+def parse_server_timing(header: str) -> dict:
+    durations = {}
+    for metric in header.split(", "):
+        name, duration = metric.split(";dur=")
+        durations[name] = float(duration)
+    return durations
+
+
+class HistogramTests(SimpleTestCase):
+    def test_bucket_counts_are_cumulative(self):
+        histogram = Histogram("test_seconds", "Test.", ("endpoint",), (0.1, 1))
+
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(("quiz",), value)
+
+        [(labels, counts, total, count)] = histogram.collect()
+        self.assertEqual(labels, ("quiz",))
+        # Buckets are inclusive of their upper bound, the last one is +Inf.
+        self.assertEqual(counts, [2, 3, 4])
+        self.assertAlmostEqual(total, 2.65)
+        self.assertEqual(count, 4)
+
+    def test_stages_outside_of_requests_are_not_recorded(self):
+        with stage("llm_generate") as timed:
+            pass
+
+        self.assertIsNone(timed.timings)
+
+
+class RequestTimingTests(FakeOllamaTestCase):
+    fake_ollama_config = FakeOllamaConfig(
+        tokens_per_second=100, first_token_delay=0, response_tokens=20
+    )
+
+    def setUp(self):
+        super().setUp()
+        # The middleware is loaded by the first request of the test client.
+        self.override_study_buddy_settings("REQUEST_TIMING", ENABLED=True)
+
+    def paraphrase(self, path: str = ""):
+        return self.client.post(
+            f"/{PARAPHRASE}{path}", {"text": "Plants.", "tone": "formal"}
+        )
+
+    def test_responses_carry_their_stages_in_the_server_timing_header(self):
+        response = self.paraphrase()
+
+        self.assertEqual(response.status_code, 200)
+        durations = parse_server_timing(response["Server-Timing"])
+        self.assertEqual(list(durations)[-1], "total")
+        self.assertIn("parse", durations)
+        # 20 tokens at 100 per second.
+        self.assertGreaterEqual(durations["llm_generate"], 150)
+        self.assertGreaterEqual(durations["total"], durations["llm_generate"])
+
+    def test_server_timing_header_can_be_disabled(self):
+        self.override_study_buddy_settings(
+            "REQUEST_TIMING", ENABLED=True, SERVER_TIMING_HEADER=False
+        )
+        labels = (PARAPHRASE, "POST", "200")
+        count = get_count(REQUEST_DURATION, labels)
+
+        response = self.paraphrase()
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(get_count(REQUEST_DURATION, labels), count + 1)
+
+    def test_requests_are_recorded_by_endpoint_status_and_stage(self):
+        series = [
+            (REQUEST_DURATION, (PARAPHRASE, "POST", "200")),
+            (REQUEST_DURATION, (PARAPHRASE, "POST", "400")),
+            (STAGE_DURATION, (PARAPHRASE, "llm_generate")),
+        ]
+        counts = [get_count(histogram, labels) for histogram, labels in series]
+
+        self.paraphrase()
+        self.client.post(f"/{PARAPHRASE}", {"text": "Plants.", "tone": "rude"})
+
+        self.assertEqual(
+            [get_count(histogram, labels) for histogram, labels in series],
+            [count + 1 for count in counts],
+        )
+
+    def test_streamed_responses_are_recorded_once_consumed(self):
+        labels = (PARAPHRASE, "POST", "200")
+        _, total, count = get_series(REQUEST_DURATION, labels) or (None, 0.0, 0)
+
+        response = self.paraphrase("?stream=1")
+        started_at = time.perf_counter()
+        self.assertEqual(get_count(REQUEST_DURATION, labels), count)
+        b"".join(response.streaming_content)
+        streamed_for = time.perf_counter() - started_at
+
+        _, new_total, new_count = get_series(REQUEST_DURATION, labels)
+        self.assertEqual(new_count, count + 1)
+        # The duration runs until the last byte of the stream.
+        self.assertGreaterEqual(new_total - total, streamed_for)
+
+    def test_metrics_are_exported_in_the_prometheus_format(self):
+        self.paraphrase()
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        metrics = response.content.decode()
+        self.assertIn("# TYPE study_buddy_request_duration_seconds histogram", metrics)
+        self.assertIn(
+            'study_buddy_request_duration_seconds_count{endpoint="%s",method="POST",'
+            'status="200"}' % PARAPHRASE,
+            metrics,
+        )
+        self.assertIn("study_buddy_llm_active_generations 0", metrics)
+
+    def test_metrics_are_not_exported_while_timing_is_disabled(self):
+        self.override_study_buddy_settings("REQUEST_TIMING", ENABLED=False)
+
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 404)
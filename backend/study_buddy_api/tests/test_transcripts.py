@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..cache import LocalLRUCache
+from ..transcripts import TranscriptStore, TranscriptUnavailableError
+from .base import FakeOllamaTestCase
+
+
+TRANSCRIPT = [{"text": "Plants turn light"}, {"text": "into glucose."}]
+
+
+def patch_fetch(**kwargs):
+    return mock.patch("study_buddy_api.transcripts.fetch_transcript", **kwargs)
+
+
+class TranscriptStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = TranscriptStore(
+            LocalLRUCache(max_bytes=1024), timeout=3600, negative_timeout=60
+        )
+
+    def test_transcripts_are_fetched_once(self):
+        with patch_fetch(return_value=TRANSCRIPT) as fetch:
+            texts = [self.store.get_transcript("video") for _ in range(2)]
+
+        self.assertEqual(texts, ["Plants turn light into glucose."] * 2)
+        fetch.assert_called_once_with("video")
+
+    def test_unavailable_transcripts_are_cached_until_negative_timeout(self):
+        with patch_fetch(side_effect=TranscriptUnavailableError("disabled")) as fetch:
+            for _ in range(2):
+                with self.assertRaisesMessage(TranscriptUnavailableError, "disabled"):
+                    self.store.get_transcript("video")
+        fetch.assert_called_once()
+
+        with patch_fetch(return_value=TRANSCRIPT), mock.patch(
+            "study_buddy_api.cache.time.monotonic", return_value=1e12
+        ):
+            text = self.store.get_transcript("video")
+
+        self.assertEqual(text, "Plants turn light into glucose.")
+
+    def test_transient_failures_are_not_cached(self):
+        with patch_fetch(side_effect=[ConnectionError, TRANSCRIPT]) as fetch:
+            with self.assertRaises(ConnectionError):
+                self.store.get_transcript("video")
+            self.store.get_transcript("video")
+
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_cache_failures_fall_back_to_fetching(self):
+        backend = mock.Mock()
+        backend.get.side_effect = ConnectionError
+        backend.set.side_effect = ConnectionError
+        store = TranscriptStore(backend)
+
+        with patch_fetch(return_value=TRANSCRIPT), self.assertLogs(
+            "study_buddy_api.transcripts", "WARNING"
+        ):
+            text = store.get_transcript("video")
+
+        self.assertEqual(text, "Plants turn light into glucose.")
+
+
+class YouTubeSourceTests(FakeOllamaTestCase):
+    def paraphrase(self, youtube_url: str):
+        return self.client.post(
+            "/study_buddy_api/paraphrase/",
+            {"youtube_url": youtube_url, "tone": "formal"},
+        )
+
+    def test_every_url_form_of_a_video_shares_its_transcript(self):
+        with patch_fetch(return_value=TRANSCRIPT) as fetch:
+            responses = [
+                self.paraphrase("https://www.youtube.com/watch?v=dQw4w9WgXcQ"),
+                self.paraphrase("https://youtu.be/dQw4w9WgXcQ"),
+            ]
+
+        self.assertEqual([response.status_code for response in responses], [200] * 2)
+        fetch.assert_called_once_with("dQw4w9WgXcQ")
+
+    def test_videos_without_transcript_are_rejected(self):
+        with patch_fetch(side_effect=TranscriptUnavailableError("disabled")) as fetch:
+            responses = [
+                self.paraphrase("https://youtu.be/dQw4w9WgXcQ") for _ in range(2)
+            ]
+
+        self.assertEqual([response.status_code for response in responses], [400] * 2)
+        self.assertIn("disabled", responses[1].json()[0])
+        fetch.assert_called_once()
+        self.assertEqual(self.get_request_counts(), [0])
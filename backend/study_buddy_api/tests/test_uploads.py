@@ -0,0 +1,81 @@
+import io
+import os
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from benchmarks.pdf_extraction import build_pdf
+
+from ..utils import extract_text_from_file, spooled_file_path
+from .base import FakeOllamaTestCase
+
+
+class TrickleFile(io.BytesIO):
+    """
+    A file returning a single byte per read, splitting multi-byte characters.
+    """
+
+    def read(self, size=-1):
+        return super().read(1)
+
+
+class SpooledFilePathTests(SimpleTestCase):
+    def test_uploads_spooled_by_django_are_used_in_place(self):
+        upload = TemporaryUploadedFile("notes.pdf", "application/pdf", 4, None)
+        self.addCleanup(upload.close)
+
+        with spooled_file_path(upload) as path:
+            self.assertEqual(path, upload.temporary_file_path())
+
+    def test_other_files_are_copied_to_a_removed_temporary_file(self):
+        with spooled_file_path(io.BytesIO(b"%PDF"), suffix=".pdf") as path:
+            self.assertTrue(path.endswith(".pdf"))
+            with open(path, "rb") as spooled_file:
+                self.assertEqual(spooled_file.read(), b"%PDF")
+
+        self.assertFalse(os.path.exists(path))
+
+
+class ExtractTextFromFileTests(SimpleTestCase):
+    def test_text_is_decoded_across_chunk_boundaries(self):
+        text = "Photosynthèse — ☀️"
+
+        self.assertEqual(
+            extract_text_from_file(TrickleFile(text.encode("utf-8")), "txt"), text
+        )
+
+    def test_pdfs_are_extracted_from_disk(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(build_pdf(directory.name, 2), "rb") as pdf:
+            text = extract_text_from_file(io.BytesIO(pdf.read()), "PDF")
+
+        self.assertTrue(text.startswith("Page 0"))
+
+
+class UploadTests(FakeOllamaTestCase):
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=8)
+    def test_uploads_spooled_to_disk_are_extracted(self):
+        upload = SimpleUploadedFile("notes.txt", b"Plants turn light into glucose.")
+
+        response = self.client.post(
+            "/study_buddy_api/paraphrase/", {"file": upload, "tone": "formal"}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["extracted_text"], "Plants turn light into glucose."
+        )
+
+    @override_settings(STUDY_BUDDY_MAX_UPLOAD_SIZE=8)
+    def test_uploads_larger_than_the_maximum_size_are_rejected(self):
+        upload = SimpleUploadedFile("notes.txt", b"Plants turn light into glucose.")
+
+        response = self.client.post(
+            "/study_buddy_api/paraphrase/", {"file": upload, "tone": "formal"}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("File is too large", response.json()["file"][0])
+        self.assertEqual(self.get_request_counts(), [0])
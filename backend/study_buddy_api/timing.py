@@ -0,0 +1,257 @@
+"""
+Per-stage timing of API requests.
+
+Code paths wrap their stages (upload parsing, text extraction, LLM queueing and
+generation, quiz parsing...) in `stage(name)`. When `STUDY_BUDDY_REQUEST_TIMING`
+is enabled, `RequestTimingMiddleware` collects the stages of every request in a
+context variable, returns them in a `Server-Timing` header and records them in
+the histograms exported by the `/metrics` endpoint. When it is disabled, the
+middleware is not loaded and `stage` only reads the context variable.
+
+Stages may nest (e.g. `llm_generate` within `map_reduce`) and stages that run
+concurrently are added up, so their sum can exceed the request duration.
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from django.http import StreamingHttpResponse
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+
+from .conf import get_setting
+
+
+DEFAULT_REQUEST_TIMING = {
+    "ENABLED": False,
+    # The header exposes the internals of a request, disable it for public APIs.
+    "SERVER_TIMING_HEADER": True,
+}
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+)
+
+_request_timings = ContextVar("request_timings", default=None)
+
+
+def get_request_timing_setting(name: str):
+    return get_setting("REQUEST_TIMING", name, DEFAULT_REQUEST_TIMING)
+
+
+class Histogram:
+    """
+    Prometheus-style cumulative histogram, keyed by label values.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple,
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Bucket counts (the last one is +Inf), sum.
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self) -> list:
+        """
+        Get `(labels, cumulative bucket counts, sum, count)` of every series.
+        """
+        with self._lock:
+            series = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in self._series.items()
+            ]
+
+        samples = []
+        for labels, counts, total in series:
+            cumulative, running = [], 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            samples.append((labels, cumulative, total, running))
+        return samples
+
+
+REQUEST_DURATION = Histogram(
+    "study_buddy_request_duration_seconds",
+    "Duration of API requests, until the last byte of streamed responses.",
+    ("endpoint", "method", "status"),
+)
+
+STAGE_DURATION = Histogram(
+    "study_buddy_stage_duration_seconds",
+    "Time spent in each stage of API requests.",
+    ("endpoint", "stage"),
+)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        # Stages may be timed from several threads, e.g. map-reduce chunks.
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return list(self.stages.items())
+
+    def server_timing(self) -> str:
+        stages = self.snapshot() + [("total", self.elapsed())]
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages)
+
+
+class stage:
+    """
+    Time the enclosed block as a stage of the current request, if any.
+    """
+
+    __slots__ = ("name", "timings", "started_at")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = _request_timings.get()
+        if self.timings is not None:
+            self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.timings is not None:
+            self.timings.add(self.name, time.perf_counter() - self.started_at)
+
+
+def record_stage(name: str, seconds: float):
+    """
+    Record a stage measured by the caller, e.g. spanning the iteration of a stream.
+    """
+    if (timings := _request_timings.get()) is not None:
+        timings.add(name, seconds)
+
+
+class TimedParserMixin:
+    """
+    Time the parsing of request bodies, e.g. spooling multipart uploads to disk.
+    """
+
+    def parse(self, *args, **kwargs):
+        with stage("parse"):
+            return super().parse(*args, **kwargs)
+
+
+class TimedMultiPartParser(TimedParserMixin, MultiPartParser):
+    pass
+
+
+class TimedFormParser(TimedParserMixin, FormParser):
+    pass
+
+
+class TimedJSONParser(TimedParserMixin, JSONParser):
+    pass
+
+
+def start_request_timing() -> RequestTimings:
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+
+def get_endpoint(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.route if match else "unmatched"
+
+
+def observe_request(request, response, timings: RequestTimings):
+    endpoint = get_endpoint(request)
+    REQUEST_DURATION.observe(
+        (endpoint, request.method, str(response.status_code)), timings.elapsed()
+    )
+    for name, seconds in timings.snapshot():
+        STAGE_DURATION.observe((endpoint, name), seconds)
+
+
+def finish_request_timing(request, response, timings: RequestTimings):
+    """
+    Add the `Server-Timing` header to the response and record the request in the
+    histograms.
+
+    Note:
+        The header of a streamed response only covers the stages before the
+        stream starts, the histograms are recorded once it has been consumed.
+    """
+    if get_request_timing_setting("SERVER_TIMING_HEADER"):
+        response["Server-Timing"] = timings.server_timing()
+
+    if isinstance(response, StreamingHttpResponse):
+        stream = atimed_stream if response.is_async else timed_stream
+        response.streaming_content = stream(
+            response.streaming_content, request, response, timings
+        )
+    else:
+        observe_request(request, response, timings)
+
+    _request_timings.set(None)
+    return response
+
+
+def timed_stream(content, request, response, timings: RequestTimings):
+    # The stream is consumed after the middleware has returned, possibly in
+    # another thread, so the timings are made current again while it runs.
+    _request_timings.set(timings)
+    try:
+        yield from content
+    finally:
+        _request_timings.set(None)
+        observe_request(request, response, timings)
+
+
+async def atimed_stream(content, request, response, timings: RequestTimings):
+    """
+    Async variant of `timed_stream`.
+    """
+    _request_timings.set(timings)
+    try:
+        async for part in content:
+            yield part
+    finally:
+        _request_timings.set(None)
+        observe_request(request, response, timings)
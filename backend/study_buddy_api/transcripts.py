@@ -0,0 +1,122 @@
+import json
+import logging
+
+from .cache import build_cache_backend
+from .conf import get_settings, lazy_singleton
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRANSCRIPT_CACHE = {
+    "BACKEND": "local",
+    "LOCATION": "redis://127.0.0.1:6379/1",
+    "TIMEOUT": 60 * 60 * 24 * 7,
+    "NEGATIVE_TIMEOUT": 60 * 60,
+    "MAX_BYTES": 32 * 1024 * 1024,
+    "KEY_PREFIX": "study_buddy:transcript:",
+}
+
+
+class TranscriptUnavailableError(Exception):
+    pass
+
+
+def fetch_transcript(video_id: str) -> list:
+    """
+    Fetch the transcript of a video from YouTube. `youtube_transcript_api` is
+    imported on the first fetch, so that processes that never fetch transcripts
+    don't load it.
+
+    Raises:
+        TranscriptUnavailableError: On failures that will not go away by
+            retrying, and are therefore cached.
+    """
+    from youtube_transcript_api import (
+        InvalidVideoId,
+        NoTranscriptAvailable,
+        NoTranscriptFound,
+        TranscriptsDisabled,
+        VideoUnavailable,
+        YouTubeTranscriptApi,
+    )
+
+    try:
+        return YouTubeTranscriptApi.get_transcript(video_id)
+    except (
+        InvalidVideoId,
+        NoTranscriptAvailable,
+        NoTranscriptFound,
+        TranscriptsDisabled,
+        VideoUnavailable,
+    ) as e:
+        raise TranscriptUnavailableError(str(e)) from e
+
+
+class TranscriptStore:
+    """
+    Transcript cache keyed by YouTube video id, shared by all workers when backed
+    by Redis. Permanent failures are cached too (for `negative_timeout` seconds)
+    so that invalid videos are not fetched again on every request.
+    """
+
+    def __init__(self, backend=None, timeout: int = None, negative_timeout: int = None):
+        self.backend = backend
+        self.timeout = timeout
+        self.negative_timeout = negative_timeout
+
+    def _get(self, video_id: str):
+        if self.backend is None:
+            return None
+
+        try:
+            value = self.backend.get(video_id)
+        except Exception:
+            logger.warning("Transcript cache lookup failed", exc_info=True)
+            return None
+
+        return json.loads(value) if value is not None else None
+
+    def _set(self, video_id: str, entry: dict, timeout: int):
+        if self.backend is None:
+            return
+
+        try:
+            self.backend.set(video_id, json.dumps(entry), timeout)
+        except Exception:
+            logger.warning("Transcript cache store failed", exc_info=True)
+
+    def get_transcript(self, video_id: str) -> str:
+        """
+        Get the transcript of a video, fetching it from YouTube on a cache miss.
+
+        Raises:
+            TranscriptUnavailableError: If the video has no retrievable transcript.
+        """
+        if entry := self._get(video_id):
+            if "error" in entry:
+                raise TranscriptUnavailableError(entry["error"])
+            return entry["text"]
+
+        try:
+            transcript = fetch_transcript(video_id)
+        except TranscriptUnavailableError as e:
+            self._set(video_id, {"error": str(e)}, self.negative_timeout)
+            raise
+
+        text = " ".join([entry["text"] for entry in transcript])
+        self._set(video_id, {"text": text}, self.timeout)
+        return text
+
+
+@lazy_singleton
+def get_transcript_store() -> TranscriptStore:
+    """
+    Get the process-wide transcript store configured by
+    `STUDY_BUDDY_TRANSCRIPT_CACHE`.
+    """
+    config = get_settings("TRANSCRIPT_CACHE", DEFAULT_TRANSCRIPT_CACHE)
+    return TranscriptStore(
+        build_cache_backend(config),
+        config["TIMEOUT"],
+        config["NEGATIVE_TIMEOUT"],
+    )
@@ -1,12 +1,46 @@
 from django.urls import path
 
-from .views import ChatAPI, NoteAPI, ParaphraseAPI, QuizAPI, SummarizeAPI
+from .async_views import (
+    AsyncChatAPI,
+    AsyncNoteAPI,
+    AsyncParaphraseAPI,
+    AsyncQuizAPI,
+    AsyncSummarizeAPI,
+)
+from .views import (
+    BatchAPI,
+    ChatAPI,
+    ChatSessionAPI,
+    ChatSessionMessagesAPI,
+    DocumentAPI,
+    JobAPI,
+    ModelsAPI,
+    NoteAPI,
+    ParaphraseAPI,
+    QuizAPI,
+    SummarizeAPI,
+)
 
 
 urlpatterns = [
     path("chat/", ChatAPI.as_view()),
+    path("chat/sessions/", ChatSessionAPI.as_view()),
+    path(
+        "chat/sessions/<uuid:session_id>/messages/",
+        ChatSessionMessagesAPI.as_view(),
+    ),
+    path("documents/", DocumentAPI.as_view()),
     path("note/", NoteAPI.as_view()),
     path("paraphrase/", ParaphraseAPI.as_view()),
     path("quiz/", QuizAPI.as_view()),
     path("summarize/", SummarizeAPI.as_view()),
+    path("batch/", BatchAPI.as_view()),
+    path("jobs/<str:job_id>/", JobAPI.as_view(), name="job-status"),
+    path("models/", ModelsAPI.as_view()),
+    # Async variants, served without blocking a worker thread under ASGI.
+    path("async/chat/", AsyncChatAPI.as_view()),
+    path("async/note/", AsyncNoteAPI.as_view()),
+    path("async/paraphrase/", AsyncParaphraseAPI.as_view()),
+    path("async/quiz/", AsyncQuizAPI.as_view()),
+    path("async/summarize/", AsyncSummarizeAPI.as_view()),
 ]
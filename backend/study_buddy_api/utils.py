@@ -1,26 +1,308 @@
+import asyncio
+import codecs
+import contextvars
+import hashlib
+import os
 import re
-from functools import lru_cache
-from typing import Any
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Iterator
 
-import fitz
-import ollama
 from rest_framework.exceptions import ValidationError
-from youtube_transcript_api import YouTubeTranscriptApi
 
+from .cache import get_llm_cache, make_cache_key
+from .chunking import (
+    estimate_token_count,
+    get_chunking_setting,
+    split_text_into_chunks,
+)
+from .conf import get_setting, get_settings
+from .deadlines import check_deadline, get_deadline
+from .documents import get_document_text
+from .ollama_client import get_keep_alive, get_pool
+from .pdf_extraction import PDFContainsImagesError, extract_pdf_text
 from .prompts import (
     FLASHCARD_CONTEXT,
+    FLASHCARD_JSON_PROMPT,
     FLASHCARD_PROMPT,
     MULTIPLE_CHOICE_QUESTION_CONTEXT,
+    MULTIPLE_CHOICE_QUESTION_JSON_PROMPT,
     MULTIPLE_CHOICE_QUESTION_PROMPT,
+    QUIZ_TOP_UP_PROMPT,
+    QuizFormatEnum,
+    QuizModeEnum,
+)
+from .quiz_parser import (
+    FlashcardTextParser,
+    JSONQuizParser,
+    MultiChoiceTextParser,
+    parse_quiz_response,
+    validate_flashcard_item,
+    validate_multi_choice_item,
 )
+from .scheduler import Priority, get_scheduler
+from .semantic_cache import semantic_lookup
+from .single_flight import acoalesce, coalesce, make_flight_key
+from .timing import record_stage, stage
+from .transcripts import TranscriptUnavailableError, get_transcript_store
+
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_PDF_EXTRACTION = {
+    "MAX_WORKERS": os.cpu_count() or 1,
+    "MIN_PAGES_PER_WORKER": 32,
+}
 
+DEFAULT_QUIZ_GENERATION = {
+    # Follow-up generations allowed to make up for invalid or missing questions.
+    "MAX_TOP_UPS": 2,
+}
 
-def generate_llm_response(messages: list, model: str = "llama3.1") -> dict:
+
+def generate_llm_response(
+    messages: list,
+    model: str = "llama3.1",
+    options: dict = None,
+    use_cache: bool = True,
+    priority: Priority = Priority.BULK,
+    format: str = "",
+    affinity: str = None,
+) -> dict:
     """
     Generate a response from the AI model based on the provided messages.
+
+    Note:
+        Responses are served from the LLM response cache when `use_cache` is set,
+        endpoints with non-repeatable conversations (chat) should opt out.
+        Generations wait for a slot from the LLM scheduler in the `priority` lane.
+        Set `format` to "json" to constrain the output to valid JSON.
+        Under a request deadline, the response is streamed from Ollama so that
+        the generation can be stopped once the deadline passes.
+        Generations with the same `affinity` key (e.g. a chat session) are sent
+        to the same Ollama host, see `OllamaPool.call`.
     """
-    llm_response = ollama.chat(model=model, messages=messages)
-    return llm_response["message"]["content"].strip()
+    cache = get_llm_cache()
+    cache_key = make_cache_key(model, messages, options, format) if use_cache else None
+
+    if cache_key and (cached_response := cache.get(cache_key)) is not None:
+        return cached_response
+
+    def chat(client, stream=False):
+        return client.chat(
+            model=model,
+            messages=messages,
+            options=options,
+            stream=stream,
+            format=format,
+            keep_alive=get_keep_alive(),
+        )
+
+    with get_scheduler().slot(model, priority), stage("llm_generate"):
+        if get_deadline() is None:
+            content = get_pool().call(model, chat, affinity)["message"]["content"]
+            content = content.strip()
+        else:
+            stream = get_pool().stream(model, partial(chat, stream=True), affinity)
+            content = read_chat_stream(stream).strip()
+
+    if cache_key:
+        cache.set(cache_key, content)
+
+    return content
+
+
+def read_chat_stream(stream: Iterator) -> str:
+    """
+    Join the content of a chat stream, closing it (which stops the generation)
+    if the request deadline passes first.
+    """
+    content = []
+    try:
+        for chunk in stream:
+            check_deadline()
+            content.append(chunk["message"]["content"])
+    finally:
+        stream.close()
+    return "".join(content)
+
+
+def cache_llm_response(
+    messages: list,
+    model: str,
+    response: str,
+    options: dict = None,
+    format: str = "",
+):
+    """
+    Cache a response the consumer of `stream_llm_response` stopped once it had
+    all it needed, e.g. a quiz once `question_count` questions are parsed.
+    """
+    get_llm_cache().set(
+        make_cache_key(model, messages, options, format), response.strip()
+    )
+
+
+def stream_llm_response(
+    messages: list,
+    model: str = "llama3.1",
+    options: dict = None,
+    use_cache: bool = True,
+    priority: Priority = Priority.BULK,
+    format: str = "",
+    affinity: str = None,
+) -> Iterator[str]:
+    """
+    Stream the response from the AI model token by token as it is generated.
+
+    Note:
+        A cached response is yielded as a single token, a freshly generated one is
+        only cached once the stream has completed. Closing the stream early stops
+        the generation without caching anything, see `cache_llm_response` for
+        consumers that stop once they have all they need.
+    """
+    cache = get_llm_cache()
+    cache_key = make_cache_key(model, messages, options, format) if use_cache else None
+
+    if cache_key and (cached_response := cache.get(cache_key)) is not None:
+        yield cached_response
+        return
+
+    tokens = []
+    with get_scheduler().slot(model, priority):
+        started_at = time.perf_counter()
+        stream = get_pool().stream(
+            model,
+            lambda client: client.chat(
+                model=model,
+                messages=messages,
+                options=options,
+                stream=True,
+                format=format,
+                keep_alive=get_keep_alive(),
+            ),
+            affinity,
+        )
+        try:
+            for chunk in stream:
+                check_deadline()
+                if token := chunk["message"]["content"]:
+                    if not tokens:
+                        record_stage(
+                            "llm_first_token", time.perf_counter() - started_at
+                        )
+                    tokens.append(token)
+                    yield token
+        finally:
+            # Closes the connection, which makes Ollama stop generating.
+            stream.close()
+            record_stage("llm_generate", time.perf_counter() - started_at)
+
+    if cache_key:
+        cache.set(cache_key, "".join(tokens).strip())
+
+
+async def astream_llm_response(
+    messages: list,
+    model: str = "llama3.1",
+    options: dict = None,
+    use_cache: bool = True,
+    priority: Priority = Priority.BULK,
+    format: str = "",
+    affinity: str = None,
+) -> AsyncIterator[str]:
+    """
+    Async variant of `stream_llm_response`.
+    """
+    cache = get_llm_cache()
+    cache_key = make_cache_key(model, messages, options, format) if use_cache else None
+
+    if (
+        cache_key
+        and (cached_response := await asyncio.to_thread(cache.get, cache_key))
+        is not None
+    ):
+        yield cached_response
+        return
+
+    tokens = []
+    async with get_scheduler().aslot(model, priority):
+        started_at = time.perf_counter()
+        stream = get_pool().astream(
+            model,
+            lambda client: client.chat(
+                model=model,
+                messages=messages,
+                options=options,
+                stream=True,
+                format=format,
+                keep_alive=get_keep_alive(),
+            ),
+            affinity,
+        )
+        try:
+            async for chunk in stream:
+                check_deadline()
+                if token := chunk["message"]["content"]:
+                    if not tokens:
+                        record_stage(
+                            "llm_first_token", time.perf_counter() - started_at
+                        )
+                    tokens.append(token)
+                    yield token
+        finally:
+            await stream.aclose()
+            record_stage("llm_generate", time.perf_counter() - started_at)
+
+    if cache_key:
+        await asyncio.to_thread(cache.set, cache_key, "".join(tokens).strip())
+
+
+async def agenerate_llm_response(
+    messages: list,
+    model: str = "llama3.1",
+    options: dict = None,
+    use_cache: bool = True,
+    priority: Priority = Priority.BULK,
+    format: str = "",
+    affinity: str = None,
+) -> str:
+    """
+    Async variant of `generate_llm_response` that does not block a worker thread
+    while the model is generating.
+    """
+    cache = get_llm_cache()
+    cache_key = make_cache_key(model, messages, options, format) if use_cache else None
+
+    if (
+        cache_key
+        and (cached_response := await asyncio.to_thread(cache.get, cache_key))
+        is not None
+    ):
+        return cached_response
+
+    async with get_scheduler().aslot(model, priority):
+        with stage("llm_generate"):
+            llm_response = await get_pool().acall(
+                model,
+                lambda client: client.chat(
+                    model=model,
+                    messages=messages,
+                    options=options,
+                    format=format,
+                    keep_alive=get_keep_alive(),
+                ),
+                affinity,
+            )
+    content = llm_response["message"]["content"].strip()
+
+    if cache_key:
+        await asyncio.to_thread(cache.set, cache_key, content)
+
+    return content
 
 
 def extract_youtube_video_id(url: str) -> str:
@@ -29,24 +311,60 @@ def extract_youtube_video_id(url: str) -> str:
     return match[1] if match else None
 
 
-@lru_cache(maxsize=128)
 def extract_transcript_from_youtube_url(youtube_url: str) -> str:
     """
     Extracts the transcript from a YouTube video URL.
+
+    Note:
+        Transcripts are cached by video id, so every URL form of the same video
+        shares one entry, see `transcripts.TranscriptStore`.
     """
     try:
         video_id = extract_youtube_video_id(youtube_url)
-        transcript = YouTubeTranscriptApi.get_transcript(video_id)
-        return " ".join([entry["text"] for entry in transcript])
+        if not video_id:
+            raise TranscriptUnavailableError("Invalid YouTube video URL")
+        with stage("extract_transcript"):
+            return get_transcript_store().get_transcript(video_id)
     except Exception as e:
         raise ValidationError(
             f"Failed to extract transcript from YouTube URL: {e}"
         ) from e
 
 
+def iter_file_chunks(file_obj: Any, chunk_size: int = UPLOAD_CHUNK_SIZE) -> Iterator:
+    """
+    Iterate over the contents of a file-like object in bounded chunks.
+    """
+    if hasattr(file_obj, "chunks"):
+        yield from file_obj.chunks(chunk_size)
+        return
+
+    while chunk := file_obj.read(chunk_size):
+        yield chunk
+
+
+@contextmanager
+def spooled_file_path(file_obj: Any, suffix: str = "") -> Iterator[str]:
+    """
+    Yield a filesystem path holding the contents of the file-like object.
+
+    Uploads Django already spooled to disk are used in place, anything else is
+    copied chunk by chunk to a temporary file that is removed afterwards.
+    """
+    if hasattr(file_obj, "temporary_file_path"):
+        yield file_obj.temporary_file_path()
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=suffix) as spooled_file:
+        for chunk in iter_file_chunks(file_obj):
+            spooled_file.write(chunk)
+        spooled_file.flush()
+        yield spooled_file.name
+
+
 def extract_text_from_file(file_obj: Any, file_extension: str) -> str:
     """
-    Extracts text from a file-like object in memory.
+    Extracts text from an uploaded file without buffering it whole in memory.
 
     Args:
         file_obj: A file-like object for .txt or .pdf files.
@@ -62,21 +380,25 @@ def extract_text_from_file(file_obj: Any, file_extension: str) -> str:
     file_extension = file_extension.lower()
 
     if file_extension == "txt":
-        return file_obj.read().decode("utf-8")
+        with stage("extract_txt"):
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            texts = [decoder.decode(chunk) for chunk in iter_file_chunks(file_obj)]
+            texts.append(decoder.decode(b"", final=True))
+            return "".join(texts)
 
     elif file_extension == "pdf":
-        file_obj = file_obj.read()
-        pdf_document = fitz.open(stream=file_obj, filetype="pdf")
-        all_text = ""
-
-        for page_num in range(pdf_document.page_count):
-            page = pdf_document.load_page(page_num)
-            if page.get_images(full=True):
-                raise ValidationError("PDF contains images")
-            text = page.get_text("text")
-            all_text += text
-
-        return all_text
+        config = get_settings("PDF_EXTRACTION", DEFAULT_PDF_EXTRACTION)
+        try:
+            with stage("extract_pdf"), spooled_file_path(
+                file_obj, suffix=".pdf"
+            ) as path:
+                return extract_pdf_text(
+                    path,
+                    max_workers=config["MAX_WORKERS"],
+                    min_pages_per_worker=config["MIN_PAGES_PER_WORKER"],
+                )
+        except PDFContainsImagesError as e:
+            raise ValidationError("PDF contains images") from e
 
     raise ValidationError(f"Unsupported file extension: {file_extension}")
 
@@ -95,6 +417,9 @@ def get_extracted_text_from_sources(body: dict) -> str:
     Note:
         The body must be inherited from BaseContentSerializer
     """
+    if document_id := body.get("document_id"):
+        return get_document_text(document_id)
+
     extracted_text = ""
 
     if file := body.get("file"):
@@ -110,123 +435,617 @@ def get_extracted_text_from_sources(body: dict) -> str:
     return extracted_text
 
 
-def create_prompt_and_get_response(context: str, body: dict, template: str) -> tuple:
+async def aget_extracted_text_from_sources(body: dict) -> str:
     """
-    Create a prompt for the AI model and get the response.
+    Async variant of `get_extracted_text_from_sources`.
+
+    PDF parsing and transcript fetching are blocking, so they run in worker
+    threads, concurrently when both a file and a YouTube URL are provided.
+    """
+    if document_id := body.get("document_id"):
+        return await asyncio.to_thread(get_document_text, document_id)
+
+    extractions = []
+
+    if file := body.get("file"):
+        file_extension = file.name.split(".")[-1]
+        extractions.append(
+            asyncio.to_thread(extract_text_from_file, file, file_extension)
+        )
+
+    if youtube_url := body.get("youtube_url"):
+        extractions.append(
+            asyncio.to_thread(extract_transcript_from_youtube_url, youtube_url)
+        )
+
+    extracted_text = "".join(await asyncio.gather(*extractions))
+
+    if text := body.get("text"):
+        extracted_text += text
+
+    return extracted_text
+
+
+def get_source_hash(body: dict) -> str:
+    """
+    Hash the sources of a request body without extracting them, to find the
+    document previously extracted from the same sources.
+
+    Note:
+        YouTube videos are hashed by video id, so that every URL form of a video
+        matches.
+    """
+    parts = []
+
+    if file := body.get("file"):
+        file_digest = hashlib.sha256()
+        for chunk in iter_file_chunks(file):
+            file_digest.update(chunk)
+        file_extension = file.name.split(".")[-1].lower()
+        parts.append(f"file:{file_extension}:{file_digest.hexdigest()}")
+
+    if youtube_url := body.get("youtube_url"):
+        video_id = extract_youtube_video_id(youtube_url) or youtube_url
+        parts.append(f"youtube:{video_id}")
+
+    if text := body.get("text"):
+        parts.append(f"text:{hashlib.sha256(text.encode('utf-8')).hexdigest()}")
+
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def build_prompts(context: str, template: str, extracted_text: str) -> list:
+    """
+    Build the system and user messages sent to the AI model.
     """
-    extracted_text = get_extracted_text_from_sources(body)
     user_message = f"{template}\n{extracted_text}"
 
-    prompts = [
+    return [
         {"role": "system", "content": context},
         {"role": "user", "content": user_message},
     ]
 
-    return generate_llm_response(prompts), extracted_text
-
 
-def convert_multi_choice_quiz_to_question_dict(
-    input_string: str, question_count: int
+def summarize_chunks(
+    context: str, template: str, chunks: list, model: str = "llama3.1"
 ) -> list:
     """
-    Convert the input string containing quiz questions to a list of dictionaries.
+    Run the template over each chunk concurrently, preserving the chunk order.
     """
-    questions = []
+    concurrency = min(get_chunking_setting("CONCURRENCY"), len(chunks))
+    # Run every chunk in a copy of the caller's context, so that its stages are
+    # timed as part of the request.
+    request_context = contextvars.copy_context()
 
-    raw_questions = re.split(r"Question:", input_string.strip())[1:]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(
+            executor.map(
+                lambda chunk: request_context.copy().run(
+                    generate_llm_response,
+                    build_prompts(context, template, chunk),
+                    model,
+                ),
+                chunks,
+            )
+        )
 
-    for raw_question in raw_questions:
-        if question_text_match := re.search(r"(.+?)\n1\.", raw_question, re.DOTALL):
-            question_text = question_text_match[1].strip()
-        else:
-            continue
 
-        # Extract the answer options
-        options_match = re.findall(r"(\d)\.\s(.+)", raw_question)
-        options = dict(options_match)
+def build_map_reduce_prompts(
+    context: str,
+    template: str,
+    extracted_text: str,
+    map_template: str,
+    model: str = "llama3.1",
+) -> list:
+    """
+    Build the prompts for the final generation over a text that may not fit in
+    the model context.
+
+    When the text exceeds the chunk budget, its chunks are first condensed
+    concurrently with `map_template`, and the partial results are condensed
+    again (hierarchically) until they fit in a single final prompt.
+    """
+    max_tokens = get_chunking_setting("MAX_CHUNK_TOKENS")
 
-        # Extract the correct answer
-        correct_answer_match = re.search(r"Answer:\s*(\d)", raw_question)
-        correct_answer = (
-            correct_answer_match[1].strip() if correct_answer_match else None
+    while estimate_token_count(extracted_text) > max_tokens:
+        chunks = split_text_into_chunks(extracted_text, max_tokens)
+        reduced_text = "\n\n".join(
+            summarize_chunks(context, map_template, chunks, model)
         )
+        if len(reduced_text) >= len(extracted_text):
+            break
+        extracted_text = reduced_text
+
+    return build_prompts(context, template, extracted_text)
 
-        questions.append(
-            {
-                "question": question_text,
-                "options": options,
-                "correct_answer": correct_answer,
-            }
-        )
 
-    if len(questions) > question_count:
-        questions = questions[:question_count]
+async def asummarize_chunks(
+    context: str, template: str, chunks: list, model: str = "llama3.1"
+) -> list:
+    """
+    Async variant of `summarize_chunks`.
+    """
+    semaphore = asyncio.Semaphore(get_chunking_setting("CONCURRENCY"))
 
-    return questions
+    async def summarize(chunk):
+        async with semaphore:
+            return await agenerate_llm_response(
+                build_prompts(context, template, chunk), model
+            )
 
+    return await asyncio.gather(*[summarize(chunk) for chunk in chunks])
 
-def generate_multi_choice_quiz_questions(
-    topic: str,
-    question_count: int,
-    context: str = MULTIPLE_CHOICE_QUESTION_CONTEXT,
-    prompt: str = MULTIPLE_CHOICE_QUESTION_PROMPT,
-    extra_questions: int = 1,
+
+async def abuild_map_reduce_prompts(
+    context: str,
+    template: str,
+    extracted_text: str,
+    map_template: str,
+    model: str = "llama3.1",
 ) -> list:
     """
-    Generate quiz questions based on the provided mode and topic.
+    Async variant of `build_map_reduce_prompts`.
+    """
+    max_tokens = get_chunking_setting("MAX_CHUNK_TOKENS")
+
+    while estimate_token_count(extracted_text) > max_tokens:
+        chunks = split_text_into_chunks(extracted_text, max_tokens)
+        partial_results = await asummarize_chunks(context, map_template, chunks, model)
+        reduced_text = "\n\n".join(partial_results)
+        if len(reduced_text) >= len(extracted_text):
+            break
+        extracted_text = reduced_text
+
+    return build_prompts(context, template, extracted_text)
+
+
+def create_prompt_and_get_response(
+    context: str,
+    body: dict,
+    template: str,
+    map_template: str = None,
+    model: str = "llama3.1",
+) -> tuple:
+    """
+    Create a prompt for the AI model and get the response.
+
+    Note:
+        Passing `map_template` enables chunked map-reduce processing for texts
+        larger than the model context, see `build_map_reduce_prompts`.
+        Concurrent requests for the same prompt share a single generation.
+    """
+    extracted_text = get_extracted_text_from_sources(body)
+
+    def generate():
+        if map_template:
+            with stage("map_reduce"):
+                prompts = build_map_reduce_prompts(
+                    context, template, extracted_text, map_template, model
+                )
+        else:
+            prompts = build_prompts(context, template, extracted_text)
+
+        return generate_llm_response(prompts, model)
+
+    key = make_flight_key(
+        "prompt", model, context, template, map_template, extracted_text
+    )
+    return coalesce(key, generate), extracted_text
+
+
+def create_prompt_and_stream_response(
+    context: str,
+    body: dict,
+    template: str,
+    map_template: str = None,
+    model: str = "llama3.1",
+) -> tuple:
+    """
+    Create a prompt for the AI model and return a token iterator for the response.
+
     Note:
-        extra_questions is used to generate more questions than requested to ensure
-        that the final list contains the required number of questions after filtering.
+        Text extraction happens eagerly so that source errors are raised
+        before the response starts streaming, while the map passes of a chunked
+        prompt run lazily once the stream is consumed.
+    """
+    extracted_text = get_extracted_text_from_sources(body)
+
+    def tokens():
+        if map_template:
+            with stage("map_reduce"):
+                prompts = build_map_reduce_prompts(
+                    context, template, extracted_text, map_template, model
+                )
+        else:
+            prompts = build_prompts(context, template, extracted_text)
+        yield from stream_llm_response(prompts, model)
+
+    return tokens(), extracted_text
+
+
+async def acreate_prompt_and_stream_response(
+    context: str,
+    body: dict,
+    template: str,
+    map_template: str = None,
+    model: str = "llama3.1",
+) -> tuple:
+    """
+    Async variant of `create_prompt_and_stream_response`.
+    """
+    extracted_text = await aget_extracted_text_from_sources(body)
+
+    async def tokens():
+        if map_template:
+            with stage("map_reduce"):
+                prompts = await abuild_map_reduce_prompts(
+                    context, template, extracted_text, map_template, model
+                )
+        else:
+            prompts = build_prompts(context, template, extracted_text)
+        async for token in astream_llm_response(prompts, model):
+            yield token
+
+    return tokens(), extracted_text
+
+
+async def acreate_prompt_and_get_response(
+    context: str,
+    body: dict,
+    template: str,
+    map_template: str = None,
+    model: str = "llama3.1",
+) -> tuple:
+    """
+    Async variant of `create_prompt_and_get_response`.
+    """
+    extracted_text = await aget_extracted_text_from_sources(body)
+
+    async def generate():
+        if map_template:
+            with stage("map_reduce"):
+                prompts = await abuild_map_reduce_prompts(
+                    context, template, extracted_text, map_template, model
+                )
+        else:
+            prompts = build_prompts(context, template, extracted_text)
+
+        return await agenerate_llm_response(prompts, model)
+
+    key = make_flight_key(
+        "prompt", model, context, template, map_template, extracted_text
+    )
+    return await acoalesce(key, generate), extracted_text
+
+
+def build_quiz_prompts(
+    topic: str, question_count: int, context: str, prompt: str
+) -> list:
+    """
+    Build the system and user messages for a quiz generation request.
     """
     system_message = {
         "role": "system",
         "content": context,
     }
-    user_message = prompt.format(
-        question_count=question_count + extra_questions, topic=topic
-    )
-    llm_response = generate_llm_response(
-        [system_message, {"role": "user", "content": user_message}]
-    )
-    return convert_multi_choice_quiz_to_question_dict(llm_response, question_count)
+    user_message = prompt.format(question_count=question_count, topic=topic)
+
+    return [system_message, {"role": "user", "content": user_message}]
+
+
+def convert_multi_choice_quiz_to_question_dict(
+    input_string: str, question_count: int
+) -> list:
+    """
+    Convert the input string containing quiz questions to a list of dictionaries.
+    """
+    questions = parse_quiz_response(MultiChoiceTextParser(), input_string)
+    return questions[:question_count]
 
 
 def extract_flashcards(flashcard_text: str, question_count: int) -> list:
     """
     Extract flashcards from the provided text.
     """
-    pattern = r"Question: (.*?)\nAnswer: (.*?)(?=\n\n|\Z)"
-    matches = re.findall(pattern, flashcard_text, re.DOTALL)
+    flashcards = parse_quiz_response(FlashcardTextParser(), flashcard_text)
+    return flashcards[:question_count]
+
+
+# Prompts, parser, key of the question text and Ollama output format of every
+# quiz mode and generation format.
+QUIZ_GENERATION = {
+    (QuizModeEnum.MULTIPLE_CHOICE.value, QuizFormatEnum.JSON.value): (
+        MULTIPLE_CHOICE_QUESTION_CONTEXT,
+        MULTIPLE_CHOICE_QUESTION_JSON_PROMPT,
+        partial(JSONQuizParser, validate_multi_choice_item),
+        "question",
+        "json",
+    ),
+    (QuizModeEnum.MULTIPLE_CHOICE.value, QuizFormatEnum.TEXT.value): (
+        MULTIPLE_CHOICE_QUESTION_CONTEXT,
+        MULTIPLE_CHOICE_QUESTION_PROMPT,
+        MultiChoiceTextParser,
+        "question",
+        "",
+    ),
+    (QuizModeEnum.FLASH_CARDS.value, QuizFormatEnum.JSON.value): (
+        FLASHCARD_CONTEXT,
+        FLASHCARD_JSON_PROMPT,
+        partial(JSONQuizParser, validate_flashcard_item),
+        "Question",
+        "json",
+    ),
+    (QuizModeEnum.FLASH_CARDS.value, QuizFormatEnum.TEXT.value): (
+        FLASHCARD_CONTEXT,
+        FLASHCARD_PROMPT,
+        FlashcardTextParser,
+        "Question",
+        "",
+    ),
+}
+
+
+def get_quiz_top_ups() -> int:
+    return get_setting("QUIZ_GENERATION", "MAX_TOP_UPS", DEFAULT_QUIZ_GENERATION)
+
+
+def build_quiz_top_up_prompts(
+    prompts: list, llm_response: str, missing_count: int
+) -> list:
+    """
+    Continue the quiz conversation with a request for the missing questions only.
 
-    result = [
-        {"Question": question.strip(), "Answer": answer.strip()}
-        for question, answer in matches
+    Note:
+        Keeping the previous answer in the conversation lets the model avoid
+        repeating questions, and lets Ollama reuse the evaluated prompt prefix.
+    """
+    return prompts + [
+        {"role": "assistant", "content": llm_response},
+        {
+            "role": "user",
+            "content": QUIZ_TOP_UP_PROMPT.format(question_count=missing_count),
+        },
     ]
 
-    if len(result) > question_count:
-        result = result[:question_count]
 
-    return result
+def merge_quiz_questions(
+    questions: list, new_questions: list, key: str, question_count: int
+) -> list:
+    """
+    Add the new questions to `questions` until it holds `question_count`, skipping
+    repeated ones. Returns the questions that were added.
+    """
+    seen = {question[key].casefold() for question in questions}
+    added = []
 
+    for question in new_questions:
+        if len(questions) >= question_count:
+            break
+        if question[key].casefold() not in seen:
+            seen.add(question[key].casefold())
+            questions.append(question)
+            added.append(question)
 
-def generate_flash_quiz_questions(
+    return added
+
+
+def stream_quiz_questions(
+    topic: str,
+    question_count: int,
+    mode: str,
+    quiz_format: str = QuizFormatEnum.JSON.value,
+    model: str = "llama3.1",
+) -> Iterator[dict]:
+    """
+    Generate `question_count` quiz questions in the given mode, yielding each
+    question as soon as it has been parsed from the token stream.
+
+    Note:
+        Generation is stopped once `question_count` valid questions have been
+        parsed. Items that fail validation are dropped, and the missing questions
+        are requested in small follow-up generations (up to MAX_TOP_UPS) instead
+        of regenerating the quiz. Complete quizzes on short topics are served
+        from the semantic cache when it is enabled.
+    """
+    partition = f"quiz:{model}:{mode}:{quiz_format}:{question_count}"
+    cached_questions, store = semantic_lookup(partition, topic)
+    if cached_questions is not None:
+        yield from cached_questions
+        return
+
+    questions = []
+    for question in _stream_quiz_questions(
+        topic, question_count, mode, quiz_format, model
+    ):
+        questions.append(question)
+        yield question
+
+    if len(questions) == question_count:
+        store(questions)
+
+
+def _stream_quiz_questions(
+    topic: str, question_count: int, mode: str, quiz_format: str, model: str
+) -> Iterator[dict]:
+    context, prompt, parser_class, key, format = QUIZ_GENERATION[(mode, quiz_format)]
+    prompts = build_quiz_prompts(topic, question_count, context, prompt)
+    questions = []
+
+    for _ in range(get_quiz_top_ups() + 1):
+        parser = parser_class()
+        tokens = stream_llm_response(prompts, model, format=format)
+        response = []
+
+        try:
+            for token in tokens:
+                response.append(token)
+                with stage("quiz_parse"):
+                    parsed_questions = parser.feed(token)
+                yield from merge_quiz_questions(
+                    questions, parsed_questions, key, question_count
+                )
+                if len(questions) >= question_count:
+                    # Only a quiz that got all its questions caches its
+                    # truncated response, not one closed by the client.
+                    cache_llm_response(prompts, model, "".join(response), format=format)
+                    return
+        finally:
+            tokens.close()
+
+        with stage("quiz_parse"):
+            parsed_questions = parser.close()
+        yield from merge_quiz_questions(
+            questions, parsed_questions, key, question_count
+        )
+
+        missing_count = question_count - len(questions)
+        if missing_count <= 0:
+            return
+        prompts = build_quiz_top_up_prompts(prompts, "".join(response), missing_count)
+
+
+def generate_quiz_questions(
     topic: str,
     question_count: int,
-    context: str = FLASHCARD_CONTEXT,
-    prompt: str = FLASHCARD_PROMPT,
-    extra_questions: int = 1,
+    mode: str,
+    quiz_format: str = QuizFormatEnum.JSON.value,
+    model: str = "llama3.1",
 ) -> list:
     """
-    Generate quiz questions based on the provided mode and topic.
+    Generate `question_count` quiz questions in the given mode.
+
+    Note:
+        Concurrent requests for the same quiz share a single generation.
     """
-    system_message = {
-        "role": "system",
-        "content": context,
-    }
-    user_message = prompt.format(
-        question_count=question_count + extra_questions, topic=topic
+    key = make_flight_key("quiz", model, mode, quiz_format, question_count, topic)
+    return coalesce(
+        key,
+        lambda: list(
+            stream_quiz_questions(topic, question_count, mode, quiz_format, model)
+        ),
     )
-    llm_response = generate_llm_response(
-        [system_message, {"role": "user", "content": user_message}]
+
+
+def generate_multi_choice_quiz_questions(
+    topic: str,
+    question_count: int,
+    quiz_format: str = QuizFormatEnum.JSON.value,
+    model: str = "llama3.1",
+) -> list:
+    """
+    Generate `question_count` multiple-choice questions.
+    """
+    return generate_quiz_questions(
+        topic, question_count, QuizModeEnum.MULTIPLE_CHOICE.value, quiz_format, model
     )
-    return extract_flashcards(llm_response, question_count)
+
+
+def generate_flash_quiz_questions(
+    topic: str,
+    question_count: int,
+    quiz_format: str = QuizFormatEnum.JSON.value,
+    model: str = "llama3.1",
+) -> list:
+    """
+    Generate `question_count` flashcards.
+    """
+    return generate_quiz_questions(
+        topic, question_count, QuizModeEnum.FLASH_CARDS.value, quiz_format, model
+    )
+
+
+async def astream_quiz_questions(
+    topic: str,
+    question_count: int,
+    mode: str,
+    quiz_format: str = QuizFormatEnum.JSON.value,
+    model: str = "llama3.1",
+) -> AsyncIterator[dict]:
+    """
+    Async variant of `stream_quiz_questions`.
+    """
+    partition = f"quiz:{model}:{mode}:{quiz_format}:{question_count}"
+    cached_questions, store = await asyncio.to_thread(semantic_lookup, partition, topic)
+    if cached_questions is not None:
+        for question in cached_questions:
+            yield question
+        return
+
+    questions = []
+    async for question in _astream_quiz_questions(
+        topic, question_count, mode, quiz_format, model
+    ):
+        questions.append(question)
+        yield question
+
+    if len(questions) == question_count:
+        store(questions)
+
+
+async def _astream_quiz_questions(
+    topic: str, question_count: int, mode: str, quiz_format: str, model: str
+) -> AsyncIterator[dict]:
+    context, prompt, parser_class, key, format = QUIZ_GENERATION[(mode, quiz_format)]
+    prompts = build_quiz_prompts(topic, question_count, context, prompt)
+    questions = []
+
+    for _ in range(get_quiz_top_ups() + 1):
+        parser = parser_class()
+        tokens = astream_llm_response(prompts, model, format=format)
+        response = []
+
+        try:
+            async for token in tokens:
+                response.append(token)
+                with stage("quiz_parse"):
+                    parsed_questions = parser.feed(token)
+                for question in merge_quiz_questions(
+                    questions, parsed_questions, key, question_count
+                ):
+                    yield question
+                if len(questions) >= question_count:
+                    await asyncio.to_thread(
+                        cache_llm_response,
+                        prompts,
+                        model,
+                        "".join(response),
+                        format=format,
+                    )
+                    return
+        finally:
+            await tokens.aclose()
+
+        with stage("quiz_parse"):
+            parsed_questions = parser.close()
+        for question in merge_quiz_questions(
+            questions, parsed_questions, key, question_count
+        ):
+            yield question
+
+        missing_count = question_count - len(questions)
+        if missing_count <= 0:
+            return
+        prompts = build_quiz_top_up_prompts(prompts, "".join(response), missing_count)
+
+
+async def agenerate_quiz_questions(
+    topic: str,
+    question_count: int,
+    mode: str,
+    quiz_format: str = QuizFormatEnum.JSON.value,
+    model: str = "llama3.1",
+) -> list:
+    """
+    Async variant of `generate_quiz_questions`.
+    """
+
+    async def generate():
+        return [
+            question
+            async for question in astream_quiz_questions(
+                topic, question_count, mode, quiz_format, model
+            )
+        ]
+
+    key = make_flight_key("quiz", model, mode, quiz_format, question_count, topic)
+    return await acoalesce(key, generate)
@@ -1,37 +1,48 @@
-from rest_framework import permissions
+from rest_framework import permissions, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import GenericAPIView
-from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 
-from .prompts import (
-    PARAPHRASE_CONTEXT,
-    STUDY_NOTES_CONTEXT,
-    SUMMARIZE_CONTEXT,
-    QuizModeEnum,
-    get_context_string,
-    get_note_prompt_template,
-    get_paraphrase_prompt_template,
-    get_summary_prompt_template,
-)
+from .deadlines import DeadlineMixin
+from .jobs import JobMixin, get_job_status
+from .models import ChatSession
+from .ollama_client import get_ollama_setting, get_pool, loaded_models
 from .serializers import (
+    BatchSerializer,
+    ChatMessageSerializer,
     ChatSerializer,
+    ChatSessionSerializer,
+    ChatTurnSerializer,
+    DocumentSerializer,
     NoteSerializer,
     ParaphraseSerializer,
     QuizSerializer,
     SummarizeSerializer,
 )
-from .utils import (
-    create_prompt_and_get_response,
-    generate_flash_quiz_questions,
-    generate_llm_response,
-    generate_multi_choice_quiz_questions,
-    get_extracted_text_from_sources,
+from .services import (
+    batch,
+    chat,
+    document,
+    note,
+    paraphrase,
+    quiz,
+    session_chat,
+    stream_chat,
+    stream_note,
+    stream_paraphrase,
+    stream_quiz,
+    stream_session_chat,
+    stream_summarize,
+    summarize,
 )
+from .streaming import EventStreamMixin
+from .timing import TimedFormParser, TimedJSONParser, TimedMultiPartParser
 
 
-class ChatAPI(GenericAPIView):
+class ChatAPI(DeadlineMixin, JobMixin, EventStreamMixin, GenericAPIView):
 
     permission_classes = [permissions.AllowAny]
+    deadline_endpoint = "chat"
     serializer_class = ChatSerializer
 
     def post(self, request):
@@ -39,22 +50,95 @@ class ChatAPI(GenericAPIView):
         serializer.is_valid(raise_exception=True)
         body = serializer.validated_data
 
-        context_message = get_context_string(body["context"])
-        prompts = body.get("history", [])
-        prompts = [{"role": "system", "content": context_message}] + prompts
+        if self.wants_job(request):
+            return self.enqueue_job("chat", body)
+
+        if self.wants_event_stream(request):
+            return self.event_stream_response(*stream_chat(body))
+
+        return Response(chat(body))
+
+
+class ChatSessionAPI(GenericAPIView):
+
+    permission_classes = [permissions.AllowAny]
+    serializer_class = ChatSessionSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ChatSessionMessagesAPI(DeadlineMixin, EventStreamMixin, GenericAPIView):
+    """
+    Chat within a stored session: clients only send the new message, the
+    history is kept server-side.
+    """
+
+    permission_classes = [permissions.AllowAny]
+    deadline_endpoint = "chat"
+    serializer_class = ChatTurnSerializer
+    queryset = ChatSession.objects.all()
+    lookup_url_kwarg = "session_id"
+
+    def get(self, request, session_id):
+        session = self.get_object()
+        try:
+            limit = min(int(request.query_params.get("limit", 50)), 500)
+        except ValueError:
+            raise ValidationError({"limit": ["A valid integer is required."]})
+
+        messages = session.latest_messages(limit)
+        return Response({"data": ChatMessageSerializer(messages, many=True).data})
+
+    def post(self, request, session_id):
+        session = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        content = serializer.validated_data["content"]
 
-        llm_response = generate_llm_response(prompts)
+        if self.wants_event_stream(request):
+            return self.event_stream_response(*stream_session_chat(session, content))
 
-        return Response({"data": llm_response})
+        return Response(session_chat(session, content))
 
 
-class ParaphraseAPI(GenericAPIView):
+class DocumentAPI(JobMixin, GenericAPIView):
+    """
+    Store a document once: the returned `document_id` can be used instead of the
+    upload by the content endpoints, and passed to the chat endpoint to answer
+    from the most relevant parts of the document.
+    """
 
     permission_classes = [permissions.AllowAny]
+    serializer_class = DocumentSerializer
+    parser_classes = [
+        TimedMultiPartParser,
+        TimedFormParser,
+    ]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        body = serializer.validated_data
+
+        if self.wants_job(request):
+            return self.enqueue_job("document", body)
+
+        return Response(document(body), status=status.HTTP_201_CREATED)
+
+
+class ParaphraseAPI(DeadlineMixin, JobMixin, EventStreamMixin, GenericAPIView):
+
+    permission_classes = [permissions.AllowAny]
+    deadline_endpoint = "paraphrase"
     serializer_class = ParaphraseSerializer
     parser_classes = [
-        MultiPartParser,
-        FormParser,
+        TimedMultiPartParser,
+        TimedFormParser,
     ]
 
     def post(self, request):
@@ -62,23 +146,23 @@ class ParaphraseAPI(GenericAPIView):
         serializer.is_valid(raise_exception=True)
         body = serializer.validated_data
 
-        template = get_paraphrase_prompt_template(body["tone"])
-        llm_response, extracted_text = create_prompt_and_get_response(
-            PARAPHRASE_CONTEXT,
-            body,
-            template,
-        )
+        if self.wants_job(request):
+            return self.enqueue_job("paraphrase", body)
 
-        return Response({"data": llm_response, "extracted_text": extracted_text})
+        if self.wants_event_stream(request):
+            return self.event_stream_response(*stream_paraphrase(body))
 
+        return Response(paraphrase(body))
 
-class SummarizeAPI(GenericAPIView):
+
+class SummarizeAPI(DeadlineMixin, JobMixin, EventStreamMixin, GenericAPIView):
 
     permission_classes = [permissions.AllowAny]
+    deadline_endpoint = "summarize"
     serializer_class = SummarizeSerializer
     parser_classes = [
-        MultiPartParser,
-        FormParser,
+        TimedMultiPartParser,
+        TimedFormParser,
     ]
 
     def post(self, request):
@@ -86,23 +170,23 @@ class SummarizeAPI(GenericAPIView):
         serializer.is_valid(raise_exception=True)
         body = serializer.validated_data
 
-        template = get_summary_prompt_template(body["summary_type"])
-        llm_response, extracted_text = create_prompt_and_get_response(
-            SUMMARIZE_CONTEXT,
-            body,
-            template,
-        )
+        if self.wants_job(request):
+            return self.enqueue_job("summarize", body)
 
-        return Response({"data": llm_response, "extracted_text": extracted_text})
+        if self.wants_event_stream(request):
+            return self.event_stream_response(*stream_summarize(body))
 
+        return Response(summarize(body))
 
-class NoteAPI(GenericAPIView):
+
+class NoteAPI(DeadlineMixin, JobMixin, EventStreamMixin, GenericAPIView):
 
     permission_classes = [permissions.AllowAny]
+    deadline_endpoint = "note"
     serializer_class = NoteSerializer
     parser_classes = [
-        MultiPartParser,
-        FormParser,
+        TimedMultiPartParser,
+        TimedFormParser,
     ]
 
     def post(self, request):
@@ -110,21 +194,23 @@ class NoteAPI(GenericAPIView):
         serializer.is_valid(raise_exception=True)
         body = serializer.validated_data
 
-        template = get_note_prompt_template(body["level"])
-        llm_response, extracted_text = create_prompt_and_get_response(
-            STUDY_NOTES_CONTEXT, body, template
-        )
+        if self.wants_job(request):
+            return self.enqueue_job("note", body)
 
-        return Response({"data": llm_response, "extracted_text": extracted_text})
+        if self.wants_event_stream(request):
+            return self.event_stream_response(*stream_note(body))
 
+        return Response(note(body))
 
-class QuizAPI(GenericAPIView):
+
+class QuizAPI(DeadlineMixin, JobMixin, EventStreamMixin, GenericAPIView):
 
     permission_classes = [permissions.AllowAny]
+    deadline_endpoint = "quiz"
     serializer_class = QuizSerializer
     parser_classes = [
-        MultiPartParser,
-        FormParser,
+        TimedMultiPartParser,
+        TimedFormParser,
     ]
 
     def post(self, request):
@@ -132,14 +218,62 @@ class QuizAPI(GenericAPIView):
         serializer.is_valid(raise_exception=True)
         body = serializer.validated_data
 
-        mode = body["mode"]
-        question_count = body["question_count"]
-        topic = get_extracted_text_from_sources(body)
+        if self.wants_job(request):
+            return self.enqueue_job("quiz", body)
+
+        if self.wants_event_stream(request):
+            # Questions are sent one by one, as `question` events.
+            return self.event_stream_response(*stream_quiz(body), event="question")
 
-        if mode == QuizModeEnum.MULTIPLE_CHOICE.value:
-            llm_response = generate_multi_choice_quiz_questions(topic, question_count)
+        return Response(quiz(body))
 
-        if mode == QuizModeEnum.FLASH_CARDS.value:
-            llm_response = generate_flash_quiz_questions(topic, question_count)
 
-        return Response({"data": llm_response})
+class BatchAPI(DeadlineMixin, GenericAPIView):
+
+    permission_classes = [permissions.AllowAny]
+    deadline_endpoint = "batch"
+    serializer_class = BatchSerializer
+    parser_classes = [
+        TimedMultiPartParser,
+        TimedFormParser,
+        TimedJSONParser,
+    ]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        body = serializer.validated_data
+
+        return Response(batch(body))
+
+
+class JobAPI(GenericAPIView):
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, job_id):
+        return Response(get_job_status(job_id))
+
+
+class ModelsAPI(GenericAPIView):
+
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        try:
+            loaded = loaded_models()
+        except Exception as e:
+            return Response(
+                {"detail": f"Failed to reach the AI model server: {e}"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        return Response(
+            {
+                "data": {
+                    "loaded": loaded,
+                    "warm_up": get_ollama_setting("WARM_UP_MODELS"),
+                    "hosts": get_pool().stats(),
+                }
+            }
+        )